@@ -0,0 +1,90 @@
+#!/usr/bin/env bash
+# Compare the sync (gunicorn web_ui:app) and ASGI (uvicorn workers on asgi_app:app)
+# serving modes on GET /api/price/BTCUSDT, against the offline simulator and a
+# throwaway SQLite database.
+#
+# Two scenarios per server:
+#   inprocess  EXCHANGE_BACKEND=simulator, prices answered without any I/O
+#   rest       prices fetched from `python exchange_sim.py` with SIM_LATENCY_MS
+#              of injected latency, standing in for a slow Binance call
+#
+# Usage: benchmarks/compare_serving.sh [output.jsonl]   (run from backend/)
+set -euo pipefail
+
+OUTPUT=${1:-benchmarks/results/asgi_vs_sync.jsonl}
+WORKERS=${WORKERS:-2}
+REQUESTS=${REQUESTS:-3000}
+CONCURRENCY=${CONCURRENCY:-64}
+SIM_LATENCY_MS=${SIM_LATENCY_MS:-50}
+PORT=${PORT:-5001}
+SIM_PORT=${SIM_PORT:-8910}
+
+WORKDIR=$(mktemp -d)
+OUTPUT=$(realpath -m "$OUTPUT")
+LOAD_TEST=$(realpath benchmarks/load_test.py)
+: > "$OUTPUT"
+
+export DATABASE_BACKEND=sqlite SQLITE_PATH="$WORKDIR/backend.db" LOG_FILE="$WORKDIR/bot.log"
+export PRICE_ALERT_FEED=False LOG_LEVEL=WARNING
+
+SERVER_PID= SIM_PID=
+cleanup() {
+    [ -n "$SERVER_PID" ] && kill "$SERVER_PID" 2>/dev/null || true
+    [ -n "$SIM_PID" ] && kill "$SIM_PID" 2>/dev/null || true
+    rm -rf "$WORKDIR"
+}
+trap cleanup EXIT
+
+wait_for() {
+    for _ in $(seq 100); do
+        curl -sf "$1" > /dev/null && return 0
+        sleep 0.1
+    done
+    echo "Timed out waiting for $1" >&2
+    return 1
+}
+
+run_server() {
+    local mode=$1 scenario=$2 app=web_ui:app worker=sync
+    if [ "$mode" = asgi ]; then
+        app=asgi_app:app worker=uvicorn.workers.UvicornWorker
+    fi
+    python -m gunicorn "$app" -k "$worker" --bind 127.0.0.1:$PORT --workers "$WORKERS" \
+        > "$WORKDIR/$mode-$scenario.log" 2>&1 &
+    SERVER_PID=$!
+    wait_for "http://127.0.0.1:$PORT/api/price/BTCUSDT"
+
+    # Warm up connections and imports before measuring
+    python "$LOAD_TEST" --url "http://127.0.0.1:$PORT" --requests 200 \
+        --concurrency "$CONCURRENCY" > /dev/null
+    python "$LOAD_TEST" --url "http://127.0.0.1:$PORT" --requests "$REQUESTS" \
+        --concurrency "$CONCURRENCY" --label "$mode-$scenario" --output "$OUTPUT" > /dev/null
+
+    kill "$SERVER_PID"
+    wait "$SERVER_PID" 2>/dev/null || true
+    SERVER_PID=
+}
+
+cd src
+
+for mode in sync asgi; do
+    EXCHANGE_BACKEND=simulator run_server "$mode" inprocess
+done
+
+SIM_LATENCY_MS=$SIM_LATENCY_MS SIM_TICK_INTERVAL=0 python exchange_sim.py --port "$SIM_PORT" \
+    > "$WORKDIR/exchange_sim.log" 2>&1 &
+SIM_PID=$!
+wait_for "http://127.0.0.1:$SIM_PORT/fapi/v1/ticker/price?symbol=BTCUSDT"
+
+for mode in sync asgi; do
+    EXCHANGE_BACKEND=binance EXCHANGE_URL="http://127.0.0.1:$SIM_PORT" run_server "$mode" rest
+done
+
+python - "$OUTPUT" <<'EOF'
+import json, sys
+print(f"{'run':<16}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}  status")
+for line in open(sys.argv[1]):
+    r = json.loads(line)
+    l = r['latency_ms']
+    print(f"{r['label']:<16}{r['requests_per_s']:>10}{l['p50']:>10}{l['p95']:>10}{l['p99']:>10}  {r['status_codes']}")
+EOF
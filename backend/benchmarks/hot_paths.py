@@ -0,0 +1,363 @@
+"""
+Benchmark suite for the order, feed and persistence hot paths
+
+Runs entirely offline: orders go to the in-process exchange simulator
+(exchange_sim.py) and storage to a throwaway SQLite database, so numbers
+only reflect this codebase. Each benchmark prepares its state first and
+then times a single operation, asv style:
+
+- web_ui.market_order       POST /api/market_order through the Flask app
+- web_ui.limit_and_cancel   POST /api/limit_order then /api/cancel_order
+- request.public            GET /api/price/<symbol> (no auth)
+- request.authenticated     GET /api/open_orders (JWT + session lookup)
+- jwt.verify                verify_jwt_in_request on its own
+- feed.process_message      WebSocketPriceFeed._process_message per message
+- order_history.add_order   at several retention sizes
+- grid.setup                GridBot.setup_grid with N levels
+
+Results are written as JSON with the git commit and environment, so runs
+can be compared over time:
+
+Usage:
+    python hot_paths.py --output results/baseline.json
+    python hot_paths.py --filter order_history grid --compare results/baseline.json
+    python hot_paths.py --exchange-url http://127.0.0.1:8910   # REST simulator
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+SRC = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+# The app reads its configuration at import time, so this is applied
+# before any project module is imported (see configure())
+BENCH_ENV = {
+    'EXCHANGE_BACKEND': 'simulator',
+    'SIM_TICK_INTERVAL': '0',
+    'SIM_INITIAL_BALANCE': '1000000000',
+    'DATABASE_BACKEND': 'sqlite',
+    'BCRYPT_ROUNDS': '4',
+    'TRACING_EXPORTER': 'none',
+    'LOG_LEVEL': 'WARNING',
+    'COMPRESS_RESPONSES': 'False',
+    'TELEGRAM_BOT_TOKEN': '',
+}
+
+BENCH_EMAIL = 'bench@example.com'
+BENCHMARKS = []
+
+
+def benchmark(name: str, params=(None,)):
+    """Register a benchmark; the function prepares state and returns the op to time
+    
+    The function may return a callable, or a dict with 'op', 'units'
+    (logical operations per call, default 1) and 'teardown' (untimed,
+    called after every op).
+    """
+    def register(fn):
+        BENCHMARKS.append((name, tuple(params), fn))
+        return fn
+    return register
+
+
+def configure(workdir: str, exchange_url: str = None):
+    for key, value in BENCH_ENV.items():
+        os.environ.setdefault(key, value)
+    os.environ.setdefault('SQLITE_PATH', os.path.join(workdir, 'bench.db'))
+    if exchange_url:
+        os.environ['EXCHANGE_BACKEND'] = 'binance'
+        os.environ['EXCHANGE_URL'] = exchange_url
+    # order_history.json and bot.log are written to the working directory
+    os.chdir(workdir)
+    sys.path.insert(0, SRC)
+
+
+# ============================================================================
+# FIXTURES
+# ============================================================================
+
+_app_state = {}
+
+
+def web_app():
+    """Flask test client with a registered, connected user and an access token"""
+    if _app_state:
+        return _app_state['client'], _app_state['headers']
+    
+    from flask_jwt_extended import create_access_token
+    from web_ui import app
+    from auth import auth_service
+    from bot_sessions import bot_sessions
+    
+    auth_service.register_user(BENCH_EMAIL, 'Bench-pass-1', 'Bench', 'bench-key', 'bench-secret')
+    bot_sessions.connect(BENCH_EMAIL, testnet=True)
+    with app.app_context():
+        token = create_access_token(identity=BENCH_EMAIL)
+    
+    _app_state.update(client=app.test_client(), headers={'Authorization': f'Bearer {token}'}, app=app)
+    return _app_state['client'], _app_state['headers']
+
+
+def expect_ok(response):
+    if response.status_code != 200:
+        raise RuntimeError(f"{response.request.path} returned {response.status_code}: {response.get_data(as_text=True)}")
+    return response.get_json()
+
+
+# ============================================================================
+# BENCHMARKS
+# ============================================================================
+
+@benchmark('web_ui.market_order')
+def bench_market_order(_):
+    client, headers = web_app()
+    sides = {'next': 'BUY'}
+    
+    def op():
+        # Alternate sides so the position stays flat
+        side = sides['next']
+        sides['next'] = 'SELL' if side == 'BUY' else 'BUY'
+        expect_ok(client.post('/api/market_order', headers=headers,
+                              json={'symbol': 'BTCUSDT', 'side': side, 'quantity': 0.001}))
+    return op
+
+
+@benchmark('web_ui.limit_and_cancel')
+def bench_limit_and_cancel(_):
+    client, headers = web_app()
+    
+    def op():
+        placed = expect_ok(client.post('/api/limit_order', headers=headers,
+                                       json={'symbol': 'BTCUSDT', 'side': 'BUY', 'quantity': 0.001,
+                                             'price': 50000}))
+        expect_ok(client.post('/api/cancel_order', headers=headers,
+                              json={'symbol': 'BTCUSDT', 'order_id': placed['order_id']}))
+    return {'op': op, 'units': 2}
+
+
+@benchmark('request.public')
+def bench_public_request(_):
+    client, _headers = web_app()
+    return lambda: expect_ok(client.get('/api/price/BTCUSDT'))
+
+
+@benchmark('request.authenticated')
+def bench_authenticated_request(_):
+    client, headers = web_app()
+    return lambda: expect_ok(client.get('/api/open_orders', headers=headers))
+
+
+@benchmark('jwt.verify')
+def bench_jwt_verify(_):
+    from flask_jwt_extended import verify_jwt_in_request
+    web_app()
+    app, headers = _app_state['app'], _app_state['headers']
+    
+    def op():
+        with app.test_request_context('/api/open_orders', headers=headers):
+            verify_jwt_in_request()
+    return op
+
+
+@benchmark('feed.process_message', params=(0, 1, 4))
+def bench_process_message(callbacks):
+    """Per-message cost with 0, 1 and 4 async price callbacks"""
+    from websocket_prices import WebSocketPriceFeed
+    from exchange_sim import Market
+    
+    feed = WebSocketPriceFeed()
+    
+    async def on_price(symbol, data):
+        pass
+    
+    for _ in range(callbacks):
+        feed.add_price_callback(on_price)
+    
+    batch = 1000
+    markets = [Market(symbol, price) for symbol, price in
+               (('BTCUSDT', 65000), ('ETHUSDT', 3500), ('SOLUSDT', 150), ('XRPUSDT', 0.6))]
+    messages = []
+    for i in range(batch):
+        market = markets[i % len(markets)]
+        market.price = market.round_price(market.price * (1.0001 if i % 3 else 0.9999))
+        messages.append(market.ticker_event())
+    
+    loop = asyncio.new_event_loop()
+    
+    async def process_all():
+        for msg in messages:
+            await feed._process_message(msg)
+    
+    return {'op': lambda: loop.run_until_complete(process_all()), 'units': batch}
+
+
+@benchmark('order_history.add_order', params=(100, 1000, 10000))
+def bench_order_history(retention):
+    """One add (including the JSON rewrite) with a full history of `retention` orders"""
+    from order_history import OrderHistory
+    
+    history = OrderHistory(os.path.join(os.getcwd(), f'history-{retention}.json'), max_orders=retention)
+    history.history = [{
+        'timestamp': datetime(2024, 1, 1).isoformat(),
+        'order_type': 'LIMIT',
+        'symbol': 'BTCUSDT',
+        'side': 'BUY',
+        'quantity': 0.001,
+        'price': 60000 + i,
+        'order_id': 8389765000000 + i,
+        'status': 'NEW',
+        'additional_info': {},
+    } for i in range(retention)]
+    
+    return lambda: history.add_order('LIMIT', 'BTCUSDT', 'BUY', 0.001, 60000.0, 1, 'NEW')
+
+
+@benchmark('grid.setup', params=(10, 50, 200))
+def bench_grid_setup(levels):
+    """setup_grid with N levels; the orders are cancelled (untimed) after each run"""
+    from advanced.grid import GridBot
+    
+    bot = GridBot('bench-grid-key', 'bench-grid-secret', testnet=True)
+    
+    def op():
+        placed = bot.setup_grid('ETHUSDT', 3000, 4000, levels, 0.1)
+        if not placed:
+            raise RuntimeError('Grid setup placed no orders')
+    
+    return {'op': op, 'teardown': lambda: bot.cancel_all_grid_orders('ETHUSDT')}
+
+
+# ============================================================================
+# RUNNER
+# ============================================================================
+
+def measure(op, units: int, teardown, repeat: int, min_time: float) -> dict:
+    """Time op: calibrate calls per sample to at least min_time, then take repeat samples"""
+    op()
+    if teardown:
+        teardown()
+    
+    number = 1
+    if teardown is None:
+        while True:
+            started = time.perf_counter()
+            for _ in range(number):
+                op()
+            if time.perf_counter() - started >= min_time or number >= 1 << 20:
+                break
+            number *= 2
+    
+    samples = []
+    for _ in range(repeat):
+        if teardown is None:
+            started = time.perf_counter()
+            for _ in range(number):
+                op()
+            samples.append((time.perf_counter() - started) / (number * units))
+        else:
+            started = time.perf_counter()
+            op()
+            samples.append((time.perf_counter() - started) / units)
+            teardown()
+    
+    median = statistics.median(samples)
+    return {
+        'units': units,
+        'number': number,
+        'repeat': repeat,
+        'min_s': min(samples),
+        'median_s': median,
+        'mean_s': statistics.mean(samples),
+        'stdev_s': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        'ops_per_s': round(1 / median, 1) if median else None,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=SRC, text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run(filters, repeat: int, min_time: float) -> list:
+    results = []
+    for name, params, fn in BENCHMARKS:
+        if filters and not any(f in name for f in filters):
+            continue
+        for param in params:
+            label = name if param is None else f"{name}[{param}]"
+            prepared = fn(param)
+            if callable(prepared):
+                prepared = {'op': prepared}
+            result = {'name': name, 'param': param}
+            result.update(measure(prepared['op'], prepared.get('units', 1), prepared.get('teardown'),
+                                  repeat, min_time))
+            results.append(result)
+            print(f"{label:<40} {result['median_s'] * 1e6:>12.1f} us/op  {result['ops_per_s']:>12} ops/s",
+                  file=sys.stderr)
+    return results
+
+
+def compare(results: list, baseline_path: str):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {(r['name'], r['param']): r for r in baseline['results']}
+    
+    print(f"\nvs {baseline_path} ({baseline.get('commit', 'unknown')[:10]})", file=sys.stderr)
+    for result in results:
+        old = previous.get((result['name'], result['param']))
+        if not old:
+            continue
+        ratio = result['median_s'] / old['median_s'] if old['median_s'] else float('inf')
+        label = result['name'] if result['param'] is None else f"{result['name']}[{result['param']}]"
+        print(f"{label:<40} {ratio:>7.2f}x {'slower' if ratio > 1 else 'faster'}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the order, feed and persistence hot paths')
+    parser.add_argument('--filter', nargs='*', default=[], help='Only run benchmarks whose name contains one of these')
+    parser.add_argument('--repeat', type=int, default=7)
+    parser.add_argument('--min-time', type=float, default=0.1, help='Minimum seconds per sample')
+    parser.add_argument('--exchange-url', help='Use a REST simulator (python exchange_sim.py) instead of the in-process one')
+    parser.add_argument('--output', help='Write JSON results to this file')
+    parser.add_argument('--compare', help='Print speed ratios against a previous results file')
+    args = parser.parse_args()
+    
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.compare) if args.compare else None
+    workdir = tempfile.mkdtemp(prefix='bench-')
+    configure(workdir, args.exchange_url)
+    
+    report = {
+        'suite': 'hot_paths',
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'exchange': args.exchange_url or 'in-process simulator',
+        'sim_latency_ms': float(os.getenv('SIM_LATENCY_MS', 0)),
+        'results': run(args.filter, args.repeat, args.min_time),
+    }
+    
+    print(json.dumps(report, indent=2))
+    if output:
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if baseline:
+        compare(report['results'], baseline)
+
+
+if __name__ == '__main__':
+    main()
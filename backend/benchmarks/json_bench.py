@@ -0,0 +1,94 @@
+"""
+Serialization and compression benchmark for order history payloads
+
+Compares the stdlib encoder (what Flask's default provider uses) with the
+fast provider in json_provider.py, and reports bytes on the wire for raw,
+gzip and brotli bodies at several history page sizes.
+
+Usage:
+    python json_bench.py --sizes 50 500 5000 --output results.jsonl
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from json_provider import _default, dumps_bytes, orjson  # noqa: E402
+from compression import brotli, compress  # noqa: E402
+
+
+def make_history(count: int) -> dict:
+    """A /api/order_history style response with count orders"""
+    rng = random.Random(42)
+    start = datetime(2024, 1, 1)
+    orders = []
+    for i in range(count):
+        orders.append({
+            'user_email': 'trader@example.com',
+            'order_type': rng.choice(['MARKET', 'LIMIT', 'STOP_LIMIT']),
+            'symbol': rng.choice(['BTCUSDT', 'ETHUSDT', 'SOLUSDT']),
+            'side': rng.choice(['BUY', 'SELL']),
+            'quantity': round(rng.uniform(0.001, 2), 3),
+            'price': round(rng.uniform(1000, 70000), 2),
+            'order_id': 8389765000000 + i,
+            'status': rng.choice(['FILLED', 'NEW', 'CANCELED']),
+            'timestamp': start + timedelta(seconds=i * 37),
+        })
+    return {'success': True, 'history': orders}
+
+
+def stdlib_dumps(obj) -> bytes:
+    return json.dumps(obj, default=_default, sort_keys=True, ensure_ascii=True).encode('utf-8')
+
+
+def timeit(fn, payload, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(payload)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def run(size: int, repeat: int) -> dict:
+    payload = make_history(size)
+    body = dumps_bytes(payload)
+    result = {
+        'orders': size,
+        'serializer': 'orjson' if orjson else 'stdlib',
+        'stdlib_ms': round(timeit(stdlib_dumps, payload, repeat) * 1000, 3),
+        'fast_ms': round(timeit(dumps_bytes, payload, repeat) * 1000, 3),
+        'raw_bytes': len(body),
+        'gzip_bytes': len(compress(body, 'gzip')),
+        'gzip_ms': round(timeit(lambda b: compress(b, 'gzip'), body, repeat) * 1000, 3),
+    }
+    if brotli is not None:
+        result['br_bytes'] = len(compress(body, 'br'))
+        result['br_ms'] = round(timeit(lambda b: compress(b, 'br'), body, repeat) * 1000, 3)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark JSON serialization and compression')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 500, 5000])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--output', help='Append JSON results to this file')
+    args = parser.parse_args()
+    
+    results = [run(size, args.repeat) for size in args.sizes]
+    for result in results:
+        print(json.dumps(result))
+    
+    if args.output:
+        with open(args.output, 'a') as f:
+            for result in results:
+                f.write(json.dumps(result) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+HTTP load benchmark for the web API
+
+Fires concurrent requests at a running server and reports requests/sec
+and latency percentiles, so the sync (gunicorn web_ui:app) and ASGI
+(uvicorn asgi_app:app) serving modes can be compared on the same routes.
+
+Usage:
+    python load_test.py --url http://localhost:5001 --path /api/price/BTCUSDT
+    python load_test.py --url http://localhost:5001 --path /api/order_history \
+        --token <JWT access token> --concurrency 64 --requests 5000
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import aiohttp
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run(url: str, method: str, body: dict, headers: dict, total: int, concurrency: int):
+    latencies = []
+    statuses = {}
+    remaining = iter(range(total))
+    
+    async def worker(session):
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                async with session.request(method, url, json=body, headers=headers) as response:
+                    await response.read()
+                    status = response.status
+            except aiohttp.ClientError:
+                status = 'error'
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+    
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    
+    return {
+        'url': url,
+        'method': method,
+        'requests': total,
+        'concurrency': concurrency,
+        'elapsed_s': round(elapsed, 3),
+        'requests_per_s': round(total / elapsed, 1),
+        'latency_ms': {
+            'mean': round(statistics.mean(latencies) * 1000, 2),
+            'p50': round(percentile(latencies, 50) * 1000, 2),
+            'p95': round(percentile(latencies, 95) * 1000, 2),
+            'p99': round(percentile(latencies, 99) * 1000, 2),
+            'max': round(max(latencies) * 1000, 2),
+        },
+        'status_codes': {str(k): v for k, v in statuses.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test a running API server')
+    parser.add_argument('--url', default='http://localhost:5001', help='Server base URL')
+    parser.add_argument('--path', default='/api/price/BTCUSDT', help='Route to request')
+    parser.add_argument('--method', default='GET')
+    parser.add_argument('--body', help='JSON request body')
+    parser.add_argument('--token', help='JWT access token for protected routes')
+    parser.add_argument('--requests', type=int, default=2000, help='Total requests')
+    parser.add_argument('--concurrency', type=int, default=32, help='Concurrent connections')
+    parser.add_argument('--label', help='Name for this run (e.g. sync, asgi)')
+    parser.add_argument('--output', help='Append the JSON result to this file')
+    args = parser.parse_args()
+    
+    headers = {'Authorization': f'Bearer {args.token}'} if args.token else {}
+    body = json.loads(args.body) if args.body else None
+    
+    result = asyncio.run(run(args.url.rstrip('/') + args.path, args.method.upper(), body,
+                             headers, args.requests, args.concurrency))
+    result['label'] = args.label
+    print(json.dumps(result, indent=2))
+    
+    if args.output:
+        with open(args.output, 'a') as f:
+            f.write(json.dumps(result) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+"""
+Account and position snapshot cache
+
+Each bot session keeps an AccountState seeded once from futures_account()
+and then updated from ACCOUNT_UPDATE events on the user-data stream.
+A slow REST reconciliation replaces the snapshot periodically, to pick up
+fields the stream doesn't carry (e.g. availableBalance) and to correct
+any missed events. Balance/position reads are served from memory.
+
+The stream carries per-asset wallet balances but no prices, so account
+totals can't be recomputed from it: only the margin asset's change is
+applied to totalWalletBalance, the snapshot is flagged stale, and a stale
+snapshot is reconciled within ACCOUNT_STALE_RECONCILE_SECONDS.
+
+All user-data streams in a process share one asyncio loop running on a
+background thread.
+"""
+import asyncio
+import os
+import threading
+import time
+from exchange import create_async_client, socket_manager
+from logger import logger
+
+# Totals of a USDT-M account are denominated in USDT
+MARGIN_ASSET = 'USDT'
+
+
+class AccountState:
+    """In-memory copy of a futures account's balances and positions"""
+    
+    def __init__(self):
+        self.assets = {}      # asset -> balance fields
+        self.positions = {}   # (symbol, positionSide) -> position fields
+        self.totals = {}
+        self.seeded = False
+        self.stale = False    # totals/availableBalance predate stream updates
+        self.updated_at = None
+        self.source = None
+        self._lock = threading.Lock()
+    
+    def seed(self, account: dict):
+        """Replace the snapshot with a futures_account() response"""
+        with self._lock:
+            self.assets = {
+                a['asset']: {
+                    'walletBalance': float(a.get('walletBalance', 0)),
+                    'crossWalletBalance': float(a.get('crossWalletBalance', 0)),
+                    'availableBalance': float(a.get('availableBalance', 0)),
+                    'unrealizedProfit': float(a.get('unrealizedProfit', 0)),
+                }
+                for a in account.get('assets', [])
+            }
+            self.positions = {}
+            for p in account.get('positions', []):
+                self._set_position(
+                    p['symbol'], p.get('positionSide', 'BOTH'),
+                    float(p.get('positionAmt', 0)), float(p.get('entryPrice', 0)),
+                    float(p.get('unrealizedProfit', 0)), p.get('leverage')
+                )
+            self.totals = {
+                key: float(account.get(key, 0))
+                for key in ('totalWalletBalance', 'availableBalance', 'totalUnrealizedProfit',
+                            'totalMarginBalance', 'maxWithdrawAmount')
+            }
+            self.seeded = True
+            self.stale = False
+            self.updated_at = time.time()
+            self.source = 'rest'
+    
+    def _set_position(self, symbol, side, amount, entry_price, unrealized, leverage=None):
+        key = (symbol, side)
+        if amount == 0:
+            self.positions.pop(key, None)
+            return
+        position = self.positions.setdefault(key, {'symbol': symbol, 'positionSide': side})
+        position.update({
+            'positionAmt': amount,
+            'entryPrice': entry_price,
+            'unrealizedProfit': unrealized,
+        })
+        if leverage is not None:
+            position['leverage'] = leverage
+    
+    def apply_account_update(self, event: dict):
+        """Apply an ACCOUNT_UPDATE user-data event"""
+        data = event.get('a', {})
+        with self._lock:
+            for b in data.get('B', []):
+                asset = self.assets.setdefault(b['a'], {})
+                wallet = float(b['wb'])
+                if b['a'] == MARGIN_ASSET and 'totalWalletBalance' in self.totals:
+                    # Other assets would need a price conversion; the reconcile picks them up
+                    self.totals['totalWalletBalance'] += wallet - asset.get('walletBalance', 0)
+                asset['walletBalance'] = wallet
+                asset['crossWalletBalance'] = float(b['cw'])
+            
+            for p in data.get('P', []):
+                self._set_position(p['s'], p.get('ps', 'BOTH'), float(p['pa']),
+                                   float(p['ep']), float(p['up']))
+            
+            self.totals['totalUnrealizedProfit'] = sum(
+                p['unrealizedProfit'] for p in self.positions.values()
+            )
+            self.stale = True
+            self.updated_at = event.get('E', time.time() * 1000) / 1000
+            self.source = 'stream'
+    
+    def balance_snapshot(self) -> dict:
+        with self._lock:
+            return {
+                **self.totals,
+                'assets': [{'asset': name, **fields} for name, fields in self.assets.items()
+                           if fields.get('walletBalance')],
+                'updated_at': self.updated_at,
+                'source': self.source,
+                'stale': self.stale,
+            }
+    
+    def positions_snapshot(self) -> list:
+        with self._lock:
+            return [dict(p) for p in self.positions.values()]
+
+
+class AccountStreamManager:
+    """Runs every session's user-data stream on one shared event loop"""
+    
+    def __init__(self, reconcile_seconds: float = None, stale_reconcile_seconds: float = None):
+        self.reconcile_seconds = reconcile_seconds or float(os.getenv('ACCOUNT_RECONCILE_SECONDS', 300))
+        self.stale_reconcile_seconds = stale_reconcile_seconds or float(
+            os.getenv('ACCOUNT_STALE_RECONCILE_SECONDS', 5)
+        )
+        self._loop = None
+        self._thread = None
+        self._pid = None
+        self._tasks = {}  # BotSession -> stream task future
+        self._lock = threading.Lock()
+    
+    def _ensure_loop(self):
+        if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._tasks = {}
+            self._loop = asyncio.new_event_loop()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._loop.run_forever, name='account-streams', daemon=True)
+            self._thread.start()
+    
+    def start(self, session):
+        """Seed the session's account state and start streaming updates"""
+        self._ensure_loop()
+        with self._lock:
+            running = self._tasks.get(session)
+            if running and not running.done():
+                return
+            self._tasks[session] = asyncio.run_coroutine_threadsafe(self._stream(session), self._loop)
+    
+    def stop(self, session):
+        """Stop a session's stream"""
+        with self._lock:
+            running = self._tasks.pop(session, None)
+        if running:
+            running.cancel()
+    
+    def is_streaming(self, session) -> bool:
+        running = self._tasks.get(session)
+        return bool(running and not running.done())
+    
+    async def _reconcile(self, session):
+        """Reseed the snapshot from REST (runs the blocking call off the loop)"""
+        loop = asyncio.get_running_loop()
+        account = await loop.run_in_executor(None, session.client.futures_account)
+        session.account.seed(account)
+    
+    def _reconcile_due(self, session, last_reconcile: float) -> float:
+        """Seconds until the next REST reconcile (sooner once stream updates made totals stale)"""
+        interval = self.reconcile_seconds
+        if session.account.stale:
+            interval = min(interval, self.stale_reconcile_seconds)
+        return interval - (time.monotonic() - last_reconcile)
+    
+    async def _stream(self, session):
+        client = None
+        try:
+            if not session.account.seeded:
+                await self._reconcile(session)
+            last_reconcile = time.monotonic()
+            
+            while True:
+                try:
+                    client = await create_async_client(session.client.API_KEY, session.client.API_SECRET,
+                                                      testnet=session.testnet)
+                    socket = socket_manager(client).futures_user_socket()
+                    logger.info(f"User-data stream started: {session.email}")
+                    
+                    async with socket as stream:
+                        while True:
+                            timeout = max(0.1, self._reconcile_due(session, last_reconcile))
+                            try:
+                                msg = await asyncio.wait_for(stream.recv(), timeout=timeout)
+                            except asyncio.TimeoutError:
+                                msg = None
+                            
+                            if msg and msg.get('e') == 'ACCOUNT_UPDATE':
+                                session.account.apply_account_update(msg)
+                            if msg:
+                                session.dispatch_user_event(msg)
+                            
+                            if self._reconcile_due(session, last_reconcile) <= 0:
+                                await self._reconcile(session)
+                                last_reconcile = time.monotonic()
+                
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"User-data stream error ({session.email}): {e}")
+                    await asyncio.sleep(5)
+                finally:
+                    if client:
+                        await client.close_connection()
+                        client = None
+        
+        except asyncio.CancelledError:
+            logger.info(f"User-data stream stopped: {session.email}")
+        except Exception as e:
+            logger.error(f"Account state error ({session.email}): {e}")
+
+
+# Global stream manager
+account_streams = AccountStreamManager()
@@ -0,0 +1,118 @@
+"""
+Bracket order implementation
+Entry, take profit and stop loss go out in a single batchOrders request,
+so the position is protected in one round trip instead of three
+sequential calls. The exits are reduce-only: once one of them closes the
+position, the other expires when it triggers instead of opening a new one.
+If the exchange rejects any leg, the bracket is unwound: the accepted legs
+are cancelled and a filled entry is closed, so no position is left with
+only half of its protection
+"""
+import json
+import uuid
+from binance.exceptions import BinanceAPIException
+from base_bot import BaseBot
+from logger import logger
+
+# Bracket legs carry client order IDs bracket_<bracket ID>_<leg>
+BRACKET_ORDER_PREFIX = 'bracket_'
+
+class BracketBot(BaseBot):
+    """Bot for placing bracket orders (Entry + Take Profit + Stop Loss)"""
+    
+    def place_bracket_order(self, symbol: str, side: str, quantity: float, take_profit_price: float,
+                            stop_loss_price: float, entry_price: float = None):
+        """
+        Place a bracket order
+        
+        Args:
+            symbol: Trading pair
+            side: BUY or SELL (for the entry)
+            quantity: Order quantity
+            take_profit_price: Take profit trigger price
+            stop_loss_price: Stop loss trigger price
+            entry_price: Limit price for the entry (default: market)
+        
+        Returns:
+            Tuple of (entry_order, take_profit_order, stop_loss_order)
+        """
+        try:
+            reference = entry_price or self.get_current_price(symbol)
+            if side == 'BUY' and not stop_loss_price < reference < take_profit_price:
+                raise ValueError("A BUY bracket needs stop loss < entry < take profit")
+            if side == 'SELL' and not take_profit_price < reference < stop_loss_price:
+                raise ValueError("A SELL bracket needs take profit < entry < stop loss")
+            
+            bracket_id = uuid.uuid4().hex[:12]
+            exit_side = 'SELL' if side == 'BUY' else 'BUY'
+            entry = {'symbol': symbol, 'side': side, 'quantity': quantity,
+                     'newClientOrderId': f"{BRACKET_ORDER_PREFIX}{bracket_id}_entry"}
+            if entry_price:
+                entry.update({'type': 'LIMIT', 'timeInForce': 'GTC', 'price': entry_price})
+            else:
+                entry['type'] = 'MARKET'
+            exits = [
+                {'symbol': symbol, 'side': exit_side, 'type': 'TAKE_PROFIT_MARKET', 'quantity': quantity,
+                 'stopPrice': take_profit_price, 'reduceOnly': 'true',
+                 'newClientOrderId': f"{BRACKET_ORDER_PREFIX}{bracket_id}_tp"},
+                {'symbol': symbol, 'side': exit_side, 'type': 'STOP_MARKET', 'quantity': quantity,
+                 'stopPrice': stop_loss_price, 'reduceOnly': 'true',
+                 'newClientOrderId': f"{BRACKET_ORDER_PREFIX}{bracket_id}_sl"},
+            ]
+            
+            results = self.client.futures_place_batch_order(batchOrders=[entry] + exits)
+            
+            failed = [(leg, r) for leg, r in zip(('Entry', 'Take Profit', 'Stop Loss'), results) if 'orderId' not in r]
+            if failed:
+                for leg, result in failed:
+                    logger.error(f"Bracket {bracket_id} {leg} rejected: {result.get('msg')}")
+                self._unwind(symbol, bracket_id, exit_side, results)
+                return None, None, None
+            
+            entry_order, tp_order, sl_order = results
+            logger.info(
+                "✓ Bracket %s placed: %s %s %s @ %s | TP %s SL %s | IDs %s/%s/%s | entry %s",
+                bracket_id, side, quantity, symbol, entry_price or 'MARKET', take_profit_price, stop_loss_price,
+                entry_order['orderId'], tp_order['orderId'], sl_order['orderId'], entry_order['status'],
+                extra={'event': 'order_placed', 'order_type': 'BRACKET', 'symbol': symbol, 'side': side,
+                       'quantity': quantity, 'bracket_id': bracket_id, 'entry_price': entry_price,
+                       'take_profit_price': take_profit_price, 'stop_loss_price': stop_loss_price,
+                       'order_id': entry_order['orderId'], 'take_profit_order_id': tp_order['orderId'],
+                       'stop_loss_order_id': sl_order['orderId'], 'status': entry_order['status']}
+            )
+            
+            return entry_order, tp_order, sl_order
+        
+        except BinanceAPIException as e:
+            logger.error(f"Binance API Error: {e.message}")
+            return None, None, None
+        except Exception as e:
+            logger.error(f"Error placing bracket order: {e}")
+            return None, None, None
+    
+    def _unwind(self, symbol: str, bracket_id: str, exit_side: str, results: list):
+        """Cancel the accepted legs of a partly rejected bracket and close a filled entry"""
+        entry = results[0]
+        # A market entry can't be cancelled; a limit entry's unfilled rest can
+        order_ids = [r['orderId'] for r in results
+                     if 'orderId' in r and (r is not entry or entry['type'] != 'MARKET')]
+        if order_ids:
+            try:
+                self.client.futures_cancel_orders(symbol=symbol, orderIdList=json.dumps(order_ids))
+                logger.info(f"Bracket {bracket_id}: cancelled {len(order_ids)} remaining orders")
+            except Exception as e:
+                logger.error(f"Bracket {bracket_id} cleanup failed, cancel orders {order_ids} manually: {e}")
+        if 'orderId' not in entry:
+            return
+        
+        # Checked after the cancel, so a limit entry that filled meanwhile is caught too
+        try:
+            filled = self.client.futures_get_order(symbol=symbol, orderId=entry['orderId'])['executedQty']
+            if float(filled) > 0:
+                close = self.client.futures_create_order(symbol=symbol, side=exit_side, type='MARKET',
+                                                         quantity=filled, reduceOnly='true')
+                logger.info(f"Bracket {bracket_id}: closed the unprotected entry fill of {filled} "
+                            f"(order {close['orderId']})")
+        except Exception as e:
+            logger.error(f"Bracket {bracket_id}: entry filled but could not be closed, "
+                         f"the position is not fully protected: {e}")
@@ -1,15 +1,162 @@
 """
 Grid trading strategy implementation
+
+GridBot.setup_grid places a one-shot ladder of limit orders. GridEngine
+runs grids live: every fill is answered with the opposite order one
+level away (a filled BUY at level i becomes a SELL at i + 1, a filled
+SELL at i a BUY at i - 1), so the grid keeps trading the range.
+
+The engine listens to each owner's user-data stream (via the bot
+session), hands ORDER_TRADE_UPDATE fills to a single worker thread and
+places counter orders through the batch endpoint, five per request. A
+periodic reconcile against the open orders catches fills missed while a
+stream was reconnecting. Orders are sent without holding the engine lock:
+their levels are claimed first, so a slow exchange call for one grid
+doesn't hold up fills, stops or listings of the others.
+
+Bound to a database, the engine keeps each grid's state in the 'grids'
+collection, so any worker can list or stop it. The worker that runs a
+grid holds a lease on it, renewed on every save. When a worker dies, its
+lease runs out after three reconcile intervals and another worker's
+reconcile pass adopts the grid. Once bound to the session manager, the engine follows each owner's
+current session: a session rebuilt after eviction is picked up as soon
+as it is created, and the reconcile pass looks the session up by email
+(which also keeps it from idling out while the grid runs).
 """
+import json
+import os
+import queue
+import socket
+import threading
+import time
+import uuid
+import weakref
+from datetime import datetime
+from decimal import Decimal
+import numpy as np
 from binance.exceptions import BinanceAPIException
 from base_bot import BaseBot
 from logger import logger
 
+# Binance accepts at most 5 orders per batchOrders POST and 10 IDs per DELETE
+ORDER_BATCH_SIZE = 5
+CANCEL_BATCH_SIZE = 10
+
+SPACINGS = ('arithmetic', 'geometric', 'atr')
+
+# Grid orders carry client order IDs grid_<grid ID>_<n> (Binance allows
+# 36 characters), so a grid's orders can be told apart from anything else
+# resting on the same symbol
+GRID_ORDER_PREFIX = 'grid_'
+
+
+def new_grid_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+def grid_order_id(grid_id: str, n: int) -> str:
+    """Client order ID for a grid's n-th order"""
+    return f"{GRID_ORDER_PREFIX}{grid_id}_{n}"
+
+
+def cancel_in_batches(client, symbol: str, order_ids=(), client_order_ids=()) -> list:
+    """
+    Cancel specific orders, ten per batch request
+    
+    Returns:
+        Per-order results (orders, or {'code', 'msg'} for failures)
+    """
+    results = []
+    for key, ids in (('orderIdList', list(order_ids)), ('origClientOrderIdList', list(client_order_ids))):
+        for start in range(0, len(ids), CANCEL_BATCH_SIZE):
+            chunk = ids[start:start + CANCEL_BATCH_SIZE]
+            try:
+                results.extend(client.futures_cancel_orders(symbol=symbol,
+                                                            **{key: json.dumps(chunk, separators=(',', ':'))}))
+            except Exception as e:
+                logger.error(f"Batch cancel failed for {symbol}: {e}")
+                results.extend({'code': getattr(e, 'code', None), 'msg': str(e)} for _ in chunk)
+    return results
+
+
+def grid_levels(lower_price: float, upper_price: float, num_grids: int, spacing: str = 'arithmetic',
+                center: float = None, step: float = None) -> np.ndarray:
+    """
+    Grid prices within [lower_price, upper_price], ascending
+    
+    Args:
+        spacing: 'arithmetic' (equal price steps), 'geometric' (equal
+                 percentage steps) or 'atr' (levels every `step` from
+                 `center`, keeping the num_grids nearest to it)
+        center: Anchor price for 'atr' spacing, usually the current price
+        step: Level spacing for 'atr', usually a multiple of the ATR
+    
+    Returns:
+        Array of level prices
+    """
+    if spacing == 'arithmetic':
+        return np.linspace(lower_price, upper_price, num_grids)
+    if spacing == 'geometric':
+        return np.geomspace(lower_price, upper_price, num_grids)
+    if spacing == 'atr':
+        if not step or step <= 0 or center is None:
+            raise ValueError("ATR spacing needs a positive step and a center price")
+        offsets = np.arange(np.ceil((lower_price - center) / step), np.floor((upper_price - center) / step) + 1)
+        if len(offsets) > num_grids:
+            offsets = np.sort(offsets[np.argsort(np.abs(offsets), kind='stable')[:num_grids]])
+        return center + offsets * step
+    raise ValueError(f"Unknown grid spacing: {spacing}")
+
+
+def average_true_range(high, low, close, period: int = 14) -> float:
+    """Mean true range over the last `period` bars (needs period + 1 bars)"""
+    high, low, close = (np.asarray(a, dtype=np.float64) for a in (high, low, close))
+    previous = close[:-1]
+    true_range = np.maximum(high[1:] - low[1:],
+                            np.maximum(np.abs(high[1:] - previous), np.abs(low[1:] - previous)))
+    return float(true_range[-period:].mean())
+
+
+def _decimals(increment: str) -> int:
+    """Decimal places of a tickSize / stepSize string ('0.10' -> 1)"""
+    return max(0, -Decimal(increment).normalize().as_tuple().exponent)
+
+
 class GridBot(BaseBot):
     """Bot for grid trading strategy"""
     
+    # Candles used for ATR spacing
+    ATR_INTERVAL = os.getenv('GRID_ATR_INTERVAL', '1h')
+    ATR_PERIOD = int(os.getenv('GRID_ATR_PERIOD', 14))
+    
+    def average_true_range(self, symbol: str) -> float:
+        """ATR of the symbol's recent futures candles"""
+        klines = self.client.futures_klines(symbol=symbol, interval=self.ATR_INTERVAL, limit=self.ATR_PERIOD + 1)
+        bars = np.asarray([k[2:5] for k in klines], dtype=np.float64)
+        if len(bars) < 2:
+            raise ValueError(f"Not enough {self.ATR_INTERVAL} candles for {symbol} to compute ATR")
+        return average_true_range(bars[:, 0], bars[:, 1], bars[:, 2], self.ATR_PERIOD)
+    
+    def compute_levels(self, symbol: str, lower_price: float, upper_price: float, num_grids: int,
+                       spacing: str = 'arithmetic', atr_multiplier: float = 1.0,
+                       current_price: float = None) -> np.ndarray:
+        """
+        Grid level prices for a spacing mode (see grid_levels)
+        
+        'atr' spaces levels atr_multiplier x ATR apart around the current
+        price, so the grid widens in volatile markets and tightens in
+        quiet ones.
+        """
+        if spacing != 'atr':
+            return grid_levels(lower_price, upper_price, num_grids, spacing)
+        center = current_price or self.get_current_price(symbol)
+        step = atr_multiplier * self.average_true_range(symbol)
+        logger.info(f"ATR spacing for {symbol}: step {step:.8g} around {center}")
+        return grid_levels(lower_price, upper_price, num_grids, 'atr', center=center, step=step)
+    
     def setup_grid(self, symbol: str, lower_price: float, upper_price: float,
-                   num_grids: int, quantity_per_grid: float):
+                   num_grids: int, quantity_per_grid: float, spacing: str = 'arithmetic',
+                   atr_multiplier: float = 1.0, grid_id: str = None):
         """
         Setup grid trading orders
         
@@ -19,24 +166,27 @@ class GridBot(BaseBot):
             upper_price: Upper bound of grid
             num_grids: Number of grid levels
             quantity_per_grid: Quantity for each grid order
-            
+            spacing: 'arithmetic', 'geometric' or 'atr'
+            atr_multiplier: Level spacing in ATRs (for 'atr')
+            grid_id: Tag for the grid's client order IDs (generated if omitted)
+        
         Returns:
             List of placed orders
         """
         try:
-            logger.info(f"Setting up Grid Trading for {symbol}")
-            logger.info(f"Range: {lower_price} - {upper_price}, Grids: {num_grids}")
+            grid_id = grid_id or new_grid_id()
+            logger.info(f"Setting up Grid Trading for {symbol} (grid {grid_id})")
+            logger.info(f"Range: {lower_price} - {upper_price}, Grids: {num_grids}, Spacing: {spacing}")
             
             current_price = self.get_current_price(symbol)
             logger.info(f"Current price: {current_price}")
             
-            # Calculate grid levels
-            price_step = (upper_price - lower_price) / (num_grids - 1)
-            grid_levels = [lower_price + (i * price_step) for i in range(num_grids)]
-            
             placed_orders = []
+            levels = self.compute_levels(symbol, lower_price, upper_price, num_grids, spacing,
+                                         atr_multiplier, current_price)
+            price_decimals, _ = self.precision(symbol)
             
-            for level in grid_levels:
+            for n, level in enumerate(levels.tolist()):
                 # Place buy orders below current price
                 if level < current_price:
                     try:
@@ -46,10 +196,11 @@ class GridBot(BaseBot):
                             type='LIMIT',
                             timeInForce='GTC',
                             quantity=quantity_per_grid,
-                            price=round(level, 2)
+                            price=round(level, price_decimals),
+                            newClientOrderId=grid_order_id(grid_id, n)
                         )
                         placed_orders.append(order)
-                        logger.info(f"✓ BUY grid order @ {level:.2f}, Order ID: {order['orderId']}")
+                        logger.debug("✓ BUY grid order @ %.2f, Order ID: %s", level, order['orderId'])
                     except Exception as e:
                         logger.error(f"Failed to place BUY order @ {level:.2f}: {e}")
                 
@@ -62,16 +213,17 @@ class GridBot(BaseBot):
                             type='LIMIT',
                             timeInForce='GTC',
                             quantity=quantity_per_grid,
-                            price=round(level, 2)
+                            price=round(level, price_decimals),
+                            newClientOrderId=grid_order_id(grid_id, n)
                         )
                         placed_orders.append(order)
-                        logger.info(f"✓ SELL grid order @ {level:.2f}, Order ID: {order['orderId']}")
+                        logger.debug("✓ SELL grid order @ %.2f, Order ID: %s", level, order['orderId'])
                     except Exception as e:
                         logger.error(f"Failed to place SELL order @ {level:.2f}: {e}")
             
             logger.info(f"✓ Grid setup completed! {len(placed_orders)} orders placed")
             return placed_orders
-            
+        
         except BinanceAPIException as e:
             logger.error(f"Binance API Error: {e.message}")
             return []
@@ -79,16 +231,654 @@ class GridBot(BaseBot):
             logger.error(f"Error setting up grid: {e}")
             return []
     
-    def cancel_all_grid_orders(self, symbol: str):
-        """Cancel all open orders for the symbol"""
+    def cancel_all_grid_orders(self, symbol: str, grid_id: str = None):
+        """
+        Cancel the symbol's grid orders, leaving every other order in place
+        
+        Args:
+            symbol: Trading pair
+            grid_id: Only this grid's orders (default: every grid's)
+        
+        Returns:
+            Per-order cancel results
+        """
         try:
-            logger.info(f"Cancelling all grid orders for {symbol}")
+            logger.info(f"Cancelling {'grid ' + grid_id if grid_id else 'all grid'} orders for {symbol}")
             
-            result = self.client.futures_cancel_all_open_orders(symbol=symbol)
+            prefix = f"{GRID_ORDER_PREFIX}{grid_id}_" if grid_id else GRID_ORDER_PREFIX
+            client_ids = [o['clientOrderId'] for o in self.client.futures_get_open_orders(symbol=symbol)
+                          if o['clientOrderId'].startswith(prefix)]
+            result = cancel_in_batches(self.client, symbol, client_order_ids=client_ids)
             
-            logger.info(f"✓ All grid orders cancelled")
+            logger.info(f"✓ {sum(1 for r in result if 'orderId' in r)} grid orders cancelled")
             return result
-            
+        
         except Exception as e:
             logger.error(f"Error cancelling grid orders: {e}")
             return None
+    
+    def precision(self, symbol: str):
+        """
+        Decimal places allowed by the symbol's tick size and step size
+        (two and three when unknown)
+        
+        Returns:
+            (price_decimals, quantity_decimals)
+        """
+        price_decimals, quantity_decimals = 2, 3
+        info = self.get_symbol_info(symbol) or {}
+        for f in info.get('filters', []):
+            if f.get('filterType') == 'PRICE_FILTER':
+                price_decimals = _decimals(f['tickSize'])
+            elif f.get('filterType') == 'LOT_SIZE':
+                quantity_decimals = _decimals(f['stepSize'])
+        return price_decimals, quantity_decimals
+
+
+class GridState:
+    """A live grid: its level prices and the order resting at each level"""
+    
+    def __init__(self, grid_id: str, session, symbol: str, levels: list, quantity: str,
+                 price_decimals: int, spacing: str = 'arithmetic'):
+        self.id = grid_id
+        self.session = session
+        self.symbol = symbol
+        self.levels = levels
+        self.quantity = quantity
+        self.price_decimals = price_decimals
+        self.spacing = spacing
+        # Indexed by level: resting order ID and side, and for counter
+        # orders the level whose fill they answer
+        self.order_ids = [None] * len(levels)
+        self.sides = [None] * len(levels)
+        self.origins = [None] * len(levels)
+        # Counter orders waiting for a level whose own fill hasn't been
+        # processed yet (fills of one price move can arrive in any order)
+        self.deferred = {}
+        # Levels with an order in flight (claimed until the exchange answers)
+        self.pending = set()
+        self.orders_sent = 0
+        self.fills = 0
+        self.round_trips = 0
+        self.realized = 0.0
+        self.started_at = datetime.utcnow()
+    
+    def to_document(self) -> dict:
+        """Everything another process needs to resume the grid"""
+        return {
+            'grid_id': self.id,
+            'user_email': self.session.email,
+            'symbol': self.symbol,
+            'levels': self.levels,
+            'quantity': self.quantity,
+            'price_decimals': self.price_decimals,
+            'spacing': self.spacing,
+            'order_ids': self.order_ids,
+            'sides': self.sides,
+            'origins': self.origins,
+            'deferred': [[level, side, origin] for level, (side, origin) in self.deferred.items()],
+            'orders_sent': self.orders_sent,
+            'fills': self.fills,
+            'round_trips': self.round_trips,
+            'realized': self.realized,
+            'started_at': self.started_at,
+        }
+    
+    @classmethod
+    def from_document(cls, doc: dict, session=None):
+        grid = cls(doc['grid_id'], session, doc['symbol'], doc['levels'], doc['quantity'],
+                   doc['price_decimals'], doc.get('spacing', 'arithmetic'))
+        grid.order_ids = doc['order_ids']
+        grid.sides = doc['sides']
+        grid.origins = doc['origins']
+        grid.deferred = {level: (side, origin) for level, side, origin in doc.get('deferred', [])}
+        grid.orders_sent = doc['orders_sent']
+        grid.fills = doc['fills']
+        grid.round_trips = doc['round_trips']
+        grid.realized = doc['realized']
+        grid.started_at = doc['started_at']
+        return grid
+    
+    def format_price(self, level: int) -> str:
+        return f"{self.levels[level]:.{self.price_decimals}f}"
+    
+    def assign(self, level: int, side: str, order_id: int, origin: int = None):
+        self.order_ids[level] = order_id
+        self.sides[level] = side
+        self.origins[level] = origin
+    
+    def release(self, level: int):
+        """Clear a level; returns (side, origin) of the order that rested there"""
+        side, origin = self.sides[level], self.origins[level]
+        self.order_ids[level] = self.sides[level] = self.origins[level] = None
+        return side, origin
+    
+    def open_orders(self) -> list:
+        return [order_id for order_id in self.order_ids if order_id is not None]
+    
+    def snapshot(self) -> dict:
+        return {
+            'grid_id': self.id,
+            'symbol': self.symbol,
+            'lower_price': self.levels[0],
+            'upper_price': self.levels[-1],
+            'num_grids': len(self.levels),
+            'spacing': self.spacing,
+            'quantity_per_grid': float(self.quantity),
+            'buy_orders': self.sides.count('BUY'),
+            'sell_orders': self.sides.count('SELL'),
+            'fills': self.fills,
+            'round_trips': self.round_trips,
+            'realized_pnl': round(self.realized, 8),
+            'started_at': self.started_at,
+        }
+
+
+class GridEngine:
+    """Keeps running grids rebalanced from their owners' fill events"""
+    
+    def __init__(self, reconcile_seconds: float = None):
+        self.reconcile_seconds = reconcile_seconds or float(os.getenv('GRID_RECONCILE_SECONDS', 60))
+        self.grids = {}    # grid ID -> GridState
+        self._orders = {}  # (symbol, order ID) -> (GridState, level)
+        # Client order IDs in flight -> stream update that arrived before the exchange answered
+        self._inflight = {}
+        self._listening = weakref.WeakSet()
+        self._updates = queue.SimpleQueue()
+        self._lock = threading.RLock()
+        self._thread = None
+        self._pid = None
+        self._last_reconcile = time.monotonic()
+        self.sessions = None
+        self.db = None
+    
+    def bind(self, sessions, database=None):
+        """
+        Follow the sessions a BotSessionManager creates for grid owners
+        
+        Args:
+            sessions: BotSessionManager
+            database: Database whose 'grids' collection shares grid state
+                      between workers (default: grids stay in memory)
+        """
+        self.sessions = sessions
+        self.db = database
+        sessions.on_session(self._rebind)
+    
+    @property
+    def owner(self) -> str:
+        """Lease holder name of this worker process"""
+        return f"{socket.gethostname()}:{os.getpid()}"
+    
+    @property
+    def lease_seconds(self) -> float:
+        return 3 * self.reconcile_seconds
+    
+    def start(self):
+        """Start the worker thread, which also adopts grids left by dead workers"""
+        self._ensure_worker()
+    
+    def _rebind(self, session):
+        with self._lock:
+            owned = any(grid.session.email == session.email for grid in self.grids.values())
+        if owned:
+            self._listen(session)
+    
+    def _current_session(self, grid: GridState):
+        """The owner's live session, rebuilt (and rebound) if it was evicted"""
+        if self.sessions is not None:
+            self.sessions.get(grid.session.email)
+        return grid.session
+    
+    def _ensure_worker(self):
+        if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='grid-engine', daemon=True)
+            self._thread.start()
+    
+    def _listen(self, session):
+        """Subscribe to the session's fills and move the user's grids onto it"""
+        if session not in self._listening:
+            session.add_user_event_listener(self._on_user_event)
+            self._listening.add(session)
+        # A session rebuilt after eviction replaces the one the grids were started with
+        with self._lock:
+            for grid in self.grids.values():
+                if grid.session is not session and grid.session.email == session.email:
+                    grid.session = session
+        session.ensure_account()
+    
+    def start_grid(self, session, symbol: str, lower_price: float, upper_price: float,
+                   num_grids: int, quantity_per_grid: float, spacing: str = 'arithmetic',
+                   atr_multiplier: float = 1.0) -> dict:
+        """
+        Place a grid and keep it rebalanced
+        
+        Levels below the current price get BUY orders and levels above it
+        SELL orders; the level nearest the price is left empty so every
+        fill has a free level to place its counter order on.
+        
+        Args:
+            session: Owner's BotSession
+            symbol: Trading pair
+            lower_price: Lower bound of grid
+            upper_price: Upper bound of grid
+            num_grids: Number of grid levels
+            quantity_per_grid: Quantity for each grid order
+            spacing: 'arithmetic', 'geometric' or 'atr'
+            atr_multiplier: Level spacing in ATRs (for 'atr')
+        
+        Returns:
+            Dictionary with success status, grid ID and orders placed
+        """
+        try:
+            symbol = symbol.upper()
+            if num_grids < 2 or not 0 < lower_price < upper_price:
+                return {'success': False, 'message': 'Need 0 < lower_price < upper_price and at least 2 grids'}
+            if spacing not in SPACINGS:
+                return {'success': False, 'message': f"Spacing must be one of {', '.join(SPACINGS)}"}
+            
+            bot = session.get_bot(GridBot)
+            current_price = bot.get_current_price(symbol)
+            if not current_price:
+                return {'success': False, 'message': f"No price for {symbol}"}
+            price_decimals, quantity_decimals = bot.precision(symbol)
+            levels = bot.compute_levels(symbol, lower_price, upper_price, num_grids, spacing,
+                                        atr_multiplier, current_price)
+            levels = np.unique(np.round(levels, price_decimals)).tolist()
+            if len(levels) < 2:
+                return {'success': False, 'message': 'Fewer than 2 distinct grid levels at this spacing and tick size'}
+            
+            grid = GridState(new_grid_id(), session, symbol, levels,
+                             f"{quantity_per_grid:.{quantity_decimals}f}", price_decimals, spacing)
+            skip = min(range(len(levels)), key=lambda i: abs(levels[i] - current_price))
+            orders = [(i, 'BUY' if level < current_price else 'SELL', None)
+                      for i, level in enumerate(levels) if i != skip]
+            
+            if self.db is not None:
+                document = grid.to_document()
+                document.update(status='running', owner=self.owner, lease_until=time.time() + self.lease_seconds)
+                self.db.grids.insert_one(document)
+            
+            self._ensure_worker()
+            self._listen(session)
+            with self._lock:
+                self.grids[grid.id] = grid
+            placed = self._place(grid, orders)
+            if not placed:
+                with self._lock:
+                    self.grids.pop(grid.id, None)
+            if not placed and self.db is not None:
+                self.db.grids.update_one({'grid_id': grid.id},
+                                         {'$set': {'status': 'stopped', 'stopped_at': datetime.utcnow()}})
+            else:
+                self._save(grid)
+            
+            logger.info(f"Grid {grid.id} started on {symbol}: {placed}/{len(orders)} orders, "
+                        f"{levels[0]} - {levels[-1]}")
+            return {
+                'success': placed > 0,
+                'message': f"Grid started: {placed} orders placed" if placed else 'No grid orders could be placed',
+                'grid_id': grid.id,
+                'orders_placed': placed
+            }
+        
+        except Exception as e:
+            logger.error(f"Error starting grid: {e}")
+            return {'success': False, 'message': str(e)}
+    
+    def _place(self, grid: GridState, orders: list) -> int:
+        """
+        Submit (level, side, origin) limit orders in batches; returns how many were accepted
+        
+        Call without holding the engine lock: the levels are claimed and the
+        client order IDs reserved under it, the requests go out unlocked and
+        the accepted orders are recorded under it again.
+        """
+        batches = []
+        with self._lock:
+            for start in range(0, len(orders), ORDER_BATCH_SIZE):
+                chunk = orders[start:start + ORDER_BATCH_SIZE]
+                batch = []
+                for level, side, _ in chunk:
+                    client_order_id = grid_order_id(grid.id, grid.orders_sent)
+                    batch.append({
+                        'symbol': grid.symbol,
+                        'side': side,
+                        'type': 'LIMIT',
+                        'timeInForce': 'GTC',
+                        'quantity': grid.quantity,
+                        'price': grid.format_price(level),
+                        'newClientOrderId': client_order_id,
+                    })
+                    grid.orders_sent += 1
+                    grid.pending.add(level)
+                    self._inflight[client_order_id] = None
+                batches.append((chunk, batch))
+        
+        placed = 0
+        retries = []
+        for chunk, batch in batches:
+            try:
+                results = grid.session.client.futures_place_batch_order(batchOrders=batch)
+            except Exception as e:
+                logger.error(f"Grid {grid.id} batch order failed: {e}")
+                results = [{}] * len(batch)
+            accepted, rejected = self._record(grid, chunk, batch, results)
+            placed += accepted
+            retries.extend(rejected)
+        if retries:
+            # Counter orders that were waiting on a level whose order never went in
+            placed += self._place(grid, retries)
+        return placed
+    
+    def _record(self, grid: GridState, chunk: list, batch: list, results: list):
+        """
+        Release the claimed levels of a sent batch and track the accepted orders
+        
+        Returns:
+            Tuple of (orders accepted, deferred counter orders now free to place)
+        """
+        accepted = 0
+        retries = []
+        early = []
+        stray = []
+        with self._lock:
+            running = grid.id in self.grids
+            for (level, side, origin), params, result in zip(chunk, batch, results):
+                grid.pending.discard(level)
+                update = self._inflight.pop(params['newClientOrderId'], None)
+                if 'orderId' not in result:
+                    if result:
+                        logger.error(f"Grid {grid.id} {side} @ {grid.levels[level]} rejected: {result.get('msg')}")
+                    if running and level in grid.deferred:
+                        retries.append((level, *grid.deferred.pop(level)))
+                    continue
+                if not running:
+                    # Stopped (or handed over) while the request was out
+                    stray.append(result['orderId'])
+                    continue
+                grid.assign(level, side, result['orderId'], origin)
+                self._orders[(grid.symbol, result['orderId'])] = (grid, level)
+                accepted += 1
+                if update is not None:
+                    early.append(update)
+        
+        for update in early:
+            # Filled before its ID was known; handled on the worker's next pass
+            self._updates.put(update)
+        if stray:
+            logger.info(f"Grid {grid.id} is no longer running here; cancelling {len(stray)} new orders")
+            try:
+                cancel_in_batches(grid.session.client, grid.symbol, order_ids=stray)
+            except Exception as e:
+                logger.error(f"Grid {grid.id} cleanup failed, cancel orders {stray} manually: {e}")
+        return accepted, retries
+    
+    def _on_user_event(self, event: dict):
+        # Runs on the account stream loop: filter and hand off, nothing blocking
+        if event.get('e') != 'ORDER_TRADE_UPDATE':
+            return
+        order = event['o']
+        if order.get('c', '').startswith(GRID_ORDER_PREFIX) and order.get('X') in ('FILLED', 'CANCELED', 'EXPIRED'):
+            self._updates.put(order)
+    
+    def _run(self):
+        while True:
+            try:
+                timeout = max(0.1, self.reconcile_seconds - (time.monotonic() - self._last_reconcile))
+                updates = [self._updates.get(timeout=timeout)]
+            except queue.Empty:
+                updates = []
+            # Drain whatever else arrived so counter orders go out in batches
+            while True:
+                try:
+                    updates.append(self._updates.get_nowait())
+                except queue.Empty:
+                    break
+            
+            try:
+                if updates:
+                    self._apply(updates)
+                if time.monotonic() - self._last_reconcile >= self.reconcile_seconds:
+                    self.reconcile()
+            except Exception as e:
+                logger.error(f"Grid engine error: {e}")
+    
+    def _apply(self, updates: list):
+        """Answer each fill with the opposite order one level away"""
+        with self._lock:
+            counters = {}
+            touched = set()
+            
+            def submit(grid, level, side, origin):
+                # Claimed here, so fills handled before it is sent defer to it
+                if level in grid.pending:
+                    logger.warning(f"Grid {grid.id} already placing at {grid.levels[level]}; skipped {side}")
+                    return
+                grid.pending.add(level)
+                counters.setdefault(grid, []).append((level, side, origin))
+            
+            for update in updates:
+                entry = self._orders.pop((update['s'], update['i']), None)
+                if entry is None:
+                    if update.get('c') in self._inflight:
+                        self._inflight[update['c']] = update
+                    continue
+                grid, level = entry
+                touched.add(grid)
+                side, origin = grid.release(level)
+                if level in grid.deferred:
+                    submit(grid, level, *grid.deferred.pop(level))
+                
+                if update['X'] != 'FILLED':
+                    logger.warning(f"Grid {grid.id} order at {grid.levels[level]} was {update['X'].lower()} "
+                                   f"outside the engine")
+                    continue
+                
+                grid.fills += 1
+                if origin is not None:
+                    grid.round_trips += 1
+                    grid.realized += abs(grid.levels[level] - grid.levels[origin]) * float(grid.quantity)
+                logger.debug("Grid %s %s filled @ %s", grid.id, side, grid.levels[level])
+                
+                target = level + 1 if side == 'BUY' else level - 1
+                counter = 'SELL' if side == 'BUY' else 'BUY'
+                if not 0 <= target < len(grid.levels) or grid.id not in self.grids:
+                    continue
+                if grid.order_ids[target] is not None or target in grid.pending:
+                    # Price crossed that order too (or it is still being placed); place once its fill comes in
+                    grid.deferred[target] = (counter, level)
+                else:
+                    submit(grid, target, counter, level)
+        
+        for grid, orders in counters.items():
+            self._place(grid, orders)
+        for grid in touched:
+            if grid.id in self.grids:
+                self._save(grid)
+    
+    def _save(self, grid: GridState) -> bool:
+        """
+        Write the grid's state and renew this worker's lease on it
+        
+        Returns:
+            False if the grid was stopped or adopted elsewhere (it is then
+            dropped here)
+        """
+        if self.db is None:
+            return True
+        try:
+            state = grid.to_document()
+            state.update(lease_until=time.time() + self.lease_seconds, updated_at=datetime.utcnow())
+            result = self.db.grids.update_one(
+                {'grid_id': grid.id, 'owner': self.owner, 'status': 'running'},
+                {'$set': state}
+            )
+        except Exception as e:
+            # Keep running; the next save renews the lease
+            logger.error(f"Grid {grid.id} save failed: {e}")
+            return True
+        if result.matched_count:
+            return True
+        self._disown(grid)
+        return False
+    
+    def _disown(self, grid: GridState):
+        """Drop a grid this worker no longer owns"""
+        with self._lock:
+            self.grids.pop(grid.id, None)
+            order_ids = grid.open_orders()
+            for order_id in order_ids:
+                self._orders.pop((grid.symbol, order_id), None)
+        try:
+            doc = self.db.grids.find_one({'grid_id': grid.id}, {'_id': 0, 'status': 1, 'cancel_orders': 1})
+            if doc and doc.get('status') == 'stopped':
+                # Stopped from another worker: cancel what was placed since
+                if doc.get('cancel_orders'):
+                    cancel_in_batches(grid.session.client, grid.symbol, order_ids=order_ids)
+                logger.info(f"Grid {grid.id} was stopped by another worker")
+            else:
+                logger.warning(f"Grid {grid.id} was adopted by another worker")
+        except Exception as e:
+            logger.error(f"Grid {grid.id} handover failed: {e}")
+    
+    def _adopt_orphans(self):
+        """Take over running grids whose worker stopped renewing its lease"""
+        if self.db is None or self.sessions is None:
+            return
+        try:
+            orphans = list(self.db.grids.find({'status': 'running', 'lease_until': {'$lt': time.time()}},
+                                              {'_id': 0}))
+        except Exception as e:
+            logger.error(f"Grid orphan lookup failed: {e}")
+            return
+        
+        for doc in orphans:
+            try:
+                session = self.sessions.get(doc['user_email'])
+                if session is None:
+                    # Owner disconnected; adopted once they connect again
+                    continue
+                result = self.db.grids.update_one(
+                    {'grid_id': doc['grid_id'], 'status': 'running', 'owner': doc['owner'],
+                     'lease_until': doc['lease_until']},
+                    {'$set': {'owner': self.owner, 'lease_until': time.time() + self.lease_seconds}}
+                )
+                if result.modified_count == 0:
+                    continue
+                
+                grid = GridState.from_document(doc, session)
+                with self._lock:
+                    self.grids[grid.id] = grid
+                    for level, order_id in enumerate(grid.order_ids):
+                        if order_id is not None:
+                            self._orders[(grid.symbol, order_id)] = (grid, level)
+                self._listen(session)
+                logger.warning(f"Grid {grid.id} adopted from {doc['owner']}")
+            except Exception as e:
+                logger.error(f"Grid {doc.get('grid_id')} adoption failed: {e}")
+    
+    def reconcile(self):
+        """
+        Catch fills the stream missed: one open-orders call per grid, plus
+        an order lookup for each tracked order that is no longer open.
+        Also adopts orphaned grids and renews this worker's leases.
+        """
+        self._last_reconcile = time.monotonic()
+        self._adopt_orphans()
+        with self._lock:
+            grids = list(self.grids.values())
+        
+        updates = []
+        for grid in grids:
+            try:
+                client = self._current_session(grid).client
+                open_ids = {o['orderId'] for o in client.futures_get_open_orders(symbol=grid.symbol)}
+                for order_id in grid.open_orders():
+                    if order_id not in open_ids:
+                        order = client.futures_get_order(symbol=grid.symbol, orderId=order_id)
+                        if order['status'] in ('FILLED', 'CANCELED', 'EXPIRED'):
+                            updates.append({'s': grid.symbol, 'i': order_id, 'X': order['status']})
+            except Exception as e:
+                logger.error(f"Grid {grid.id} reconcile failed: {e}")
+        
+        if updates:
+            logger.info(f"Grid reconcile found {len(updates)} missed order updates")
+            self._apply(updates)
+        
+        for grid in grids:
+            if grid.id in self.grids:
+                self._save(grid)
+    
+    def list_grids(self, email: str) -> list:
+        """Snapshots of the user's running grids"""
+        if self.db is not None:
+            docs = self.db.grids.find({'user_email': email, 'status': 'running'}, {'_id': 0})
+            return [GridState.from_document(doc).snapshot() for doc in docs]
+        with self._lock:
+            return [grid.snapshot() for grid in self.grids.values() if grid.session.email == email]
+    
+    def stop_grid(self, email: str, grid_id: str, cancel_orders: bool = True) -> dict:
+        """
+        Stop rebalancing a grid and (by default) cancel its resting orders
+        
+        A grid run by another worker is marked stopped in the database and
+        its orders are cancelled here by client order ID; its worker drops
+        it on the next save.
+        
+        Returns:
+            Dictionary with success status and orders cancelled
+        """
+        with self._lock:
+            grid = self.grids.get(grid_id)
+        if grid is not None and grid.session.email != email:
+            grid = None
+        if grid is None and self.db is None:
+            return {'success': False, 'message': 'Grid not found'}
+        
+        session = grid.session if grid else None
+        if grid is None and cancel_orders:
+            session = self.sessions.get(email) if self.sessions else None
+            if session is None:
+                return {'success': False, 'message': 'Not connected'}
+        
+        if self.db is not None:
+            result = self.db.grids.update_one(
+                {'grid_id': grid_id, 'user_email': email, 'status': 'running'},
+                {'$set': {'status': 'stopped', 'cancel_orders': cancel_orders, 'stopped_at': datetime.utcnow()}}
+            )
+            if result.matched_count == 0:
+                return {'success': False, 'message': 'Grid not found'}
+        
+        cancelled = 0
+        if grid is not None:
+            with self._lock:
+                self.grids.pop(grid_id, None)
+                order_ids = grid.open_orders()
+                for order_id in order_ids:
+                    self._orders.pop((grid.symbol, order_id), None)
+            if cancel_orders:
+                results = cancel_in_batches(session.client, grid.symbol, order_ids=order_ids)
+                cancelled = sum(1 for r in results if 'orderId' in r)
+        else:
+            grid = GridState.from_document(self.db.grids.find_one({'grid_id': grid_id}, {'_id': 0}))
+            if cancel_orders:
+                results = session.get_bot(GridBot).cancel_all_grid_orders(grid.symbol, grid_id) or []
+                cancelled = sum(1 for r in results if 'orderId' in r)
+        
+        logger.info(f"Grid {grid.id} stopped: {cancelled} orders cancelled")
+        return {
+            'success': True,
+            'message': f"Grid stopped, {cancelled} orders cancelled",
+            'grid': grid.snapshot(),
+            'cancelled': cancelled
+        }
+
+
+# Global grid engine
+grid_engine = GridEngine()
@@ -0,0 +1,476 @@
+"""
+Client-side emulated conditional orders
+
+For triggers the exchange can't express natively: stops on the mark
+price, on our composite price (the mean of mark and last), or at a
+point in time. Each emulated order is checked against the symbol's
+filters when it is created and stored with the exact parameters it will
+be sent with, so firing it is a single futures_create_order call.
+
+Price triggers sit in per-(symbol, source) PriceAlertBooks, so a tick
+costs one bisect per side plus the orders it triggers; time triggers
+sit in a heap ordered by deadline. Ticks come from WebSocketPriceFeed
+(the feed run by the price alert engine). Mark prices are polled from
+the premiumIndex endpoint, at most every STOP_EMULATOR_MARK_SECONDS,
+for symbols that have mark or composite triggers. Orders go out on the
+default executor so the feed's event loop only ever does the bisects.
+
+Orders are persisted in the 'emulated_orders' collection. Every worker
+keeps its own books, reloaded every STOP_EMULATOR_REFRESH_SECONDS, so
+orders survive restarts and any worker can list or cancel them. A
+triggered order is claimed (ACTIVE -> TRIGGERING) with a conditional
+update before it is sent, so it goes out exactly once even when several
+workers see the same tick; it is sent through the owner's current bot
+session. An order whose worker died between claim and send stays
+TRIGGERING rather than risk being sent twice.
+"""
+import asyncio
+import heapq
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from decimal import Decimal
+from bot_sessions import bot_sessions
+from database import db
+from logger import logger
+from market_orders import MarketOrderBot
+from metrics import emulated_trigger_seconds
+from price_alerts import PriceAlertBook, price_alert_engine
+from telegram_alerts import telegram_router
+from websocket_prices import websocket_feed
+
+TRIGGERS = ('last', 'mark', 'composite', 'time')
+ORDER_TYPES = ('MARKET', 'LIMIT')
+
+# Emulated orders reach the exchange as emu_<order ID>
+EMULATED_ORDER_PREFIX = 'emu_'
+
+
+def _fmt(value: float) -> str:
+    """Plain decimal string for an order parameter (no float noise or exponent)"""
+    return format(Decimal(str(value)).normalize(), 'f')
+
+
+def _on_step(value: str, step: str) -> bool:
+    return Decimal(step) == 0 or Decimal(value) % Decimal(step) == 0
+
+
+class EmulatedOrder:
+    """A conditional order held client-side until its trigger is met"""
+    
+    def __init__(self, email: str, symbol: str, trigger: str, params: dict, trigger_price: float = None,
+                 direction: str = None, trigger_time: float = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.email = email
+        self.symbol = symbol
+        self.trigger = trigger
+        self.trigger_price = trigger_price
+        self.direction = direction
+        self.trigger_time = trigger_time
+        self.params = dict(params, newClientOrderId=f"{EMULATED_ORDER_PREFIX}{self.id}")
+        self.status = 'ACTIVE'
+        self.created_at = datetime.utcnow()
+        self.triggered_at = None
+        self.triggered_price = None
+        self.exchange_order_id = None
+        self.message = None
+    
+    def to_document(self) -> dict:
+        return {
+            'order_id': self.id,
+            'user_email': self.email,
+            'symbol': self.symbol,
+            'trigger': self.trigger,
+            'trigger_price': self.trigger_price,
+            'direction': self.direction,
+            'trigger_time': self.trigger_time,
+            'params': self.params,
+            'status': self.status,
+            'created_at': self.created_at,
+            'triggered_at': self.triggered_at,
+            'triggered_price': self.triggered_price,
+            'exchange_order_id': self.exchange_order_id,
+            'message': self.message,
+        }
+    
+    @classmethod
+    def from_document(cls, doc: dict):
+        order = cls(doc['user_email'], doc['symbol'], doc['trigger'], doc['params'], doc.get('trigger_price'),
+                    doc.get('direction'), doc.get('trigger_time'))
+        order.id = doc['order_id']
+        order.params = doc['params']
+        for field in ('status', 'created_at', 'triggered_at', 'triggered_price', 'exchange_order_id', 'message'):
+            setattr(order, field, doc.get(field))
+        return order
+    
+    def snapshot(self) -> dict:
+        return {
+            'order_id': self.id,
+            'symbol': self.symbol,
+            'side': self.params['side'],
+            'type': self.params['type'],
+            'quantity': float(self.params['quantity']),
+            'price': float(self.params['price']) if 'price' in self.params else None,
+            'reduce_only': 'reduceOnly' in self.params,
+            'trigger': self.trigger,
+            'trigger_price': self.trigger_price,
+            'direction': self.direction,
+            'trigger_time': datetime.utcfromtimestamp(self.trigger_time) if self.trigger_time else None,
+            'status': self.status,
+            'created_at': self.created_at,
+            'triggered_at': self.triggered_at,
+            'triggered_price': self.triggered_price,
+            'exchange_order_id': self.exchange_order_id,
+            'message': self.message,
+        }
+
+
+class StopEmulator:
+    """Evaluates emulated conditional orders on every price tick"""
+    
+    def __init__(self, mark_seconds: float = None, refresh_seconds: float = None):
+        self.mark_seconds = mark_seconds if mark_seconds is not None else \
+            float(os.getenv('STOP_EMULATOR_MARK_SECONDS', '1'))
+        self.refresh_seconds = refresh_seconds if refresh_seconds is not None else \
+            float(os.getenv('STOP_EMULATOR_REFRESH_SECONDS', '10'))
+        self.orders = {}       # order_id -> active EmulatedOrder
+        self.books = {}        # (symbol, trigger) -> PriceAlertBook
+        self.deadlines = []    # heap of (trigger_time, order_id)
+        self.last_prices = {}
+        self.mark_prices = {}
+        self._mark_checked = {}
+        self._mark_pending = set()
+        self._lock = threading.Lock()
+        self._pid = None
+        self._last_refresh = 0.0
+    
+    def start(self):
+        """Load active orders and subscribe to the price feed (idempotent, restarted after fork)"""
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self.load()
+        if self.on_tick not in websocket_feed.price_callbacks:
+            websocket_feed.add_price_callback(self.on_tick)
+        price_alert_engine.start()
+        logger.info("Stop emulator started")
+    
+    def load(self):
+        """(Re)build the books from all active orders in the database"""
+        try:
+            started = datetime.utcnow()
+            active = [EmulatedOrder.from_document(doc)
+                      for doc in db.emulated_orders.find({'status': 'ACTIVE'}, {'_id': 0})]
+            with self._lock:
+                # Keep orders created here while the query was running
+                recent = [o for o in self.orders.values() if o.created_at >= started]
+                self.orders = {}
+                self.books = {}
+                self.deadlines = []
+                for order in active + recent:
+                    if order.id not in self.orders:
+                        self._index(order)
+            self._last_refresh = time.monotonic()
+            for symbol in {order.symbol for order in active}:
+                price_alert_engine.watch(symbol)
+            logger.debug(f"Loaded {len(active)} active emulated orders")
+            return len(active)
+        except Exception as e:
+            logger.error(f"Error loading emulated orders: {e}")
+            return 0
+    
+    # ------------------------------------------------------------------
+    # Orders
+    # ------------------------------------------------------------------
+    
+    def create_order(self, session, symbol: str, side: str, quantity: float, trigger: str,
+                     trigger_price: float = None, direction: str = None, trigger_after: float = None,
+                     order_type: str = 'MARKET', price: float = None, reduce_only: bool = False):
+        """
+        Create an emulated conditional order
+        
+        Args:
+            session: The owner's BotSession (used to validate the order)
+            symbol: Trading pair
+            side: BUY or SELL
+            quantity: Order quantity
+            trigger: 'last', 'mark', 'composite' (mean of mark and last) or 'time'
+            trigger_price: Price that fires the order (price triggers)
+            direction: 'above' or 'below' (default: above for BUY, below for
+                       SELL, i.e. a stop)
+            trigger_after: Seconds until the order fires (time triggers)
+            order_type: MARKET or LIMIT, the order sent when triggered
+            price: Limit price (LIMIT only)
+            reduce_only: Only reduce an existing position
+        
+        Returns:
+            Dict with success and the order snapshot or an error message
+        """
+        try:
+            symbol = symbol.upper()
+            if trigger not in TRIGGERS:
+                return {'success': False, 'message': f"Trigger must be one of {', '.join(TRIGGERS)}"}
+            if side not in ('BUY', 'SELL'):
+                return {'success': False, 'message': 'Side must be BUY or SELL'}
+            if order_type not in ORDER_TYPES:
+                return {'success': False, 'message': 'Order type must be MARKET or LIMIT'}
+            
+            trigger_time = None
+            if trigger == 'time':
+                if not trigger_after or trigger_after <= 0:
+                    return {'success': False, 'message': 'Time triggers need a positive trigger_after'}
+                trigger_time = time.time() + trigger_after
+                trigger_price = direction = None
+            else:
+                if not trigger_price or trigger_price <= 0:
+                    return {'success': False, 'message': 'Trigger price must be positive'}
+                direction = direction or ('above' if side == 'BUY' else 'below')
+                if direction not in ('above', 'below'):
+                    return {'success': False, 'message': "Direction must be 'above' or 'below'"}
+                trigger_price = float(trigger_price)
+            
+            bot = session.get_bot(MarketOrderBot)
+            params = {'symbol': symbol, 'side': side, 'type': order_type, 'quantity': _fmt(quantity)}
+            if order_type == 'LIMIT':
+                if not price or price <= 0:
+                    return {'success': False, 'message': 'LIMIT orders need a price'}
+                params.update({'price': _fmt(price), 'timeInForce': 'GTC'})
+            if reduce_only:
+                params['reduceOnly'] = 'true'
+            error = self._validate(bot, params, trigger_price or price or bot.get_current_price(symbol))
+            if error:
+                return {'success': False, 'message': error}
+            
+            order = EmulatedOrder(session.email, symbol, trigger, params, trigger_price, direction, trigger_time)
+            with self._lock:
+                current = self._source_price(symbol, trigger)
+            if current is not None and self._crossed(current, trigger_price, direction):
+                return {'success': False, 'message': f"Order would trigger immediately ({trigger} price {current})"}
+            
+            db.emulated_orders.insert_one(order.to_document())
+            with self._lock:
+                self._index(order)
+            
+            self.start()
+            price_alert_engine.watch(symbol)
+            logger.info(f"Emulated {trigger} order {order.id}: {side} {quantity} {symbol} "
+                        f"{direction or 'after'} {trigger_price or trigger_after} ({session.email})")
+            return {'success': True, 'order': order.snapshot()}
+        
+        except Exception as e:
+            logger.error(f"Error creating emulated order: {e}")
+            return {'success': False, 'message': str(e)}
+    
+    @staticmethod
+    def _validate(bot, params: dict, reference: float):
+        """Check the order against the symbol's filters; returns an error message or None"""
+        info = bot.get_symbol_info(params['symbol'])
+        if not info:
+            return f"Unknown symbol {params['symbol']}"
+        if info.get('status', 'TRADING') != 'TRADING':
+            return f"{params['symbol']} is not trading"
+        for f in info.get('filters', []):
+            kind = f.get('filterType')
+            if kind == 'PRICE_FILTER' and 'price' in params and not _on_step(params['price'], f['tickSize']):
+                return f"Price must be a multiple of {f['tickSize']}"
+            if kind == 'LOT_SIZE':
+                if not _on_step(params['quantity'], f['stepSize']):
+                    return f"Quantity must be a multiple of {f['stepSize']}"
+                if Decimal(params['quantity']) < Decimal(f['minQty']):
+                    return f"Quantity must be at least {f['minQty']}"
+            if kind == 'MIN_NOTIONAL' and 'reduceOnly' not in params and reference:
+                if float(params['quantity']) * reference < float(f.get('notional', f.get('minNotional', 0))):
+                    return f"Order value must be at least {f.get('notional', f.get('minNotional'))} USDT"
+        return None
+    
+    def _index(self, order: EmulatedOrder):
+        self.orders[order.id] = order
+        if order.trigger == 'time':
+            heapq.heappush(self.deadlines, (order.trigger_time, order.id))
+        else:
+            self.books.setdefault((order.symbol, order.trigger), PriceAlertBook()).add(
+                order.id, order.trigger_price, order.direction
+            )
+    
+    def _unindex(self, order: EmulatedOrder):
+        self.orders.pop(order.id, None)
+        book = self.books.get((order.symbol, order.trigger))
+        if book:
+            book.remove(order.id, order.trigger_price, order.direction)
+        # Time triggers are dropped lazily when their deadline comes up
+    
+    def list_orders(self, email: str, include_finished: bool = False, limit: int = 100) -> list:
+        """A user's emulated orders, newest first"""
+        query = {'user_email': email}
+        if not include_finished:
+            query['status'] = 'ACTIVE'
+        docs = db.emulated_orders.find(query, {'_id': 0}).sort('created_at', -1).limit(limit)
+        return [EmulatedOrder.from_document(doc).snapshot() for doc in docs]
+    
+    def cancel_order(self, email: str, order_id: str):
+        """Cancel one of a user's active emulated orders (in every worker)"""
+        result = db.emulated_orders.update_one(
+            {'order_id': order_id, 'user_email': email, 'status': 'ACTIVE'},
+            {'$set': {'status': 'CANCELED', 'canceled_at': datetime.utcnow()}}
+        )
+        if result.matched_count == 0:
+            return {'success': False, 'message': 'Order not found'}
+        # Other workers drop it on their next reload; until then their claim fails
+        with self._lock:
+            order = self.orders.get(order_id)
+            if order:
+                self._unindex(order)
+        logger.info(f"Emulated order {order_id} cancelled")
+        return {'success': True, 'message': 'Order cancelled'}
+    
+    # ------------------------------------------------------------------
+    # Evaluation
+    # ------------------------------------------------------------------
+    
+    def _source_price(self, symbol: str, trigger: str):
+        last = self.last_prices.get(symbol)
+        mark = self.mark_prices.get(symbol)
+        if trigger == 'last':
+            return last
+        if trigger == 'mark':
+            return mark
+        if trigger == 'composite' and last is not None and mark is not None:
+            return (last + mark) / 2
+        return None
+    
+    @staticmethod
+    def _crossed(price: float, trigger_price: float, direction: str) -> bool:
+        return price >= trigger_price if direction == 'above' else price <= trigger_price
+    
+    def _pop_crossed(self, symbol: str, trigger: str) -> list:
+        """Remove and return the active orders crossed by the current price (lock held)"""
+        book = self.books.get((symbol, trigger))
+        if not book:
+            return []
+        price = self._source_price(symbol, trigger)
+        if price is None:
+            return []
+        triggered = []
+        for order_id, _, _ in book.pop_crossed(price):
+            order = self.orders.pop(order_id, None)
+            if order:
+                order.triggered_price = price
+                triggered.append(order)
+        return triggered
+    
+    def _pop_due(self, now: float) -> list:
+        triggered = []
+        while self.deadlines and self.deadlines[0][0] <= now:
+            _, order_id = heapq.heappop(self.deadlines)
+            order = self.orders.pop(order_id, None)
+            if order:
+                order.triggered_price = self.last_prices.get(order.symbol)
+                triggered.append(order)
+        return triggered
+    
+    def _needs_mark(self, symbol: str) -> bool:
+        return bool(self.books.get((symbol, 'mark')) or self.books.get((symbol, 'composite')))
+    
+    def check_price(self, symbol: str, price: float, now: float = None) -> list:
+        """Record a last price and pop the orders it (or the clock) triggers"""
+        with self._lock:
+            self.last_prices[symbol] = price
+            triggered = self._pop_crossed(symbol, 'last') + self._pop_crossed(symbol, 'composite')
+            if self.deadlines:
+                triggered += self._pop_due(now or time.time())
+            return triggered
+    
+    def check_mark(self, symbol: str, mark_price: float) -> list:
+        """Record a mark price and pop the orders it triggers"""
+        with self._lock:
+            self.mark_prices[symbol] = mark_price
+            return self._pop_crossed(symbol, 'mark') + self._pop_crossed(symbol, 'composite')
+    
+    def fire(self, orders: list):
+        """Claim triggered orders and send them with their pre-validated parameters"""
+        for order in orders:
+            order.triggered_at = datetime.utcnow()
+            try:
+                # Claim the order so only one worker sends it
+                result = db.emulated_orders.update_one(
+                    {'order_id': order.id, 'status': 'ACTIVE'},
+                    {'$set': {'status': 'TRIGGERING', 'triggered_at': order.triggered_at,
+                              'triggered_price': order.triggered_price}}
+                )
+                if result.modified_count == 0:
+                    continue
+            except Exception as e:
+                logger.error(f"Error claiming emulated order {order.id}: {e}")
+                continue
+            
+            try:
+                session = bot_sessions.get(order.email)
+                if session is None:
+                    raise RuntimeError('Not connected')
+                result = session.client.futures_create_order(**order.params)
+                order.exchange_order_id = result['orderId']
+                order.status = 'TRIGGERED'
+                logger.info(f"Emulated {order.trigger} order {order.id} fired at {order.triggered_price}: "
+                            f"{order.params['side']} {order.params['quantity']} {order.symbol} "
+                            f"-> order {result['orderId']} {result.get('status')}")
+            except Exception as e:
+                order.status = 'FAILED'
+                order.message = getattr(e, 'message', None) or str(e)
+                logger.error(f"Emulated order {order.id} failed: {order.message}")
+                telegram_router.for_user(order.email).alert_error(
+                    f"Emulated {order.trigger} order on {order.symbol} triggered but was not placed: {order.message}"
+                )
+            
+            try:
+                db.emulated_orders.update_one(
+                    {'order_id': order.id},
+                    {'$set': {'status': order.status, 'exchange_order_id': order.exchange_order_id,
+                              'message': order.message}}
+                )
+            except Exception as e:
+                logger.error(f"Error saving emulated order {order.id}: {e}")
+    
+    def _refresh_mark(self, symbol: str):
+        """Poll the mark price for a symbol and fire what it triggers (executor thread)"""
+        try:
+            with self._lock:
+                emails = {o.email for o in self.orders.values()
+                          if o.symbol == symbol and o.trigger in ('mark', 'composite')}
+            session = next(filter(None, map(bot_sessions.get, emails)), None)
+            if session is None:
+                return
+            mark = float(session.client.futures_mark_price(symbol=symbol)['markPrice'])
+            triggered = self.check_mark(symbol, mark)
+            if triggered:
+                self.fire(triggered)
+        except Exception as e:
+            logger.error(f"Mark price refresh failed for {symbol}: {e}")
+        finally:
+            self._mark_pending.discard(symbol)
+    
+    async def on_tick(self, symbol: str, data: dict):
+        """WebSocketPriceFeed callback"""
+        started = time.perf_counter()
+        triggered = self.check_price(symbol, data['price'])
+        
+        loop = asyncio.get_running_loop()
+        if triggered:
+            loop.run_in_executor(None, self.fire, triggered)
+            emulated_trigger_seconds.observe(time.perf_counter() - started)
+        
+        now = time.monotonic()
+        if (symbol not in self._mark_pending and self._needs_mark(symbol)
+                and now - self._mark_checked.get(symbol, 0.0) >= self.mark_seconds):
+            self._mark_checked[symbol] = now
+            self._mark_pending.add(symbol)
+            loop.run_in_executor(None, self._refresh_mark, symbol)
+        
+        if time.monotonic() - self._last_refresh > self.refresh_seconds:
+            self._last_refresh = time.monotonic()
+            loop.run_in_executor(None, self.load)
+
+
+# Global instance
+stop_emulator = StopEmulator()
@@ -24,9 +24,6 @@ class StopLimitBot(BaseBot):
             Order response or None
         """
         try:
-            logger.info(f"Placing STOP-LIMIT {side} order: {quantity} {symbol}")
-            logger.info(f"Stop Price: {stop_price}, Limit Price: {limit_price}")
-            
             order = self.client.futures_create_order(
                 symbol=symbol,
                 side=side,
@@ -37,11 +34,13 @@ class StopLimitBot(BaseBot):
                 stopPrice=stop_price
             )
             
-            logger.info(f"✓ Stop-Limit order placed successfully!")
-            logger.info(f"Order ID: {order['orderId']}")
-            logger.info(f"Status: {order['status']}")
-            logger.info(f"Stop Price: {order['stopPrice']}")
-            logger.info(f"Limit Price: {order['price']}")
+            logger.info(
+                "✓ Stop-Limit order placed: %s %s %s | stop %s limit %s | ID %s | %s",
+                side, quantity, symbol, order['stopPrice'], order['price'], order['orderId'], order['status'],
+                extra={'event': 'order_placed', 'order_type': 'STOP_LIMIT', 'symbol': symbol, 'side': side,
+                       'quantity': quantity, 'stop_price': stop_price, 'price': limit_price,
+                       'order_id': order['orderId'], 'status': order['status']}
+            )
             
             return order
             
@@ -0,0 +1,63 @@
+"""
+Trailing-stop order implementation
+Uses the exchange's native TRAILING_STOP_MARKET order, so the stop follows
+the price on Binance's side without any polling from the bot
+"""
+from binance.exceptions import BinanceAPIException
+from base_bot import BaseBot
+from logger import logger
+
+class TrailingStopBot(BaseBot):
+    """Bot for placing trailing-stop orders"""
+    
+    def place_trailing_stop_order(self, symbol: str, side: str, quantity: float, callback_rate: float,
+                                  activation_price: float = None, reduce_only: bool = True):
+        """
+        Place a trailing-stop market order
+        
+        Args:
+            symbol: Trading pair
+            side: BUY or SELL (SELL trails below a long, BUY above a short)
+            quantity: Order quantity
+            callback_rate: Distance from the best price since activation,
+                           in percent (0.1 - 10)
+            activation_price: Start trailing once price reaches this level
+                              (default: immediately)
+            reduce_only: Only close an existing position
+        
+        Returns:
+            Order response or None
+        """
+        try:
+            params = {
+                'symbol': symbol,
+                'side': side,
+                'type': 'TRAILING_STOP_MARKET',
+                'quantity': quantity,
+                'callbackRate': round(callback_rate, 1),
+            }
+            if activation_price:
+                params['activationPrice'] = activation_price
+            if reduce_only:
+                params['reduceOnly'] = 'true'
+            
+            order = self.client.futures_create_order(**params)
+            
+            logger.info(
+                "✓ Trailing-stop order placed: %s %s %s | callback %s%% activation %s | ID %s | %s",
+                side, quantity, symbol, order.get('priceRate'), order.get('activatePrice') or 'now',
+                order['orderId'], order['status'],
+                extra={'event': 'order_placed', 'order_type': 'TRAILING_STOP_MARKET', 'symbol': symbol,
+                       'side': side, 'quantity': quantity, 'callback_rate': callback_rate,
+                       'activation_price': activation_price, 'order_id': order['orderId'],
+                       'status': order['status']}
+            )
+            
+            return order
+        
+        except BinanceAPIException as e:
+            logger.error(f"Binance API Error: {e.message}")
+            return None
+        except Exception as e:
+            logger.error(f"Error placing trailing-stop order: {e}")
+            return None
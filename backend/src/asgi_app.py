@@ -0,0 +1,420 @@
+"""
+ASGI serving mode for the web API
+
+The hot trading, price and history routes are implemented as async
+Starlette endpoints:
+- Binance calls go through each user's python-binance AsyncClient
+- public price lookups use a shared aiohttp session
+- blocking storage work (PyMongo/SQLite, order history file) runs in the
+  thread pool so it never stalls the event loop
+Everything else (auth, Telegram, price alerts, ...) is served by the
+existing Flask app, mounted underneath as a WSGI fallback.
+
+Run with:
+    gunicorn asgi_app:app -k uvicorn.workers.UvicornWorker --bind 0.0.0.0:$PORT
+"""
+import os
+import asyncio
+import time
+from datetime import datetime
+import aiohttp
+import jwt
+from binance.exceptions import BinanceAPIException
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.middleware.wsgi import WSGIMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Mount, Route
+
+from logger import logger
+from web_ui import app as flask_app, frontend_url
+from database import db
+from bot_sessions import bot_sessions
+from order_history import order_history
+from telegram_alerts import telegram_router
+from json_provider import dumps_bytes
+from metrics import http_request_seconds, order_ack_seconds
+from tracing import tracer
+from compression import compression
+from exchange import create_async_client, public_price_url, simulated_price, use_simulator
+
+PUBLIC_PRICE_URL = public_price_url()
+
+
+class APIResponse(JSONResponse):
+    """JSON response encoded like the Flask app's (see json_provider)"""
+    
+    def render(self, content) -> bytes:
+        return dumps_bytes(content)
+
+
+def error(message: str, status_code: int):
+    return APIResponse({'success': False, 'message': message}, status_code=status_code)
+
+
+# ============================================================================
+# AUTH AND SESSIONS
+# ============================================================================
+
+def get_identity(request: Request):
+    """Validate the Bearer access token and return its identity (email)"""
+    header = request.headers.get('authorization', '')
+    if not header.startswith('Bearer '):
+        return None, error('Authorization token required', 401)
+    
+    try:
+        claims = jwt.decode(header[7:], flask_app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
+    except jwt.ExpiredSignatureError:
+        return None, error('Token has expired', 401)
+    except jwt.InvalidTokenError:
+        return None, error('Invalid token', 401)
+    
+    if claims.get('type') != 'access':
+        return None, error('Invalid token', 401)
+    return claims['sub'], None
+
+
+class AsyncClientPool:
+    """One python-binance AsyncClient per connected user"""
+    
+    def __init__(self):
+        self._clients = {}  # email -> AsyncClient
+        self._lock = asyncio.Lock()
+    
+    async def get(self, email: str):
+        """Return the user's AsyncClient, or None if they aren't connected"""
+        session = await run_in_threadpool(bot_sessions.get, email)
+        if not session:
+            return None
+        
+        client = self._clients.get(email)
+        if client and client.API_KEY == session.client.API_KEY:
+            return client
+        
+        async with self._lock:
+            client = self._clients.get(email)
+            if client and client.API_KEY == session.client.API_KEY:
+                return client
+            if client:
+                await client.close_connection()
+            client = await create_async_client(session.client.API_KEY, session.client.API_SECRET,
+                                               testnet=session.testnet)
+            self._clients[email] = client
+            return client
+    
+    async def close(self):
+        for client in self._clients.values():
+            await client.close_connection()
+        self._clients.clear()
+
+
+clients = AsyncClientPool()
+http_session = None
+
+
+async def on_startup():
+    global http_session
+    http_session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10))
+
+
+async def on_shutdown():
+    await clients.close()
+    if http_session:
+        await http_session.close()
+
+
+async def create_order(client, **params):
+    """Place a futures order, recording its acknowledgement latency"""
+    started = time.perf_counter()
+    outcome = 'success'
+    try:
+        with tracer.span('order.submit', symbol=params.get('symbol'), side=params.get('side'),
+                         order_type=params.get('type')):
+            return await client.futures_create_order(**params)
+    except Exception:
+        outcome = 'failure'
+        raise
+    finally:
+        order_ack_seconds.observe(time.perf_counter() - started, params.get('type', 'UNKNOWN'), outcome)
+
+
+# ============================================================================
+# ROUTES
+# ============================================================================
+
+async def get_price(request: Request):
+    """Get current price (public endpoint - no auth required)"""
+    symbol = request.path_params['symbol']
+    try:
+        if use_simulator():
+            return APIResponse({'success': True, 'price': simulated_price(symbol)})
+        
+        async with http_session.get(PUBLIC_PRICE_URL, params={'symbol': symbol}) as response:
+            response.raise_for_status()
+            data = await response.json()
+        
+        price = float(data['price'])
+        logger.debug(f"Fetched price for {symbol}: {price}")
+        return APIResponse({'success': True, 'price': price})
+    
+    except asyncio.TimeoutError:
+        logger.error(f"Timeout fetching price for {symbol}")
+        return error('Request timeout', 504)
+    except aiohttp.ClientError as e:
+        logger.error(f"Network error fetching price for {symbol}: {e}")
+        return error(f'Network error: {str(e)}', 500)
+    except KeyError:
+        logger.error(f"Invalid symbol: {symbol}")
+        return error('Invalid symbol', 400)
+    except Exception as e:
+        logger.error(f"Price error for {symbol}: {e}")
+        return error(str(e), 500)
+
+
+async def market_order(request: Request):
+    """Place market order"""
+    email, failure = get_identity(request)
+    if failure:
+        return failure
+    try:
+        client = await clients.get(email)
+        if not client:
+            return error('Not connected', 400)
+        
+        data = await request.json()
+        quantity = float(data['quantity'])
+        
+        logger.info(f"Placing MARKET {data['side']} order: {quantity} {data['symbol']}")
+        order = await create_order(
+            client,
+            symbol=data['symbol'],
+            side=data['side'],
+            type='MARKET',
+            quantity=quantity
+        )
+        
+        order_doc = {
+            'user_email': email,
+            'order_type': 'MARKET',
+            'symbol': data['symbol'],
+            'side': data['side'],
+            'quantity': quantity,
+            'price': order.get('avgPrice'),
+            'order_id': order['orderId'],
+            'status': order['status'],
+            'timestamp': datetime.utcnow()
+        }
+        await run_in_threadpool(db.orders.insert_one, order_doc)
+        await run_in_threadpool(
+            order_history.add_order,
+            'MARKET', data['symbol'], data['side'], quantity,
+            order.get('avgPrice'), order['orderId'], order['status']
+        )
+        alerts = await run_in_threadpool(telegram_router.for_user, email)
+        alerts.alert_order_executed('MARKET', data['symbol'], data['side'], quantity,
+                                    float(order.get('avgPrice', 0)))
+        
+        return APIResponse({
+            'success': True,
+            'message': 'Market order placed!',
+            'order_id': order['orderId'],
+            'status': order['status']
+        })
+    
+    except BinanceAPIException as e:
+        logger.error(f"Binance API Error: {e.message}")
+        return error('Order failed', 500)
+    except Exception as e:
+        logger.error(f"Market order error: {e}")
+        alerts = await run_in_threadpool(telegram_router.for_user, email)
+        alerts.alert_error(f"Market order failed: {str(e)}")
+        return error(str(e), 500)
+
+
+async def limit_order(request: Request):
+    """Place limit order"""
+    email, failure = get_identity(request)
+    if failure:
+        return failure
+    try:
+        client = await clients.get(email)
+        if not client:
+            return error('Not connected', 400)
+        
+        data = await request.json()
+        quantity = float(data['quantity'])
+        price = float(data['price'])
+        
+        logger.info(f"Placing LIMIT {data['side']} order: {quantity} {data['symbol']} @ {price}")
+        order = await create_order(
+            client,
+            symbol=data['symbol'],
+            side=data['side'],
+            type='LIMIT',
+            timeInForce='GTC',
+            quantity=quantity,
+            price=price
+        )
+        
+        order_doc = {
+            'user_email': email,
+            'order_type': 'LIMIT',
+            'symbol': data['symbol'],
+            'side': data['side'],
+            'quantity': quantity,
+            'price': price,
+            'order_id': order['orderId'],
+            'status': order['status'],
+            'timestamp': datetime.utcnow()
+        }
+        await run_in_threadpool(db.orders.insert_one, order_doc)
+        
+        return APIResponse({
+            'success': True,
+            'message': 'Limit order placed!',
+            'order_id': order['orderId'],
+            'status': order['status']
+        })
+    
+    except BinanceAPIException as e:
+        logger.error(f"Binance API Error: {e.message}")
+        return error('Order failed', 500)
+    except Exception as e:
+        logger.error(f"Limit order error: {e}")
+        return error(str(e), 500)
+
+
+async def get_order_history(request: Request):
+    """Get user's order history"""
+    email, failure = get_identity(request)
+    if failure:
+        return failure
+    try:
+        try:
+            limit = int(request.query_params.get('limit', 50))
+        except ValueError:
+            limit = 50
+        
+        def load():
+            return list(db.orders.find({'user_email': email}, {'_id': 0}).sort('timestamp', -1).limit(limit))
+        
+        orders = await run_in_threadpool(load)
+        return APIResponse({'success': True, 'history': orders})
+    
+    except Exception as e:
+        logger.error(f"Order history error: {e}")
+        return error(str(e), 500)
+
+
+async def open_orders(request: Request):
+    """Get open orders"""
+    email, failure = get_identity(request)
+    if failure:
+        return failure
+    try:
+        client = await clients.get(email)
+        if not client:
+            return error('Not connected', 400)
+        
+        orders = await client.futures_get_open_orders()
+        return APIResponse({'success': True, 'orders': orders})
+    
+    except Exception as e:
+        logger.error(f"Open orders error: {e}")
+        return error(str(e), 500)
+
+
+async def cancel_order(request: Request):
+    """Cancel an order"""
+    email, failure = get_identity(request)
+    if failure:
+        return failure
+    try:
+        client = await clients.get(email)
+        if not client:
+            return error('Not connected', 400)
+        
+        data = await request.json()
+        logger.info(f"Cancelling order {data['order_id']} for {data['symbol']}")
+        await client.futures_cancel_order(symbol=data['symbol'], orderId=int(data['order_id']))
+        return APIResponse({'success': True, 'message': 'Order cancelled!'})
+    
+    except BinanceAPIException as e:
+        logger.error(f"Binance API Error: {e.message}")
+        return error('Cancel failed', 500)
+    except Exception as e:
+        logger.error(f"Cancel order error: {e}")
+        return error(str(e), 500)
+
+
+# ============================================================================
+# APPLICATION
+# ============================================================================
+
+class RequestTimer:
+    """Time and trace requests (the Flask fallback also times its own routes)"""
+    
+    def __init__(self, app):
+        self.app = app
+        self.templates = {route.endpoint: route.path for route in routes if isinstance(route, Route)}
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        
+        started = time.perf_counter()
+        status = {'code': 500}
+        
+        async def send_with_status(message):
+            if message['type'] == 'http.response.start':
+                status['code'] = message['status']
+            await send(message)
+        
+        try:
+            with tracer.span(f"{scope['method']} {scope['path']}", **{'http.method': scope['method']}) as span:
+                await self.app(scope, receive, send_with_status)
+                span.set_attribute('http.status_code', status['code'])
+        finally:
+            route = self.templates.get(scope.get('endpoint'))
+            if route:
+                http_request_seconds.observe(time.perf_counter() - started,
+                                             scope['method'], route, str(status['code']))
+
+
+routes = [
+    Route('/api/price/{symbol}', get_price, methods=['GET']),
+    Route('/api/market_order', market_order, methods=['POST']),
+    Route('/api/limit_order', limit_order, methods=['POST']),
+    Route('/api/order_history', get_order_history, methods=['GET']),
+    Route('/api/open_orders', open_orders, methods=['GET']),
+    Route('/api/cancel_order', cancel_order, methods=['POST']),
+    # Everything else is handled by the Flask app
+    Mount('/', app=WSGIMiddleware(flask_app)),
+]
+
+middleware = [
+    Middleware(
+        CORSMiddleware,
+        allow_origins=["http://localhost:3000", "http://localhost:3001", frontend_url],
+        allow_origin_regex=r"https://.*\.vercel\.app",
+        allow_credentials=True,
+        allow_headers=["Content-Type", "Authorization"],
+        allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+    ),
+    # Responses from the Flask fallback are already compressed and pass through
+    Middleware(GZipMiddleware, minimum_size=compression.min_size),
+    Middleware(RequestTimer),
+]
+
+app = Starlette(routes=routes, middleware=middleware,
+                on_startup=[on_startup], on_shutdown=[on_shutdown])
+
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, host='0.0.0.0', port=int(os.getenv('PORT', 5001)))
@@ -2,13 +2,144 @@
 Authentication module with MongoDB, bcrypt, and JWT
 """
 import bcrypt
+import os
 import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from flask import jsonify, request
 from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity
 from itsdangerous import URLSafeTimedSerializer
 from logger import logger
 from database import db
+from cache import TTLCache, user_cache, copy_value
+
+class HasherBusyError(Exception):
+    """Raised when too many password hashes are already waiting"""
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a small bounded thread pool
+    
+    bcrypt releases the GIL, so a thread pool gives real parallelism while
+    capping how many CPU-heavy hashes run at once. Requests beyond
+    max_pending are rejected instead of queueing without limit.
+    """
+    
+    def __init__(self, rounds: int = None, max_workers: int = None, max_pending: int = None,
+                 wait_timeout: float = 10.0):
+        self.rounds = rounds or int(os.getenv('BCRYPT_ROUNDS', 12))
+        self.max_workers = max_workers or int(os.getenv('BCRYPT_MAX_WORKERS', 2))
+        self.max_pending = max_pending or int(os.getenv('BCRYPT_MAX_PENDING', 16))
+        self.wait_timeout = wait_timeout
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                        thread_name_prefix='bcrypt')
+                    self._slots = threading.BoundedSemaphore(self.max_pending)
+                    self._pid = os.getpid()
+        return self._executor
+    
+    def _run(self, func, *args):
+        executor = self._get_executor()
+        if not self._slots.acquire(timeout=self.wait_timeout):
+            raise HasherBusyError("Too many concurrent password operations")
+        try:
+            return executor.submit(func, *args).result()
+        finally:
+            self._slots.release()
+    
+    @staticmethod
+    def _hash(password: bytes, rounds: int) -> bytes:
+        return bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds))
+    
+    def hash(self, password: str) -> str:
+        """Hash password using bcrypt at the configured cost"""
+        return self._run(self._hash, password.encode('utf-8'), self.rounds).decode('utf-8')
+    
+    def verify(self, password: str, hashed: str) -> bool:
+        """Verify password against hash"""
+        return self._run(bcrypt.checkpw, password.encode('utf-8'), hashed.encode('utf-8'))
+    
+    def needs_rehash(self, hashed: str) -> bool:
+        """True if the hash was made with a different cost factor"""
+        try:
+            return int(hashed.split('$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+
+class LoginThrottle:
+    """
+    Sliding-window limit on failed logins per email and per client IP
+    
+    Checked before any bcrypt work, so repeated bad passwords can't be
+    used to burn CPU. Failure histories are kept in a size-limited cache,
+    so attacker-chosen emails and IPs can't grow it without bound.
+    """
+    
+    def __init__(self, max_per_email: int = None, max_per_ip: int = None, window_seconds: int = None,
+                 max_keys: int = None):
+        self.max_per_email = max_per_email or int(os.getenv('LOGIN_MAX_FAILURES_PER_EMAIL', 5))
+        self.max_per_ip = max_per_ip or int(os.getenv('LOGIN_MAX_FAILURES_PER_IP', 20))
+        self.window_seconds = window_seconds or int(os.getenv('LOGIN_THROTTLE_WINDOW', 900))
+        # key -> deque of failure timestamps, dropped a window after the last failure
+        self._failures = TTLCache(
+            maxsize=max_keys or int(os.getenv('LOGIN_THROTTLE_MAX_KEYS', 100000)),
+            ttl=self.window_seconds,
+            name='login_throttle'
+        )
+        self._lock = threading.Lock()
+    
+    def _recent(self, key, now):
+        failures = self._failures.get(key)
+        if not failures:
+            return 0
+        while failures and failures[0] <= now - self.window_seconds:
+            failures.popleft()
+        if not failures:
+            self._failures.invalidate(key)
+            return 0
+        return len(failures)
+    
+    def _record(self, key, now, limit: int):
+        # Past the limit the key is blocked anyway, so keep at most `limit`
+        failures = self._failures.get(key) or deque(maxlen=limit)
+        failures.append(now)
+        self._failures.set(key, failures)
+    
+    def is_blocked(self, email: str, ip: str = None) -> bool:
+        """True if this email or IP has too many recent failures"""
+        now = time.monotonic()
+        with self._lock:
+            if self._recent(('email', email), now) >= self.max_per_email:
+                return True
+            return bool(ip) and self._recent(('ip', ip), now) >= self.max_per_ip
+    
+    def record_failure(self, email: str, ip: str = None):
+        now = time.monotonic()
+        with self._lock:
+            self._record(('email', email), now, self.max_per_email)
+            if ip:
+                self._record(('ip', ip), now, self.max_per_ip)
+    
+    def reset(self, email: str):
+        with self._lock:
+            self._failures.invalidate(('email', email))
+
+
+password_hasher = PasswordHasher()
+login_throttle = LoginThrottle()
 
 class AuthService:
     """Authentication service with secure password hashing and JWT"""
@@ -20,14 +151,12 @@ class AuthService:
     @staticmethod
     def hash_password(password: str) -> str:
         """Hash password using bcrypt"""
-        salt = bcrypt.gensalt()
-        hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
-        return hashed.decode('utf-8')
+        return password_hasher.hash(password)
     
     @staticmethod
     def verify_password(password: str, hashed: str) -> bool:
         """Verify password against hash"""
-        return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+        return password_hasher.verify(password, hashed)
     
     @staticmethod
     def validate_email(email: str) -> bool:
@@ -107,23 +236,41 @@ class AuthService:
                 'verification_token': verification_token
             }
             
+        except HasherBusyError:
+            logger.warning(f"Registration rejected, password hasher busy: {email}")
+            return {'success': False, 'message': 'Server busy. Try again shortly.', 'busy': True}
         except Exception as e:
             logger.error(f"Registration error: {e}")
             return {'success': False, 'message': str(e)}
     
-    def login_user(self, email: str, password: str):
+    def login_user(self, email: str, password: str, ip: str = None):
         """Login user and return JWT tokens"""
         try:
+            if login_throttle.is_blocked(email, ip):
+                logger.warning(f"Login throttled: {email} ({ip})")
+                return {'success': False, 'message': 'Too many failed attempts. Try again later.',
+                        'throttled': True}
+            
             # Find user
             user = db.users.find_one({'email': email})
             
             if not user:
+                login_throttle.record_failure(email, ip)
                 return {'success': False, 'message': 'Invalid credentials'}
             
             # Verify password
             if not self.verify_password(password, user['password']):
+                login_throttle.record_failure(email, ip)
                 return {'success': False, 'message': 'Invalid credentials'}
             
+            login_throttle.reset(email)
+            
+            # Upgrade the hash if the configured cost factor changed
+            updates = {'last_login': datetime.utcnow()}
+            if password_hasher.needs_rehash(user['password']):
+                updates['password'] = self.hash_password(password)
+                logger.info(f"Password rehashed at cost {password_hasher.rounds}: {email}")
+            
             # Check if email is verified (optional - can be disabled for testing)
             # if not user.get('email_verified', False):
             #     return {'success': False, 'message': 'Please verify your email first'}
@@ -138,11 +285,12 @@ class AuthService:
                 expires_delta=timedelta(days=30)
             )
             
-            # Update last login
+            # Update last login (and rehashed password)
             db.users.update_one(
                 {'email': email},
-                {'$set': {'last_login': datetime.utcnow()}}
+                {'$set': updates}
             )
+            user_cache.invalidate(email)
             
             logger.info(f"User logged in: {email}")
             
@@ -160,6 +308,9 @@ class AuthService:
                 }
             }
             
+        except HasherBusyError:
+            logger.warning(f"Login rejected, password hasher busy: {email}")
+            return {'success': False, 'message': 'Server busy. Try again shortly.', 'busy': True}
         except Exception as e:
             logger.error(f"Login error: {e}")
             return {'success': False, 'message': str(e)}
@@ -177,6 +328,7 @@ class AuthService:
                 {'email': email},
                 {'$set': {'email_verified': True, 'updated_at': datetime.utcnow()}}
             )
+            user_cache.invalidate(email)
             
             if result.modified_count > 0:
                 logger.info(f"Email verified: {email}")
@@ -189,20 +341,37 @@ class AuthService:
             return {'success': False, 'message': str(e)}
     
     def get_user_profile(self, email: str):
-        """Get user profile"""
+        """Get user profile (served from the in-process cache when fresh)"""
         try:
-            user = db.users.find_one({'email': email}, {'password': 0})
+            user = user_cache.get(email)
             
-            if not user:
-                return {'success': False, 'message': 'User not found'}
+            if user is None:
+                user = db.users.find_one({'email': email}, {'password': 0})
+                
+                if not user:
+                    return {'success': False, 'message': 'User not found'}
+                
+                user['_id'] = str(user['_id'])
+                telegram = user.get('telegram')
+                if telegram:
+                    # The bot token never leaves the server; alerts read it from the database
+                    telegram['bot_token_set'] = bool(telegram.pop('bot_token', None))
+                user_cache.set(email, user)
             
-            user['_id'] = str(user['_id'])
-            return {'success': True, 'user': user}
+            return {'success': True, 'user': copy_value(user)}
             
         except Exception as e:
             logger.error(f"Get profile error: {e}")
             return {'success': False, 'message': str(e)}
     
+    def get_api_credentials(self, email: str):
+        """Return (api_key, api_secret) for a user, or (None, None)"""
+        result = self.get_user_profile(email)
+        if not result['success']:
+            return None, None
+        user = result['user']
+        return user.get('api_key'), user.get('api_secret')
+    
     def update_api_credentials(self, email: str, api_key: str, api_secret: str):
         """Update user API credentials"""
         try:
@@ -216,6 +385,7 @@ class AuthService:
                     }
                 }
             )
+            user_cache.invalidate(email)
             
             if result.modified_count > 0:
                 logger.info(f"API credentials updated: {email}")
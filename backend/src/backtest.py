@@ -0,0 +1,614 @@
+"""
+Vectorized strategy backtesters
+
+Replays historical prices through the grid GridBot lays down (buy limits
+below the start price, sell limits above) with the usual grid rule that
+every fill places the opposite order one level away. Under that rule the
+grid's state is just the last level price crossed, so a whole run is a
+handful of NumPy array operations instead of a Python loop over ticks,
+and a sweep evaluates a block of (lower, upper, num_grids) combinations
+at once as a 2-D array.
+
+Fills happen at the level price (maker fee); price outside the range
+leaves the grid fully bought or sold until it comes back.
+
+TWAPBacktester and OCOBacktester replay the TWAP and OCO bots from many
+start times and report execution shortfall and trade outcomes; see
+sweep.py for running any of them over parameter ranges on all cores.
+
+Usage:
+    python backtest.py BTCUSDT-1m-2024-05.csv --lower 60000 --upper 70000 --grids 20 --quantity 0.01
+    python backtest.py store:BTCUSDT:1m:2024-05-01:2024-05-31 --lower 60000 --upper 70000 \
+        --grids 20 --quantity 0.01
+    python backtest.py trades.parquet --lower 58000:62000:9 --upper 68000:72000:9 \
+        --grids 10:200:40 --quantity 0.01 --top 20 --output sweep.csv
+"""
+import argparse
+import csv
+import os
+import time
+import numpy as np
+from logger import logger
+import marketdata
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pq = None
+
+# Cells per (time x combination) block in sweeps; bounds peak memory to a few hundred MB
+DEFAULT_BLOCK_CELLS = 2_000_000
+
+
+class PriceHistory:
+    """A price path: int64 millisecond timestamps and float64 prices"""
+    
+    def __init__(self, timestamps, prices, source: str = None):
+        self.timestamps = np.asarray(timestamps, dtype=np.int64)
+        self.prices = np.asarray(prices, dtype=np.float64)
+        self.source = source
+    
+    def __len__(self):
+        return len(self.prices)
+    
+    @classmethod
+    def from_klines(cls, open_time, open, high, low, close, close_time=None, source: str = None):
+        """
+        Build an intrabar path from OHLC bars
+        
+        Each bar becomes open -> low -> high -> close when it closed up and
+        open -> high -> low -> close when it closed down, the usual
+        assumption when only bars are available.
+        """
+        open_time = np.asarray(open_time, dtype=np.int64)
+        o, h, l, c = (np.asarray(a, dtype=np.float64) for a in (open, high, low, close))
+        if close_time is None:
+            close_time = np.append(open_time[1:], open_time[-1] + (open_time[-1] - open_time[-2] if len(open_time) > 1 else 60000))
+        close_time = np.asarray(close_time, dtype=np.int64)
+        
+        up = c >= o
+        path = np.empty((len(o), 4))
+        path[:, 0] = o
+        path[:, 1] = np.where(up, l, h)
+        path[:, 2] = np.where(up, h, l)
+        path[:, 3] = c
+        
+        span = close_time - open_time
+        times = open_time[:, None] + (span[:, None] * np.array([0, 1, 2, 3])) // 3
+        return cls(times.ravel(), path.ravel(), source)
+    
+    @classmethod
+    def from_kline_rows(cls, klines, source: str = None):
+        """From python-binance futures_klines() rows"""
+        rows = np.asarray([k[:7] for k in klines], dtype=np.float64)
+        return cls.from_klines(rows[:, 0], rows[:, 1], rows[:, 2], rows[:, 3], rows[:, 4], rows[:, 6], source)
+    
+    @classmethod
+    def from_store(cls, symbol: str, start, end, interval: str = '1m', trades: bool = False,
+                   store: marketdata.MarketDataStore = None):
+        """Klines (or aggregate trades) between start and end from the local market-data store"""
+        store = store or marketdata.store
+        source = f"store:{symbol.upper()}:{'aggTrades' if trades else interval}"
+        if trades:
+            data = store.read(symbol, start, end, 'aggTrades', columns=['time', 'price'])
+            history = cls(data['time'], data['price'], source)
+        else:
+            data = store.read(symbol, start, end, 'klines', interval,
+                              columns=['open_time', 'open', 'high', 'low', 'close', 'close_time'])
+            history = cls(data['open_time'], data['close'], source)
+            if len(history):
+                history = cls.from_klines(data['open_time'], data['open'], data['high'], data['low'],
+                                          data['close'], data['close_time'], source)
+        if not len(history):
+            raise ValueError(f"No stored data for {source} in that range; run marketdata.py sync first")
+        return history
+    
+    @classmethod
+    def load(cls, path: str):
+        """
+        Load klines or trades from a CSV or Parquet file, or the local store
+        
+        CSV files may be Binance kline (12 columns), trade (id, price, qty,
+        quote_qty, time, is_buyer_maker) or aggTrade (7 columns) exports,
+        with or without a header row. Parquet needs pyarrow and columns
+        named like the CSV headers. 'store:SYMBOL:INTERVAL:FIRST_DAY:LAST_DAY'
+        reads the market-data store (INTERVAL 'aggTrades' for trades).
+        """
+        started = time.perf_counter()
+        if path.startswith('store:'):
+            _, symbol, interval, first, last = path.split(':')
+            history = cls.from_store(symbol, first, marketdata.to_ms(last) + marketdata.DAY_MS - 1,
+                                     interval, trades=interval == 'aggTrades')
+        elif path.endswith('.parquet'):
+            history = cls._load_parquet(path)
+        else:
+            history = cls._load_csv(path)
+        logger.info("Loaded %d prices from %s in %.2fs", len(history), path, time.perf_counter() - started)
+        return history
+    
+    @classmethod
+    def _load_csv(cls, path: str):
+        with open(path) as f:
+            first = f.readline().strip().split(',')
+        header = [name.strip().lower() for name in first] if not _is_number(first[0]) else None
+        skip = 1 if header else 0
+        
+        if header:
+            if 'open' in header:
+                cols = [header.index(n) for n in ('open_time', 'open', 'high', 'low', 'close')]
+                cols.append(header.index('close_time') if 'close_time' in header else cols[0])
+                return cls._klines_from_array(np.loadtxt(path, delimiter=',', skiprows=skip, usecols=cols, ndmin=2), path, 'close_time' in header)
+            time_col = header.index('transact_time') if 'transact_time' in header else header.index('time')
+            data = np.loadtxt(path, delimiter=',', skiprows=skip, usecols=(time_col, header.index('price')), ndmin=2)
+            return cls(data[:, 0], data[:, 1], path)
+        
+        if len(first) >= 12:
+            data = np.loadtxt(path, delimiter=',', usecols=(0, 1, 2, 3, 4, 6), ndmin=2)
+            return cls._klines_from_array(data, path, True)
+        time_col = 5 if len(first) == 7 else 4
+        data = np.loadtxt(path, delimiter=',', usecols=(time_col, 1), ndmin=2)
+        return cls(data[:, 0], data[:, 1], path)
+    
+    @classmethod
+    def _klines_from_array(cls, data, path: str, has_close_time: bool):
+        return cls.from_klines(data[:, 0], data[:, 1], data[:, 2], data[:, 3], data[:, 4],
+                               data[:, 5] if has_close_time else None, path)
+    
+    @classmethod
+    def _load_parquet(cls, path: str):
+        if pq is None:
+            raise ImportError("Reading Parquet files requires pyarrow (pip install pyarrow)")
+        table = pq.read_table(path)
+        names = set(table.column_names)
+        column = lambda name: table.column(name).to_numpy()
+        if {'open', 'high', 'low', 'close'} <= names:
+            return cls.from_klines(column('open_time'), column('open'), column('high'), column('low'),
+                                   column('close'), column('close_time') if 'close_time' in names else None, path)
+        time_name = 'transact_time' if 'transact_time' in names else 'time'
+        return cls(column(time_name), column('price'), path)
+    
+    def turning_points(self):
+        """
+        The path reduced to its local extrema (plus both ends)
+        
+        Within a monotone run every grid fill is decided by the run's end
+        point, so fills, fees and final PnL are unchanged; drawdown is
+        then measured at the extrema only.
+        """
+        prices = self.prices
+        if len(prices) < 3:
+            return self
+        keep = np.flatnonzero(np.diff(prices, prepend=np.nan) != 0)
+        direction = np.sign(np.diff(prices[keep]))
+        turns = np.flatnonzero(direction[1:] != direction[:-1]) + 1
+        index = keep[np.unique(np.concatenate(([0], turns, [len(keep) - 1])))]
+        return PriceHistory(self.timestamps[index], prices[index], self.source)
+    
+    def swings(self, threshold: float):
+        """
+        The turning points with every swing smaller than threshold removed
+        
+        A swing (b, c) sitting inside the move around it (between its
+        neighbours a and d) and smaller than one grid step can't both buy
+        and sell, so dropping it leaves fills, fees and PnL unchanged for
+        any grid whose step is at least threshold.
+        """
+        points = self.turning_points()
+        prices = points.prices.tolist()
+        kept = []
+        for i, price in enumerate(prices):
+            kept.append(i)
+            while len(kept) >= 4:
+                a, b, c, d = (prices[k] for k in kept[-4:])
+                if abs(b - c) >= threshold or min(b, c) < min(a, d) or max(b, c) > max(a, d):
+                    break
+                del kept[-3:-1]
+        index = np.asarray(kept)
+        return PriceHistory(points.timestamps[index], points.prices[index], self.source)
+
+
+def _is_number(text: str) -> bool:
+    try:
+        float(text)
+        return True
+    except ValueError:
+        return False
+
+
+def grid_combinations(lowers, uppers, num_grids, quantity=1.0) -> dict:
+    """Every (lower, upper, num_grids) combination with lower < upper, as columns"""
+    lower, upper, grids = np.meshgrid(np.asarray(lowers, dtype=np.float64), np.asarray(uppers, dtype=np.float64),
+                                      np.asarray(num_grids, dtype=np.int64), indexing='ij')
+    valid = (lower < upper) & (grids >= 2)
+    lower, upper, grids = lower[valid], upper[valid], grids[valid]
+    return {
+        'lower': lower,
+        'upper': upper,
+        'num_grids': grids,
+        'quantity': np.broadcast_to(np.asarray(quantity, dtype=np.float64), lower.shape).copy(),
+    }
+
+
+class GridBacktester:
+    """
+    Replays a PriceHistory through grid configurations
+    
+    spacing is 'arithmetic' (equal price steps, as GridBot's default) or
+    'geometric' (equal percentage steps). Geometric grids are arithmetic
+    in log price, so both share one simulation.
+    """
+    
+    def __init__(self, history: PriceHistory, maker_fee: float = 0.0002, spacing: str = 'arithmetic'):
+        if len(history) < 2:
+            raise ValueError("Price history needs at least two prices")
+        if spacing not in ('arithmetic', 'geometric'):
+            raise ValueError(f"Unsupported grid spacing for backtests: {spacing}")
+        self.history = history
+        self.maker_fee = maker_fee
+        self.spacing = spacing
+    
+    def _min_steps(self, combos: dict) -> np.ndarray:
+        """Smallest gap between adjacent levels of each grid"""
+        top = combos['num_grids'] - 1
+        if self.spacing == 'geometric':
+            return combos['lower'] * ((combos['upper'] / combos['lower']) ** (1 / top) - 1)
+        return (combos['upper'] - combos['lower']) / top
+    
+    def run(self, lower: float, upper: float, num_grids: int, quantity_per_grid: float) -> dict:
+        """
+        Backtest one grid over the full price path
+        
+        Returns:
+            Summary metrics plus 'timestamps', 'position' (inventory path in
+            base units) and 'equity' (quote PnL path) arrays
+        """
+        combos = grid_combinations([lower], [upper], [num_grids], quantity_per_grid)
+        if not len(combos['lower']):
+            raise ValueError("lower must be below upper and num_grids at least 2")
+        
+        summary, position, equity = self._simulate(self.history.prices, combos, paths=True)
+        result = {key: value[0].item() for key, value in summary.items()}
+        result.update(timestamps=self.history.timestamps, position=position[:, 0], equity=equity[:, 0])
+        return result
+    
+    def sweep(self, combos: dict, block_cells: int = DEFAULT_BLOCK_CELLS) -> dict:
+        """
+        Backtest many grids (see grid_combinations)
+        
+        Grids are taken in order of increasing (smallest) level step, and
+        the price path is reduced to the swings that step can trade (see swings()),
+        so wide grids run on a much shorter path. Each block of grids is
+        sized to keep its (time x grid) arrays under block_cells.
+        
+        Returns:
+            Column arrays: the combination columns plus one per metric, in
+            the order given
+        """
+        steps = self._min_steps(combos)
+        order = np.argsort(steps, kind='stable')
+        history = self.history.turning_points()
+        
+        columns = {}
+        start = 0
+        while start < len(order):
+            # Relative guard so rounding never drops a swing of exactly one step
+            history = history.swings(steps[order[start]] * (1 - 1e-9))
+            width = max(1, block_cells // len(history))
+            index = order[start:start + width]
+            block = {key: value[index] for key, value in combos.items()}
+            summary, _, _ = self._simulate(history.prices, block)
+            for key, value in {**block, **summary}.items():
+                columns.setdefault(key, []).append(value)
+            start += width
+        
+        inverse = np.empty_like(order)
+        inverse[order] = np.arange(len(order))
+        return {key: np.concatenate(parts)[inverse] for key, parts in columns.items()}
+    
+    def _simulate(self, prices, combos: dict, paths: bool = False):
+        lower = combos['lower']
+        top = (combos['num_grids'] - 1).astype(np.float64)
+        quantity = combos['quantity']
+        n_prices = len(prices)
+        columns = np.arange(len(lower))
+        
+        # Position of each price in level units (level k at x == k); prefix(m)
+        # is the sum of the prices of levels 0..m-1
+        if self.spacing == 'geometric':
+            ratio = (combos['upper'] / lower) ** (1 / top)
+            x = np.log(prices[:, None] / lower) / np.log(ratio)
+            prefix = lambda m: lower * (ratio ** m - 1) / (ratio - 1)
+        else:
+            step = (combos['upper'] - lower) / top
+            x = (prices[:, None] - lower) / step
+            prefix = lambda m: m * lower + step * m * (m - 1) / 2
+        # Price outside the range sits half a level beyond the edge, so the
+        # edge level is below (or above) it, as GridBot places orders there
+        x = np.round(x, 9)
+        x = np.where(x < 0, -0.5, np.where(x > top, top + 0.5, x))
+        floor = np.floor(x)
+        dx = np.diff(x, axis=0)
+        
+        # The grid only changes state when price crosses (or lands on) a
+        # level; the new state is the last level crossed in that direction
+        crossed = ((floor[1:] != floor[:-1]) | (floor[1:] == x[1:])) & (dx != 0)
+        reached = np.where(dx > 0, floor[1:], np.ceil(x[1:]))
+        del floor
+        
+        # Before the first fill no level is empty: buys sit at and below
+        # floor(x0), sells at and above ceil(x0). Which one acts as the
+        # reference level depends on the direction of the first crossing.
+        first = crossed.argmax(axis=0)
+        first_up = dx[first, columns] > 0
+        reference = np.where(first_up, np.floor(x[0]), np.ceil(x[0]))
+        del x, dx
+        
+        last = np.where(crossed, np.arange(1, n_prices)[:, None], 0)
+        np.maximum.accumulate(last, axis=0, out=last)
+        # Forward-fill the level reached at each crossing (row 0 holds the reference)
+        states = np.vstack([reference, reached])
+        level = np.take_along_axis(states, np.vstack([np.zeros((1, len(lower)), dtype=last.dtype), last]), axis=0)
+        del crossed, reached, last, states
+        
+        # Cash from the levels filled at each step: selling k+1..j when
+        # moving up, buying j..k-1 when moving down (prefix sums of levels)
+        moved = np.diff(level, axis=0)
+        shift = (moved > 0).astype(np.float64)
+        cash = quantity * (prefix(level[1:] + shift) - prefix(level[:-1] + shift))
+        del shift
+        fees = np.abs(cash) * self.maker_fee
+        
+        position = quantity * (reference - level)
+        equity = np.vstack([np.zeros((1, len(lower))), np.cumsum(cash - fees, axis=0)]) + position * prices[:, None]
+        drawdown = np.max(np.maximum.accumulate(equity, axis=0) - equity, axis=0)
+        
+        steps = np.abs(moved)
+        final_position = position[-1]
+        summary = {
+            'pnl': equity[-1],
+            'fees': fees.sum(axis=0),
+            'fills': steps.sum(axis=0).astype(np.int64),
+            'buys': np.where(moved < 0, steps, 0).sum(axis=0).astype(np.int64),
+            'sells': np.where(moved > 0, steps, 0).sum(axis=0).astype(np.int64),
+            'round_trips': ((steps.sum(axis=0) - np.abs(final_position) / quantity) // 2).astype(np.int64),
+            'final_position': final_position,
+            'max_long': position.max(axis=0),
+            'max_short': position.min(axis=0),
+            'max_drawdown': drawdown,
+        }
+        if paths:
+            return summary, position, equity
+        return summary, None, None
+
+
+def parameter_grid(**values) -> dict:
+    """Cartesian product of parameter values, as columns"""
+    names = list(values)
+    mesh = np.meshgrid(*(np.asarray(values[name]) for name in names), indexing='ij')
+    return {name: column.ravel() for name, column in zip(names, mesh)}
+
+
+class RangeExtrema:
+    """Sparse tables answering 'first index after i where price crosses a level' in O(log n)"""
+    
+    def __init__(self, prices):
+        self.prices = prices
+        self.maxima = [prices]
+        self.minima = [prices]
+        width = 1
+        while width * 2 <= len(prices):
+            upper, lower = self.maxima[-1], self.minima[-1]
+            self.maxima.append(np.maximum(upper[:-width], upper[width:]))
+            self.minima.append(np.minimum(lower[:-width], lower[width:]))
+            width *= 2
+    
+    def first_reach(self, start, level, end, above: bool):
+        """
+        First index in (start, end] where price >= level (above) or <= level
+        
+        Returns:
+            Index array; end + 1 where the level isn't reached
+        """
+        tables = self.maxima if above else self.minima
+        position = start + 1
+        for power in range(len(tables) - 1, -1, -1):
+            width = 1 << power
+            fits = position + width - 1 <= end
+            table = tables[power]
+            extreme = table[np.minimum(position, len(table) - 1)]
+            clear = extreme < level if above else extreme > level
+            position = np.where(fits & clear, position + width, position)
+        return np.minimum(position, end + 1)
+
+
+def _schedule_starts(history: PriceHistory, start_every: float, duration_ms) -> np.ndarray:
+    """Start times every start_every seconds, leaving room for the longest schedule"""
+    first, last = history.timestamps[0], history.timestamps[-1] - np.max(duration_ms)
+    if last < first:
+        return np.empty(0, dtype=np.int64)
+    return np.arange(first, last + 1, int(start_every * 1000), dtype=np.int64)
+
+
+class TWAPBacktester:
+    """
+    Replays TWAPBot schedules (num_orders market orders, interval_seconds
+    apart) started every start_every seconds, and measures each
+    execution's shortfall against the price when it started
+    """
+    
+    def __init__(self, history: PriceHistory, side: str = 'BUY', taker_fee: float = 0.0004,
+                 start_every: float = 3600):
+        self.history = history
+        self.side = side.upper()
+        self.taker_fee = taker_fee
+        self.start_every = start_every
+    
+    def price_at(self, times) -> np.ndarray:
+        """Last price at or before each timestamp"""
+        index = np.searchsorted(self.history.timestamps, times, side='right') - 1
+        return self.history.prices[np.clip(index, 0, len(self.history) - 1)]
+    
+    def sweep(self, combos: dict) -> dict:
+        """
+        Backtest each (num_orders, interval_seconds[, total_quantity]) combination
+        
+        Returns:
+            Column arrays with shortfall statistics in basis points (fees
+            included; positive is worse than the arrival price)
+        """
+        num_orders = combos['num_orders'].astype(np.int64)
+        interval = combos['interval_seconds'].astype(np.float64)
+        quantity = combos.get('total_quantity', np.ones(len(num_orders)))
+        starts = _schedule_starts(self.history, self.start_every, (num_orders - 1) * interval * 1000)
+        sign = 1 if self.side == 'BUY' else -1
+        
+        columns = {key: [] for key in ('runs', 'mean_shortfall_bps', 'std_shortfall_bps',
+                                       'worst_shortfall_bps', 'executed_quantity', 'duration_s')}
+        for n, seconds, total in zip(num_orders, interval, quantity):
+            # Same per-order rounding as TWAPBot
+            per_order = round(total / n, 3)
+            times = starts[:, None] + (np.arange(n) * seconds * 1000).astype(np.int64)
+            fills = self.price_at(times)
+            arrival = self.price_at(starts)
+            average = fills.mean(axis=1)
+            shortfall = sign * (average - arrival) / arrival * 1e4 + self.taker_fee * 1e4
+            
+            columns['runs'].append(len(starts))
+            columns['mean_shortfall_bps'].append(shortfall.mean() if len(starts) else np.nan)
+            columns['std_shortfall_bps'].append(shortfall.std() if len(starts) else np.nan)
+            columns['worst_shortfall_bps'].append(shortfall.max() if len(starts) else np.nan)
+            columns['executed_quantity'].append(per_order * n)
+            columns['duration_s'].append((n - 1) * seconds)
+        
+        result = {key: np.asarray(value) for key, value in combos.items()}
+        result.update({key: np.asarray(value) for key, value in columns.items()})
+        return result
+
+
+class OCOBacktester:
+    """
+    Opens a position every start_every seconds and closes it with
+    OCOBot's pair: a take-profit limit and a stop-market, each a given
+    percentage from the entry price, or at market after max_hold_seconds
+    """
+    
+    def __init__(self, history: PriceHistory, side: str = 'BUY', taker_fee: float = 0.0004,
+                 maker_fee: float = 0.0002, start_every: float = 3600, max_hold_seconds: float = 86400):
+        self.history = history
+        self.side = side.upper()
+        self.taker_fee = taker_fee
+        self.maker_fee = maker_fee
+        self.start_every = start_every
+        self.max_hold_seconds = max_hold_seconds
+        self.extrema = RangeExtrema(history.prices)
+    
+    def sweep(self, combos: dict) -> dict:
+        """
+        Backtest each (take_profit_pct, stop_loss_pct) combination
+        
+        Returns:
+            Column arrays with per-trade return (basis points, after fees),
+            win rate and how trades ended
+        """
+        timestamps, prices = self.history.timestamps, self.history.prices
+        starts = _schedule_starts(self.history, self.start_every, self.max_hold_seconds * 1000)
+        entry_index = np.searchsorted(timestamps, starts, side='left')
+        horizon = np.searchsorted(timestamps, starts + int(self.max_hold_seconds * 1000), side='right') - 1
+        entry = prices[entry_index]
+        long = self.side == 'BUY'
+        
+        columns = {key: [] for key in ('trades', 'mean_return_bps', 'total_return_pct', 'win_rate',
+                                       'take_profits', 'stop_losses', 'timeouts', 'mean_hold_s')}
+        for tp_pct, sl_pct in zip(combos['take_profit_pct'], combos['stop_loss_pct']):
+            tp_level = entry * (1 + tp_pct / 100 if long else 1 - tp_pct / 100)
+            sl_level = entry * (1 - sl_pct / 100 if long else 1 + sl_pct / 100)
+            tp_at = self.extrema.first_reach(entry_index, tp_level, horizon, above=long)
+            sl_at = self.extrema.first_reach(entry_index, sl_level, horizon, above=not long)
+            
+            take_profit = (tp_at <= horizon) & (tp_at <= sl_at)
+            stop_loss = (sl_at <= horizon) & ~take_profit
+            exit_index = np.where(take_profit, tp_at, np.where(stop_loss, sl_at, horizon))
+            # The take-profit fills at its limit; stops and timeouts at the market
+            exit_price = np.where(take_profit, tp_level, prices[exit_index])
+            exit_fee = np.where(take_profit, self.maker_fee, self.taker_fee)
+            
+            gross = (exit_price - entry) / entry if long else (entry - exit_price) / entry
+            net = gross - self.taker_fee - exit_fee
+            
+            trades = len(starts)
+            columns['trades'].append(trades)
+            columns['mean_return_bps'].append(net.mean() * 1e4 if trades else np.nan)
+            columns['total_return_pct'].append(net.sum() * 100)
+            columns['win_rate'].append((net > 0).mean() if trades else np.nan)
+            columns['take_profits'].append(int(take_profit.sum()))
+            columns['stop_losses'].append(int(stop_loss.sum()))
+            columns['timeouts'].append(int(trades - take_profit.sum() - stop_loss.sum()))
+            columns['mean_hold_s'].append(((timestamps[exit_index] - starts) / 1000).mean() if trades else np.nan)
+        
+        result = {key: np.asarray(value) for key, value in combos.items()}
+        result.update({key: np.asarray(value) for key, value in columns.items()})
+        return result
+
+
+def rank(results: dict, by: str = 'pnl', top: int = None, descending: bool = True) -> list:
+    """Rows of a sweep result sorted by one metric"""
+    metric = results[by].astype(np.float64)
+    # Negating rather than reversing keeps ties in order and NaNs last
+    order = np.argsort(-metric if descending else metric, kind='stable')
+    if top:
+        order = order[:top]
+    return [{key: values[i].item() for key, values in results.items()} for i in order]
+
+
+def parse_range(values, kind):
+    """'60000' or 'start:stop:count' (inclusive linspace) -> array"""
+    parsed = []
+    for value in values:
+        if ':' in value:
+            start, stop, count = value.split(':')
+            parsed.extend(np.linspace(float(start), float(stop), int(count)))
+        else:
+            parsed.append(float(value))
+    return np.unique(np.asarray(parsed, dtype=kind))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backtest grid trading on historical prices')
+    parser.add_argument('path', help='Klines or trades CSV/Parquet file, or store:SYMBOL:INTERVAL:FIRST_DAY:LAST_DAY')
+    parser.add_argument('--lower', nargs='+', required=True, help="Lower bound(s); 'start:stop:count' for a range")
+    parser.add_argument('--upper', nargs='+', required=True, help="Upper bound(s); 'start:stop:count' for a range")
+    parser.add_argument('--grids', nargs='+', required=True, help="Number(s) of grid levels; 'start:stop:count' for a range")
+    parser.add_argument('--quantity', type=float, required=True, help='Quantity per grid order')
+    parser.add_argument('--fee', type=float, default=0.0002, help='Maker fee rate')
+    parser.add_argument('--spacing', default='arithmetic', choices=['arithmetic', 'geometric'])
+    parser.add_argument('--sort', default='pnl', help='Metric to rank by')
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--output', help='Write all results to this CSV file')
+    args = parser.parse_args()
+    
+    history = PriceHistory.load(args.path)
+    backtester = GridBacktester(history, maker_fee=args.fee, spacing=args.spacing)
+    combos = grid_combinations(parse_range(args.lower, np.float64), parse_range(args.upper, np.float64),
+                               parse_range(args.grids, np.int64), args.quantity)
+    
+    started = time.perf_counter()
+    results = backtester.sweep(combos)
+    elapsed = time.perf_counter() - started
+    print(f"{len(combos['lower'])} grids over {len(history)} prices in {elapsed:.2f}s")
+    
+    columns = ('lower', 'upper', 'num_grids', 'pnl', 'fills', 'round_trips', 'final_position', 'max_drawdown')
+    print(' '.join(f'{c:>14}' for c in columns))
+    for row in rank(results, args.sort, args.top):
+        print(' '.join(f'{row[c]:>14.6g}' if isinstance(row[c], float) else f'{row[c]:>14}' for c in columns))
+    
+    if args.output:
+        rows = rank(results, args.sort)
+        with open(args.output, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]) if rows else list(results))
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"Wrote {len(rows)} rows to {os.path.abspath(args.output)}")
+
+
+if __name__ == '__main__':
+    main()
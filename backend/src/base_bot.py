@@ -3,13 +3,20 @@ Base bot class with Binance client initialization
 """
 from binance.client import Client
 from binance.exceptions import BinanceAPIException
+from cache import TTLCache
 from config import Config
+from exchange import create_client
+from tracing import tracer
 from logger import logger
 
 class BaseBot:
     """Base trading bot with Binance client"""
     
-    def __init__(self, api_key: str = None, api_secret: str = None, testnet: bool = True):
+    # Exchange info is public and identical for every user, so it is shared
+    _exchange_info_cache = TTLCache(maxsize=2, ttl=3600, name='exchange_info')
+    
+    def __init__(self, api_key: str = None, api_secret: str = None, testnet: bool = True,
+                 client: Client = None):
         """
         Initialize the bot with API credentials
         
@@ -17,25 +24,35 @@ class BaseBot:
             api_key: Binance API key
             api_secret: Binance API secret
             testnet: Use testnet (default: True)
+            client: Existing authenticated client to reuse (skips the
+                    connection handshake)
         """
+        self.testnet = testnet
+        
+        if client is not None:
+            self.client = client
+            self.api_key = client.API_KEY
+            self.api_secret = client.API_SECRET
+            return
+        
         self.api_key = api_key or Config.API_KEY
         self.api_secret = api_secret or Config.API_SECRET
-        self.testnet = testnet
         
         if not self.api_key or not self.api_secret:
             logger.error("API credentials not provided")
             raise ValueError("API key and secret are required")
         
         try:
-            self.client = Client(self.api_key, self.api_secret, testnet=testnet)
-            
-            # Test connection
-            self.client.futures_ping()
-            logger.info("Successfully connected to Binance Futures Testnet")
-            
-            # Get account info
-            account = self.client.futures_account()
-            logger.info(f"Account connected. Total Balance: {account.get('totalWalletBalance', 'N/A')} USDT")
+            with tracer.span('binance.connect', bot=type(self).__name__, testnet=testnet):
+                self.client = create_client(self.api_key, self.api_secret, testnet=testnet)
+                
+                # Test connection
+                self.client.futures_ping()
+                logger.info("Successfully connected to Binance Futures Testnet")
+                
+                # Get account info
+                account = self.client.futures_account()
+                logger.info(f"Account connected. Total Balance: {account.get('totalWalletBalance', 'N/A')} USDT")
             
         except BinanceAPIException as e:
             logger.error(f"Binance API Error: {e}")
@@ -44,14 +61,19 @@ class BaseBot:
             logger.error(f"Connection error: {e}")
             raise
     
+    def get_exchange_info(self):
+        """Get futures exchange info (cached for an hour)"""
+        exchange_info = self._exchange_info_cache.get(self.testnet)
+        if exchange_info is None:
+            exchange_info = self.client.futures_exchange_info()
+            exchange_info['symbols_by_name'] = {s['symbol']: s for s in exchange_info['symbols']}
+            self._exchange_info_cache.set(self.testnet, exchange_info)
+        return exchange_info
+    
     def get_symbol_info(self, symbol: str):
         """Get symbol information"""
         try:
-            exchange_info = self.client.futures_exchange_info()
-            for s in exchange_info['symbols']:
-                if s['symbol'] == symbol:
-                    return s
-            return None
+            return self.get_exchange_info()['symbols_by_name'].get(symbol)
         except Exception as e:
             logger.error(f"Error getting symbol info: {e}")
             return None
@@ -61,7 +83,7 @@ class BaseBot:
         try:
             ticker = self.client.futures_symbol_ticker(symbol=symbol)
             price = float(ticker['price'])
-            logger.debug(f"Current price for {symbol}: {price}")
+            logger.debug("Current price for %s: %s", symbol, price)
             return price
         except Exception as e:
             logger.error(f"Error getting price for {symbol}: {e}")
@@ -0,0 +1,204 @@
+"""
+Per-user bot sessions
+
+Maps a JWT identity to that user's own Binance client and bot instances,
+so concurrent users never share credentials. Whether a user is connected
+is recorded in the 'sessions' collection, which every worker can read: a
+worker that has not seen the user yet rebuilds the session from the
+stored credentials instead of requiring another /api/connect.
+"""
+import os
+import threading
+import time
+from datetime import datetime
+from binance.client import Client
+from account_state import AccountState, account_streams
+from cache import TTLCache
+from database import db
+from exchange import create_client
+from logger import logger
+from tracing import tracer
+from market_orders import MarketOrderBot
+import auth
+
+
+class BotSession:
+    """One user's Binance client plus lazily created bots sharing it"""
+    
+    def __init__(self, email: str, client: Client, testnet: bool = True):
+        self.email = email
+        self.client = client
+        self.testnet = testnet
+        self.balance = None
+        self.connected_at = datetime.utcnow()
+        self.checked_at = time.monotonic()
+        self.account = AccountState()
+        self._bots = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+        self.closed = False
+    
+    def get_bot(self, bot_class):
+        """Return this session's instance of a bot class (e.g. LimitOrderBot)"""
+        bot = self._bots.get(bot_class)
+        if bot is None:
+            with self._lock:
+                bot = self._bots.get(bot_class)
+                if bot is None:
+                    bot = bot_class(testnet=self.testnet, client=self.client)
+                    self._bots[bot_class] = bot
+        return bot
+    
+    def add_user_event_listener(self, callback):
+        """Register callback(event) for this user's user-data stream events"""
+        self._listeners.append(callback)
+    
+    def dispatch_user_event(self, event: dict):
+        for callback in self._listeners:
+            try:
+                callback(event)
+            except Exception as e:
+                logger.error(f"User event listener error ({self.email}): {e}")
+    
+    def start_account_stream(self):
+        """Keep self.account current from the user-data stream"""
+        account_streams.start(self)
+    
+    def ensure_account(self):
+        """Make sure the account snapshot is seeded and being kept current"""
+        if not self.account.seeded:
+            account = self.get_bot(MarketOrderBot).get_account_balance()
+            if account:
+                self.account.seed(account)
+        if not account_streams.is_streaming(self):
+            self.start_account_stream()
+        return self.account
+    
+    def close(self):
+        self.closed = True
+        account_streams.stop(self)
+
+
+class BotSessionManager:
+    """Creates, caches and tears down per-user bot sessions"""
+    
+    def __init__(self, max_sessions: int = None, idle_ttl: float = None, recheck_seconds: float = None):
+        # How often a cached session re-reads the shared store, so a
+        # disconnect in one worker reaches the others
+        self.recheck_seconds = recheck_seconds or float(os.getenv('BOT_SESSION_RECHECK', 30))
+        self._sessions = TTLCache(
+            maxsize=max_sessions or int(os.getenv('BOT_SESSION_MAX', 1000)),
+            ttl=idle_ttl or float(os.getenv('BOT_SESSION_TTL', 3600)),
+            name='bot_session',
+            on_evict=lambda email, session: session.close(),
+            sliding=True
+        )
+        self._lock = threading.Lock()
+        self._hooks = []
+    
+    def on_session(self, callback):
+        """
+        Register callback(session) for every session this manager creates,
+        including ones rebuilt after the previous session was evicted
+        """
+        self._hooks.append(callback)
+    
+    def _opened(self, session: BotSession):
+        for callback in self._hooks:
+            try:
+                callback(session)
+            except Exception as e:
+                logger.error(f"Bot session hook error ({session.email}): {e}")
+    
+    def connect(self, email: str, testnet: bool = True):
+        """
+        Verify the user's credentials against Binance and open a session
+        
+        Returns:
+            The new BotSession
+        
+        Raises:
+            ValueError: If the user has no API credentials
+        """
+        api_key, api_secret = auth.auth_service.get_api_credentials(email)
+        if not api_key or not api_secret:
+            raise ValueError('API credentials not set')
+        
+        # Full handshake (ping + account) only on explicit connect
+        bot = MarketOrderBot(api_key, api_secret, testnet=testnet)
+        session = BotSession(email, bot.client, testnet)
+        session._bots[MarketOrderBot] = bot
+        
+        account = bot.get_account_balance()
+        session.balance = account.get('totalWalletBalance') if account else None
+        if account:
+            session.account.seed(account)
+            session.start_account_stream()
+        
+        db.sessions.update_one(
+            {'user_email': email},
+            {'$set': {
+                'user_email': email,
+                'connected': True,
+                'testnet': testnet,
+                'connected_at': session.connected_at,
+                'balance': session.balance
+            }},
+            upsert=True
+        )
+        self._sessions.set(email, session)
+        logger.info(f"Bot session opened: {email}")
+        self._opened(session)
+        return session
+    
+    def get(self, email: str):
+        """Return the user's session, rebuilding it if another worker opened it"""
+        with tracer.span('bot_session.get'):
+            return self._lookup(email)
+    
+    def _lookup(self, email: str):
+        session = self._sessions.get(email)
+        if session is not None:
+            if time.monotonic() - session.checked_at < self.recheck_seconds:
+                return session
+            if db.sessions.find_one({'user_email': email, 'connected': True}):
+                session.checked_at = time.monotonic()
+                return session
+            self._sessions.invalidate(email)
+            return None
+        
+        with self._lock:
+            session = self._sessions.get(email)
+            if session is not None:
+                return session
+            
+            record = db.sessions.find_one({'user_email': email, 'connected': True})
+            if not record:
+                return None
+            
+            api_key, api_secret = auth.auth_service.get_api_credentials(email)
+            if not api_key or not api_secret:
+                return None
+            
+            testnet = record.get('testnet', True)
+            session = BotSession(email, create_client(api_key, api_secret, testnet=testnet), testnet)
+            session.balance = record.get('balance')
+            self._sessions.set(email, session)
+            logger.debug(f"Bot session restored: {email}")
+        
+        # Outside the lock: hooks may call the exchange
+        self._opened(session)
+        return session
+    
+    def disconnect(self, email: str):
+        """Close the user's session in every worker"""
+        self._sessions.invalidate(email)
+        db.sessions.update_one(
+            {'user_email': email},
+            {'$set': {'connected': False, 'disconnected_at': datetime.utcnow()}}
+        )
+        logger.info(f"Bot session closed: {email}")
+
+
+# Global session manager
+bot_sessions = BotSessionManager()
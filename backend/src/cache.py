@@ -0,0 +1,113 @@
+"""
+In-process caches
+"""
+import copy
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a TTL"""
+    
+    # Every live cache, for metrics
+    instances = weakref.WeakSet()
+    
+    def __init__(self, maxsize: int = 10000, ttl: float = 300, name: str = 'cache', on_evict=None,
+                 sliding: bool = False):
+        """
+        Args:
+            maxsize: Max entries before the least recently used is evicted
+            ttl: Seconds an entry stays valid after it is set (or, when
+                 sliding, after it was last read)
+            name: Label used in metrics
+            on_evict: Optional callback(key, value) run when an entry is
+                      dropped (expired, evicted or invalidated)
+            sliding: Refresh an entry's expiry on every hit, making ttl
+                     an idle timeout
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self.on_evict = on_evict
+        self.sliding = sliding
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        TTLCache.instances.add(self)
+    
+    def get(self, key, default=None):
+        """Return a cached value, or default if missing/expired"""
+        now = time.monotonic()
+        expired = None
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            if entry[0] <= now:
+                expired = self._data.pop(key)
+                self.misses += 1
+            else:
+                if self.sliding:
+                    self._data[key] = (now + self.ttl, entry[1])
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+        self._evicted([(key, expired[1])])
+        return default
+    
+    def set(self, key, value):
+        """Store a value, evicting the least recently used entry if full"""
+        dropped = []
+        with self._lock:
+            previous = self._data.get(key)
+            if previous is not None and previous[1] is not value:
+                dropped.append((key, previous[1]))
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                old_key, (_, old_value) = self._data.popitem(last=False)
+                dropped.append((old_key, old_value))
+        self._evicted(dropped)
+    
+    def invalidate(self, key):
+        """Remove one entry"""
+        with self._lock:
+            entry = self._data.pop(key, None)
+        if entry is not None:
+            self._evicted([(key, entry[1])])
+    
+    def clear(self):
+        with self._lock:
+            dropped = [(key, value) for key, (_, value) in self._data.items()]
+            self._data.clear()
+        self._evicted(dropped)
+    
+    def _evicted(self, entries):
+        if self.on_evict:
+            for key, value in entries:
+                self.on_evict(key, value)
+    
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+    
+    def __len__(self):
+        return len(self._data)
+
+
+def copy_value(value):
+    """Deep copy a cached document so callers can't mutate the cache"""
+    return copy.deepcopy(value)
+
+
+# User profiles (without password hash) keyed by email / JWT identity
+user_cache = TTLCache(
+    maxsize=int(os.getenv('USER_CACHE_SIZE', 10000)),
+    ttl=float(os.getenv('USER_CACHE_TTL', 60)),
+    name='user_profile'
+)
@@ -10,7 +10,9 @@ from limit_orders import LimitOrderBot
 from advanced.stop_limit import StopLimitBot
 from advanced.oco import OCOBot
 from advanced.twap import TWAPBot
-from advanced.grid import GridBot
+from advanced.trailing_stop import TrailingStopBot
+from advanced.bracket import BracketBot
+from advanced.grid import GridBot, SPACINGS, new_grid_id
 
 
 class TradingBotCLI:
@@ -66,18 +68,22 @@ class TradingBotCLI:
         print("  4. OCO Order (Take Profit + Stop Loss)")
         print("  5. TWAP Order")
         print("  6. Grid Trading")
+        print("  7. Trailing Stop")
+        print("  8. Bracket Order (Entry + Take Profit + Stop Loss)")
         print("\nOther:")
-        print("  7. View Open Orders")
-        print("  8. Cancel Order")
-        print("  9. Check Account Balance")
+        print("  9. View Open Orders")
+        print("  10. Cancel Order")
+        print("  11. Check Account Balance")
         print("  0. Exit")
         print("="*60)
     
-    def get_input(self, prompt: str, validator_func=None) -> any:
-        """Get and validate user input"""
+    def get_input(self, prompt: str, validator_func=None, optional: bool = False) -> any:
+        """Get and validate user input (None for empty input when optional)"""
         while True:
             value = input(prompt).strip()
             if not value:
+                if optional:
+                    return None
                 print("❌ Input cannot be empty")
                 continue
             
@@ -167,6 +173,12 @@ class TradingBotCLI:
     def handle_grid_trading(self):
         """Handle grid trading setup"""
         print("\n--- GRID TRADING ---")
+        print("  1. Set up a grid")
+        print("  2. Cancel grid orders")
+        action = self.get_input("Select: ", lambda x: (x in ('1', '2'), x))
+        if action == '2':
+            self.handle_cancel_grid()
+            return
         
         symbol = self.get_input("Symbol (e.g., BTCUSDT): ", self.validator.validate_symbol)
         lower = self.get_input("Lower Price: ", self.validator.validate_price)
@@ -175,10 +187,62 @@ class TradingBotCLI:
                                    lambda x: self.validator.validate_integer(x, 2))
         qty_per_grid = self.get_input("Quantity per Grid: ", self.validator.validate_quantity)
         
+        spacing = self.get_input("Spacing (arithmetic/geometric/atr): ",
+                                 lambda x: (x.lower() in SPACINGS, x.lower()))
+        atr_multiplier = 1.0
+        if spacing == 'atr':
+            atr_multiplier = self.get_input("Level spacing in ATRs (e.g., 0.5): ", self.validator.validate_price)
+        
         confirm = input(f"\nConfirm Grid setup for {symbol}? (y/n): ")
         if confirm.lower() == 'y':
+            grid_id = new_grid_id()
             bot = GridBot(testnet=True)
-            bot.setup_grid(symbol, lower, upper, num_grids, qty_per_grid)
+            bot.setup_grid(symbol, lower, upper, num_grids, qty_per_grid, spacing, atr_multiplier, grid_id)
+            print(f"Grid ID: {grid_id} (use it to cancel just this grid's orders)")
+    
+    def handle_cancel_grid(self):
+        """Cancel grid orders without touching other open orders"""
+        symbol = self.get_input("Symbol (e.g., BTCUSDT): ", self.validator.validate_symbol)
+        grid_id = input("Grid ID (leave empty for every grid): ").strip() or None
+        
+        bot = GridBot(testnet=True)
+        results = bot.cancel_all_grid_orders(symbol, grid_id)
+        if results is not None:
+            cancelled = sum(1 for r in results if 'orderId' in r)
+            print(f"✓ {cancelled} grid orders cancelled; other orders left in place")
+    
+    def handle_trailing_stop_order(self):
+        """Handle trailing-stop order placement"""
+        print("\n--- TRAILING STOP ---")
+        
+        symbol = self.get_input("Symbol (e.g., BTCUSDT): ", self.validator.validate_symbol)
+        side = self.get_input("Side (BUY/SELL): ", self.validator.validate_side)
+        quantity = self.get_input("Quantity: ", self.validator.validate_quantity)
+        callback_rate = self.get_input("Callback Rate % (0.1 - 10): ", self.validator.validate_callback_rate)
+        activation_price = self.get_input("Activation Price (leave empty to trail now): ",
+                                          self.validator.validate_price, optional=True)
+        
+        confirm = input(f"\nConfirm TRAILING STOP {side} {quantity} {symbol} ({callback_rate}%)? (y/n): ")
+        if confirm.lower() == 'y':
+            bot = TrailingStopBot(testnet=True)
+            bot.place_trailing_stop_order(symbol, side, quantity, callback_rate, activation_price)
+    
+    def handle_bracket_order(self):
+        """Handle bracket order placement"""
+        print("\n--- BRACKET ORDER (Entry + Take Profit + Stop Loss) ---")
+        
+        symbol = self.get_input("Symbol (e.g., BTCUSDT): ", self.validator.validate_symbol)
+        side = self.get_input("Entry Side (BUY/SELL): ", self.validator.validate_side)
+        quantity = self.get_input("Quantity: ", self.validator.validate_quantity)
+        entry_price = self.get_input("Entry Limit Price (leave empty for market): ",
+                                     self.validator.validate_price, optional=True)
+        tp_price = self.get_input("Take Profit Price: ", self.validator.validate_price)
+        sl_price = self.get_input("Stop Loss Price: ", self.validator.validate_price)
+        
+        confirm = input(f"\nConfirm BRACKET {side} {quantity} {symbol} @ {entry_price or 'MARKET'}? (y/n): ")
+        if confirm.lower() == 'y':
+            bot = BracketBot(testnet=True)
+            bot.place_bracket_order(symbol, side, quantity, tp_price, sl_price, entry_price)
     
     def handle_view_orders(self):
         """View open orders"""
@@ -251,10 +315,14 @@ class TradingBotCLI:
                 elif choice == '6':
                     self.handle_grid_trading()
                 elif choice == '7':
-                    self.handle_view_orders()
+                    self.handle_trailing_stop_order()
                 elif choice == '8':
-                    self.handle_cancel_order()
+                    self.handle_bracket_order()
                 elif choice == '9':
+                    self.handle_view_orders()
+                elif choice == '10':
+                    self.handle_cancel_order()
+                elif choice == '11':
                     self.handle_account_balance()
                 elif choice == '0':
                     print("\n✓ Exiting bot. Goodbye!")
@@ -262,7 +330,7 @@ class TradingBotCLI:
                     break
                 else:
                     print("❌ Invalid option. Please try again.")
-                
+            
             except KeyboardInterrupt:
                 print("\n\n✓ Bot interrupted. Exiting...")
                 logger.info("Bot interrupted by user")
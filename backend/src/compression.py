@@ -0,0 +1,99 @@
+"""
+Response compression
+
+Compresses JSON/text responses above a size threshold with brotli (if
+the brotli package is installed and the client accepts it) or gzip.
+Small responses are sent as-is: below ~1 KB compression saves little and
+costs CPU on every request.
+"""
+import gzip
+import os
+from flask import request
+from logger import logger
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/')
+
+
+def choose_encoding(accept_encoding: str):
+    """Pick the best encoding the client accepts ('br', 'gzip' or None)"""
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        if params.strip().startswith('q='):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name.lower()] = q
+    
+    if brotli is not None and accepted.get('br', 0) > 0:
+        return 'br'
+    if accepted.get('gzip', 0) > 0:
+        return 'gzip'
+    return None
+
+
+def compress(data: bytes, encoding: str, level: int = None) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(data, quality=4 if level is None else level)
+    return gzip.compress(data, compresslevel=6 if level is None else level)
+
+
+class Compression:
+    """Flask after_request hook that compresses large responses"""
+    
+    def __init__(self, app=None):
+        self.min_size = 1024
+        self.gzip_level = 6
+        self.brotli_quality = 4
+        self.enabled = True
+        if app:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        self.enabled = os.getenv('COMPRESS_RESPONSES', 'True') == 'True'
+        self.min_size = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+        self.gzip_level = int(os.getenv('COMPRESS_GZIP_LEVEL', 6))
+        self.brotli_quality = int(os.getenv('COMPRESS_BROTLI_QUALITY', 4))
+        app.after_request(self.after_request)
+        logger.info(f"Response compression {'enabled' if self.enabled else 'disabled'} "
+                    f"(min {self.min_size} bytes, brotli {'available' if brotli else 'not installed'})")
+    
+    def after_request(self, response):
+        if (not self.enabled
+                or response.direct_passthrough
+                or response.status_code < 200 or response.status_code in (204, 304)
+                or 'Content-Encoding' in response.headers
+                or not (response.mimetype or '').startswith(COMPRESSIBLE_TYPES)):
+            return response
+        
+        response.vary.add('Accept-Encoding')
+        
+        encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+        if encoding is None:
+            return response
+        
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+        
+        try:
+            level = self.brotli_quality if encoding == 'br' else self.gzip_level
+            response.set_data(compress(data, encoding, level))
+        except Exception as e:
+            logger.error(f"Response compression error: {e}")
+            return response
+        
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+
+# Global compression hook
+compression = Compression()
@@ -19,7 +19,7 @@ class Config:
     MIN_QUANTITY = 0.001
     
     # Logging Configuration
-    LOG_FILE = "bot.log"
+    LOG_FILE = os.getenv('LOG_FILE', 'bot.log')
     LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
     LOG_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
     
@@ -1,70 +1,251 @@
 """
-MongoDB database connection and management
+Database connection and management
+
+Supports two storage backends, selected with DATABASE_BACKEND:
+- mongodb (default): MongoDB via PyMongo (MONGODB_URI)
+- sqlite: embedded SQLite file in WAL mode (SQLITE_PATH)
+
+Indexes are managed as versioned migrations recorded in the 'migrations'
+collection, so a process start only costs one lookup once the schema is
+current instead of re-issuing every create_index call.
 """
 import os
+from datetime import datetime
 from pymongo import MongoClient
+from pymongo import monitoring
 from pymongo.errors import ConnectionFailure
 from logger import logger
+from metrics import db_operation_seconds
+from tracing import tracer
+from sqlite_backend import SQLiteDatabase
+
+
+def _migration_001_initial_indexes(database):
+    """Users and orders indexes"""
+    # Users collection indexes
+    database.users.create_index('email', unique=True)
+    database.users.create_index('created_at')
+    
+    # Orders collection indexes
+    database.orders.create_index('user_email')
+    database.orders.create_index('timestamp')
+    database.orders.create_index([('user_email', 1), ('timestamp', -1)])
+
+
+def _migration_002_price_alerts(database):
+    """Price alerts indexes"""
+    database.price_alerts.create_index('alert_id', unique=True)
+    database.price_alerts.create_index([('user_email', 1), ('created_at', -1)])
+    database.price_alerts.create_index('active')
+
+
+def _migration_003_sessions(database):
+    """Bot sessions index"""
+    database.sessions.create_index('user_email', unique=True)
+
+
+def _migration_004_grids(database):
+    """Running grid indexes"""
+    database.grids.create_index('grid_id', unique=True)
+    database.grids.create_index([('user_email', 1), ('status', 1)])
+    database.grids.create_index([('status', 1), ('lease_until', 1)])
+
+
+def _migration_005_emulated_orders(database):
+    """Emulated conditional order indexes"""
+    database.emulated_orders.create_index('order_id', unique=True)
+    database.emulated_orders.create_index([('user_email', 1), ('created_at', -1)])
+    database.emulated_orders.create_index('status')
+
+
+# Ordered (version, migration) pairs. Append new entries; never edit applied ones.
+INDEX_MIGRATIONS = [
+    (1, _migration_001_initial_indexes),
+    (2, _migration_002_price_alerts),
+    (3, _migration_003_sessions),
+    (4, _migration_004_grids),
+    (5, _migration_005_emulated_orders),
+]
+
+
+class CommandTimer(monitoring.CommandListener):
+    """Records MongoDB command latency in the db_operation_duration_seconds histogram"""
+    
+    def started(self, event):
+        pass
+    
+    def succeeded(self, event):
+        db_operation_seconds.observe(event.duration_micros / 1e6, event.command_name, 'success')
+        tracer.record(f"mongodb.{event.command_name}", event.duration_micros / 1e6,
+                      **{'db.name': event.database_name})
+    
+    def failed(self, event):
+        db_operation_seconds.observe(event.duration_micros / 1e6, event.command_name, 'failure')
+        tracer.record(f"mongodb.{event.command_name}", event.duration_micros / 1e6,
+                      **{'db.name': event.database_name, 'error': True})
+
 
 class Database:
-    """MongoDB database wrapper"""
+    """Database wrapper exposing users/orders/sessions collections"""
     
-    def __init__(self, connection_string=None):
-        self.connection_string = connection_string or os.getenv('MONGODB_URI', 'mongodb://localhost:27017/')
+    def __init__(self, connection_string=None, backend=None):
+        self.backend = (backend or os.getenv('DATABASE_BACKEND', 'mongodb')).lower()
+        if self.backend == 'sqlite':
+            self.connection_string = connection_string or os.getenv('SQLITE_PATH', 'trading_bot.db')
+        else:
+            self.connection_string = connection_string or os.getenv('MONGODB_URI', 'mongodb://localhost:27017/')
+        self.db_name = None
         self.client = None
         self.db = None
         self.users = None
         self.orders = None
         self.sessions = None
+        self.price_alerts = None
+        self.grids = None
+        self.emulated_orders = None
+        self.pid = None
+    
+    @staticmethod
+    def mongo_client_options() -> dict:
+        """Connection pool settings for MongoClient, from environment"""
+        return {
+            'maxPoolSize': int(os.getenv('MONGODB_MAX_POOL_SIZE', 20)),
+            'minPoolSize': int(os.getenv('MONGODB_MIN_POOL_SIZE', 0)),
+            'maxIdleTimeMS': int(os.getenv('MONGODB_MAX_IDLE_TIME_MS', 300000)),
+            'waitQueueTimeoutMS': int(os.getenv('MONGODB_WAIT_QUEUE_TIMEOUT_MS', 5000)),
+            'connectTimeoutMS': int(os.getenv('MONGODB_CONNECT_TIMEOUT_MS', 5000)),
+            'socketTimeoutMS': int(os.getenv('MONGODB_SOCKET_TIMEOUT_MS', 20000)),
+            'serverSelectionTimeoutMS': int(os.getenv('MONGODB_SERVER_SELECTION_TIMEOUT_MS', 5000)),
+            'retryWrites': True,
+            'event_listeners': [CommandTimer()],
+        }
     
-    def connect(self, db_name='binance_trading_bot'):
-        """Connect to MongoDB"""
+    def connect(self, db_name='binance_trading_bot', run_migrations=True):
+        """
+        Connect to the configured storage backend
+        
+        Args:
+            db_name: MongoDB database name (ignored for SQLite)
+            run_migrations: Apply pending index migrations after connecting
+        """
         try:
-            self.client = MongoClient(self.connection_string, serverSelectionTimeoutMS=5000)
+            self.db_name = db_name
             
-            # Test connection
-            self.client.admin.command('ping')
+            if self.backend == 'sqlite':
+                self.client = SQLiteDatabase(self.connection_string)
+                self.db = self.client
+                
+                # Test connection
+                self.db.command('ping')
+            elif self.backend == 'mongodb':
+                self.client = MongoClient(self.connection_string, **self.mongo_client_options())
+                
+                # Test connection
+                self.client.admin.command('ping')
+                
+                self.db = self.client[db_name]
+            else:
+                logger.error(f"Unknown database backend: {self.backend}")
+                return False
             
-            self.db = self.client[db_name]
             self.users = self.db['users']
             self.orders = self.db['orders']
             self.sessions = self.db['sessions']
+            self.price_alerts = self.db['price_alerts']
+            self.grids = self.db['grids']
+            self.emulated_orders = self.db['emulated_orders']
+            self.pid = os.getpid()
             
-            # Create indexes
-            self.create_indexes()
+            if run_migrations:
+                self.migrate()
             
-            logger.info(f"Connected to MongoDB: {db_name}")
+            if self.backend == 'sqlite':
+                logger.info(f"Connected to SQLite: {self.connection_string}")
+            else:
+                logger.info(f"Connected to MongoDB: {db_name}")
             return True
-            
+        
         except ConnectionFailure as e:
             logger.error(f"MongoDB connection failed: {e}")
             return False
         except Exception as e:
-            logger.error(f"MongoDB error: {e}")
+            logger.error(f"Database error ({self.backend}): {e}")
             return False
     
-    def create_indexes(self):
-        """Create database indexes"""
+    def reconnect_after_fork(self):
+        """
+        Open fresh connections in a forked worker process
+        
+        MongoClient is not fork-safe, so a client created in the parent
+        (e.g. gunicorn master with preload_app) must not be reused by the
+        child. The parent's client is dropped without closing it, since its
+        sockets still belong to the parent.
+        """
+        if self.pid == os.getpid() or self.db_name is None:
+            return True
+        
+        self.client = None
+        return self.connect(self.db_name, run_migrations=False)
+    
+    def schema_version(self) -> int:
+        """Return the applied index migration version"""
+        record = self.db['migrations'].find_one({'name': 'indexes'})
+        return record['version'] if record else 0
+    
+    def migrate(self):
+        """Apply pending index migrations"""
         try:
-            # Users collection indexes
-            self.users.create_index('email', unique=True)
-            self.users.create_index('created_at')
+            current = self.schema_version()
+            pending = [(v, m) for v, m in INDEX_MIGRATIONS if v > current]
             
-            # Orders collection indexes
-            self.orders.create_index('user_email')
-            self.orders.create_index('timestamp')
-            self.orders.create_index([('user_email', 1), ('timestamp', -1)])
+            if not pending:
+                logger.debug(f"Database indexes up to date (version {current})")
+                return current
             
-            logger.info("Database indexes created")
+            for version, migration in pending:
+                logger.info(f"Applying index migration {version}: {migration.__doc__}")
+                migration(self)
+                self.db['migrations'].update_one(
+                    {'name': 'indexes'},
+                    {'$set': {'version': version, 'applied_at': datetime.utcnow()}},
+                    upsert=True
+                )
             
+            logger.info(f"Database indexes migrated to version {pending[-1][0]}")
+            return pending[-1][0]
+        
+        except Exception as e:
+            logger.error(f"Error migrating indexes: {e}")
+            return None
+    
+    def create_indexes(self):
+        """Create all database indexes regardless of recorded version"""
+        try:
+            for _, migration in INDEX_MIGRATIONS:
+                migration(self)
+            
+            logger.info("Database indexes created")
+        
         except Exception as e:
             logger.error(f"Error creating indexes: {e}")
     
     def disconnect(self):
-        """Disconnect from MongoDB"""
+        """Disconnect from the database"""
         if self.client:
             self.client.close()
-            logger.info("Disconnected from MongoDB")
+            logger.info(f"Disconnected from {self.backend}")
 
 # Global database instance
 db = Database()
+
+if __name__ == '__main__':
+    # One-off migration step, e.g. as a release/pre-deploy command
+    from dotenv import load_dotenv
+    load_dotenv()
+    
+    database = Database()
+    if not database.connect(run_migrations=False):
+        raise SystemExit(1)
+    version = database.migrate()
+    database.disconnect()
+    raise SystemExit(0 if version is not None else 1)
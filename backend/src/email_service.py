@@ -1,52 +1,44 @@
 """
 Email service for sending verification emails
+
+Emails are queued and delivered by a background worker so request
+handlers never wait on SMTP. The worker keeps one SMTP connection open
+while there is traffic, sends queued emails in batches over it, and
+retries failures with exponential backoff.
+
+MAIL_BACKEND selects the transport:
+- smtp (default): Flask-Mail SMTP connection
+- maildir: write messages to the Maildir at MAIL_MAILDIR (for tests/dev)
 """
+import atexit
+import heapq
+import itertools
+import mailbox
 import os
+import queue
+import threading
+import time
+from html import escape
+from string import Template
 from flask_mail import Mail, Message
 from logger import logger
 
-class EmailService:
-    """Email service for sending verification and notification emails"""
-    
-    def __init__(self, app=None):
-        self.mail = None
-        if app:
-            self.init_app(app)
-    
-    def init_app(self, app):
-        """Initialize Flask-Mail"""
-        app.config['MAIL_SERVER'] = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
-        app.config['MAIL_PORT'] = int(os.getenv('MAIL_PORT', 587))
-        app.config['MAIL_USE_TLS'] = os.getenv('MAIL_USE_TLS', 'True') == 'True'
-        app.config['MAIL_USERNAME'] = os.getenv('MAIL_USERNAME')
-        app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD')
-        app.config['MAIL_DEFAULT_SENDER'] = os.getenv('MAIL_DEFAULT_SENDER', 'noreply@tradingbot.com')
-        
-        self.mail = Mail(app)
-        logger.info("Email service initialized")
-    
-    def send_verification_email(self, email: str, token: str, base_url: str):
-        """Send email verification link"""
-        try:
-            verification_url = f"{base_url}/verify-email?token={token}"
-            
-            msg = Message(
-                subject="Verify Your Email - Binance Trading Bot",
-                recipients=[email],
-                html=f"""
+
+# Templates are parsed once at import; only the URL is substituted per email
+VERIFICATION_TEMPLATE = Template("""
                 <html>
                 <body style="font-family: Arial, sans-serif; padding: 20px;">
                     <h2>Welcome to Binance Trading Bot!</h2>
                     <p>Thank you for registering. Please verify your email address by clicking the link below:</p>
                     <p>
-                        <a href="{verification_url}" 
-                           style="background-color: #4CAF50; color: white; padding: 14px 20px; 
+                        <a href="$url"
+                           style="background-color: #4CAF50; color: white; padding: 14px 20px;
                                   text-decoration: none; border-radius: 4px; display: inline-block;">
                             Verify Email
                         </a>
                     </p>
                     <p>Or copy and paste this link in your browser:</p>
-                    <p>{verification_url}</p>
+                    <p>$url</p>
                     <p>This link will expire in 24 hours.</p>
                     <hr>
                     <p style="color: #666; font-size: 12px;">
@@ -54,39 +46,22 @@ class EmailService:
                     </p>
                 </body>
                 </html>
-                """
-            )
-            
-            self.mail.send(msg)
-            logger.info(f"Verification email sent to: {email}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Error sending verification email: {e}")
-            return False
-    
-    def send_password_reset_email(self, email: str, token: str, base_url: str):
-        """Send password reset link"""
-        try:
-            reset_url = f"{base_url}/reset-password?token={token}"
-            
-            msg = Message(
-                subject="Reset Your Password - Binance Trading Bot",
-                recipients=[email],
-                html=f"""
+                """)
+
+PASSWORD_RESET_TEMPLATE = Template("""
                 <html>
                 <body style="font-family: Arial, sans-serif; padding: 20px;">
                     <h2>Password Reset Request</h2>
                     <p>You requested to reset your password. Click the link below to proceed:</p>
                     <p>
-                        <a href="{reset_url}" 
-                           style="background-color: #2196F3; color: white; padding: 14px 20px; 
+                        <a href="$url"
+                           style="background-color: #2196F3; color: white; padding: 14px 20px;
                                   text-decoration: none; border-radius: 4px; display: inline-block;">
                             Reset Password
                         </a>
                     </p>
                     <p>Or copy and paste this link in your browser:</p>
-                    <p>{reset_url}</p>
+                    <p>$url</p>
                     <p>This link will expire in 1 hour.</p>
                     <hr>
                     <p style="color: #666; font-size: 12px;">
@@ -94,16 +69,204 @@ class EmailService:
                     </p>
                 </body>
                 </html>
-                """
-            )
-            
-            self.mail.send(msg)
-            logger.info(f"Password reset email sent to: {email}")
+                """)
+
+
+class EmailService:
+    """Email service for sending verification and notification emails"""
+    
+    def __init__(self, app=None):
+        self.mail = None
+        self.app = None
+        self.backend = 'smtp'
+        self.maildir = None
+        self.batch_size = 50
+        self.idle_timeout = 30.0
+        self.max_retries = 5
+        self.backoff_base = 2.0
+        
+        self.queue = queue.Queue()
+        self.stats = {'sent': 0, 'failed': 0, 'retried': 0}
+        self._retry_heap = []
+        self._retry_seq = itertools.count()
+        self._connection = None
+        self._last_used = 0.0
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        
+        if app:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        """Initialize Flask-Mail"""
+        app.config['MAIL_SERVER'] = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
+        app.config['MAIL_PORT'] = int(os.getenv('MAIL_PORT', 587))
+        app.config['MAIL_USE_TLS'] = os.getenv('MAIL_USE_TLS', 'True') == 'True'
+        app.config['MAIL_USERNAME'] = os.getenv('MAIL_USERNAME')
+        app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD')
+        app.config['MAIL_DEFAULT_SENDER'] = os.getenv('MAIL_DEFAULT_SENDER', 'noreply@tradingbot.com')
+        
+        self.backend = os.getenv('MAIL_BACKEND', 'smtp').lower()
+        self.maildir = os.getenv('MAIL_MAILDIR', 'maildir')
+        self.batch_size = int(os.getenv('MAIL_BATCH_SIZE', 50))
+        self.idle_timeout = float(os.getenv('MAIL_IDLE_TIMEOUT', 30))
+        self.max_retries = int(os.getenv('MAIL_MAX_RETRIES', 5))
+        
+        self.app = app
+        self.mail = Mail(app)
+        logger.info(f"Email service initialized ({self.backend} backend)")
+    
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    
+    def send_verification_email(self, email: str, token: str, base_url: str):
+        """Queue an email verification link"""
+        verification_url = escape(f"{base_url}/verify-email?token={token}")
+        return self.enqueue(
+            email,
+            "Verify Your Email - Binance Trading Bot",
+            VERIFICATION_TEMPLATE.substitute(url=verification_url)
+        )
+    
+    def send_password_reset_email(self, email: str, token: str, base_url: str):
+        """Queue a password reset link"""
+        reset_url = escape(f"{base_url}/reset-password?token={token}")
+        return self.enqueue(
+            email,
+            "Reset Your Password - Binance Trading Bot",
+            PASSWORD_RESET_TEMPLATE.substitute(url=reset_url)
+        )
+    
+    def enqueue(self, recipient: str, subject: str, html: str):
+        """Queue an email for background delivery"""
+        try:
+            self._ensure_started()
+            self.queue.put((recipient, subject, html, 0))
+            logger.info(f"Email queued for: {recipient}")
             return True
-            
         except Exception as e:
-            logger.error(f"Error sending password reset email: {e}")
+            logger.error(f"Error queueing email: {e}")
             return False
+    
+    def queue_depth(self) -> int:
+        """Emails waiting to be sent (including scheduled retries)"""
+        return self.queue.qsize() + len(self._retry_heap)
+    
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Wait until all queued emails have been handled"""
+        deadline = time.monotonic() + timeout
+        while self.queue_depth() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return self.queue_depth() == 0
+    
+    def stop(self, timeout: float = 10.0):
+        """Deliver what is queued, then stop the worker"""
+        if not self._thread or self._pid != os.getpid():
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+    
+    # ------------------------------------------------------------------
+    # Worker
+    # ------------------------------------------------------------------
+    
+    def _ensure_started(self):
+        """Start the worker thread (again, if we are in a forked child)"""
+        if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        
+        with self._lock:
+            if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            
+            if self._pid is not None and self._pid != os.getpid():
+                # Forked: the parent's SMTP socket and queue aren't ours
+                self.queue = queue.Queue()
+                self._retry_heap = []
+                self._connection = None
+            
+            self._stopping.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='email-worker', daemon=True)
+            self._thread.start()
+    
+    def _run(self):
+        with self.app.app_context():
+            while not (self._stopping.is_set() and self.queue_depth() == 0):
+                batch = self._next_batch()
+                if batch:
+                    self._send_batch(batch)
+                elif self._connection and time.monotonic() - self._last_used > self.idle_timeout:
+                    self._close_connection()
+            self._close_connection()
+    
+    def _next_batch(self):
+        """Collect due retries plus up to batch_size queued emails"""
+        batch = []
+        now = time.monotonic()
+        while self._retry_heap and self._retry_heap[0][0] <= now and len(batch) < self.batch_size:
+            batch.append(heapq.heappop(self._retry_heap)[2])
+        
+        timeout = 0.5
+        if self._retry_heap:
+            timeout = max(0.0, min(timeout, self._retry_heap[0][0] - now))
+        
+        try:
+            if not batch:
+                batch.append(self.queue.get(timeout=timeout) if timeout > 0 else self.queue.get_nowait())
+            while len(batch) < self.batch_size:
+                batch.append(self.queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+    
+    def _send_batch(self, batch):
+        for recipient, subject, html, attempts in batch:
+            try:
+                self._deliver(Message(subject=subject, recipients=[recipient], html=html))
+                self.stats['sent'] += 1
+                logger.info(f"Email sent to: {recipient}")
+            except Exception as e:
+                # Drop the connection; the next send opens a fresh one
+                self._close_connection()
+                attempts += 1
+                if attempts >= self.max_retries:
+                    self.stats['failed'] += 1
+                    logger.error(f"Error sending email to {recipient} (giving up after {attempts} attempts): {e}")
+                    continue
+                
+                delay = self.backoff_base * (2 ** (attempts - 1))
+                self.stats['retried'] += 1
+                logger.warning(f"Error sending email to {recipient}, retrying in {delay:.0f}s: {e}")
+                heapq.heappush(
+                    self._retry_heap,
+                    (time.monotonic() + delay, next(self._retry_seq), (recipient, subject, html, attempts))
+                )
+        self._last_used = time.monotonic()
+    
+    def _deliver(self, msg: Message):
+        """Send one message over the configured backend"""
+        if self.backend == 'maildir':
+            mailbox.Maildir(self.maildir, create=True).add(msg.as_string())
+            return
+        
+        if self._connection is None:
+            connection = self.mail.connect()
+            connection.__enter__()
+            self._connection = connection
+        self._connection.send(msg)
+    
+    def _close_connection(self):
+        if self._connection is not None:
+            try:
+                self._connection.__exit__(None, None, None)
+            except Exception as e:
+                logger.debug(f"Error closing SMTP connection: {e}")
+            self._connection = None
 
 # Global email service instance
 email_service = EmailService()
+atexit.register(email_service.stop)
@@ -0,0 +1,137 @@
+"""
+Binance client construction
+
+All bots and sessions create their python-binance client here, so every
+REST call is timed in the exchange_request_duration_seconds histogram
+(labelled by HTTP method and endpoint path) and order placement is timed
+in order_ack_duration_seconds by order type.
+
+EXCHANGE_BACKEND selects what the clients talk to:
+- binance (default): Binance (testnet or live)
+- simulator: the in-process offline simulator (see exchange_sim.py)
+EXCHANGE_URL points the real clients at another REST base URL instead of
+Binance, e.g. a simulator started with `python exchange_sim.py`.
+"""
+import os
+import time
+from urllib.parse import urlsplit
+from binance import AsyncClient, BinanceSocketManager
+from binance.client import Client
+from metrics import exchange_request_seconds, order_ack_seconds
+from tracing import tracer
+from exchange_sim import ExchangeError, SimulatedAsyncClient, SimulatedClient, SimulatedSocketManager, get_exchange
+
+
+def _url_overrides() -> dict:
+    """Class attributes redirecting python-binance to EXCHANGE_URL"""
+    base = os.getenv('EXCHANGE_URL', '').rstrip('/')
+    if not base:
+        return {}
+    return {
+        'API_URL': f"{base}/api",
+        'API_TESTNET_URL': f"{base}/api",
+        'FUTURES_URL': f"{base}/fapi",
+        'FUTURES_TESTNET_URL': f"{base}/fapi",
+    }
+
+
+def use_simulator() -> bool:
+    return os.getenv('EXCHANGE_BACKEND', 'binance').lower() == 'simulator'
+
+
+def public_price_url() -> str:
+    """Public futures ticker endpoint (production Binance unless EXCHANGE_URL is set)"""
+    base = os.getenv('EXCHANGE_URL', '').rstrip('/') or 'https://fapi.binance.com'
+    return f"{base}/fapi/v1/ticker/price"
+
+
+def simulated_price(symbol: str) -> float:
+    """Current price from the in-process simulator (KeyError for unknown symbols)"""
+    try:
+        return float(get_exchange().ticker_price(symbol)['price'])
+    except ExchangeError:
+        raise KeyError(symbol)
+
+
+class RequestMetricsMixin:
+    """Records latency for every REST call and order submission"""
+    
+    def _request(self, method, uri, *args, **kwargs):
+        path = urlsplit(uri).path
+        started = time.perf_counter()
+        outcome = 'success'
+        try:
+            with tracer.span(f"binance {method.upper()} {path}", **{'http.method': method.upper(), 'http.path': path}):
+                return super()._request(method, uri, *args, **kwargs)
+        except Exception:
+            outcome = 'failure'
+            raise
+        finally:
+            exchange_request_seconds.observe(time.perf_counter() - started,
+                                             method.upper(), path, outcome)
+    
+    def futures_create_order(self, **params):
+        started = time.perf_counter()
+        outcome = 'success'
+        try:
+            with tracer.span('order.submit', symbol=params.get('symbol'), side=params.get('side'),
+                             order_type=params.get('type')):
+                return super().futures_create_order(**params)
+        except Exception:
+            outcome = 'failure'
+            raise
+        finally:
+            order_ack_seconds.observe(time.perf_counter() - started, params.get('type', 'UNKNOWN'), outcome)
+
+
+class MeteredClient(RequestMetricsMixin, Client):
+    """python-binance Client that records latency for every REST call"""
+
+
+class MeteredSimulatedClient(RequestMetricsMixin, SimulatedClient):
+    """Simulated client with the same metrics as MeteredClient"""
+
+
+def create_client(api_key: str, api_secret: str, testnet: bool = True) -> Client:
+    """
+    Create an authenticated Binance client
+    
+    Args:
+        api_key: Binance API key
+        api_secret: Binance API secret
+        testnet: Use testnet endpoints
+    
+    Returns:
+        Client instance
+    """
+    if use_simulator():
+        return MeteredSimulatedClient(api_key, api_secret, testnet=testnet)
+    overrides = _url_overrides()
+    client_class = type('MeteredClient', (MeteredClient,), overrides) if overrides else MeteredClient
+    return client_class(api_key, api_secret, testnet=testnet)
+
+
+async def create_async_client(api_key: str = None, api_secret: str = None, testnet: bool = False):
+    """
+    Create a python-binance AsyncClient (or its simulated equivalent)
+    
+    Args:
+        api_key: Binance API key (None for public data only)
+        api_secret: Binance API secret
+        testnet: Use testnet endpoints
+    
+    Returns:
+        AsyncClient instance
+    """
+    if use_simulator():
+        return await SimulatedAsyncClient.create(api_key, api_secret, testnet=testnet)
+    overrides = _url_overrides()
+    client_class = type('AsyncClient', (AsyncClient,), overrides) if overrides else AsyncClient
+    return await client_class.create(api_key, api_secret, testnet=testnet)
+
+
+def socket_manager(client):
+    """WebSocket manager matching the client returned by create_async_client"""
+    if isinstance(client, SimulatedAsyncClient):
+        return SimulatedSocketManager(client)
+    return BinanceSocketManager(client)
@@ -0,0 +1,1137 @@
+"""
+Offline Binance Futures simulator
+
+An in-memory stand-in for the Binance USDⓈ-M Futures API, for running
+the bots, the web API and benchmarks without a network or testnet
+account:
+- SimulatedExchange: matching engine with per-API-key accounts
+  (one-way positions, USDT wallet, fees, realized/unrealized PnL),
+  MARKET / LIMIT / STOP(_MARKET) / TAKE_PROFIT(_MARKET) /
+  TRAILING_STOP_MARKET orders, reduce-only and close-position
+- SimulatedClient / SimulatedAsyncClient: drop-in replacements for the
+  python-binance clients (same futures_* methods, BinanceAPIException
+  on errors)
+- SimulatedSocketManager: ticker and user-data streams fed by the engine
+- serve(): the same engine behind a REST endpoint, so unmodified
+  python-binance clients (or other processes) can use it via EXCHANGE_URL
+
+Set EXCHANGE_BACKEND=simulator to make BaseBot, bot sessions and the
+feeds use it (see exchange.py). Behaviour is configured from environment:
+    SIM_SYMBOLS          SYMBOL:price[:tick:step],... starting markets
+    SIM_INITIAL_BALANCE  USDT wallet for each new API key (10000)
+    SIM_LEVERAGE         Leverage used for margin checks (20)
+    SIM_TAKER_FEE / SIM_MAKER_FEE  Fee rates (0.0004 / 0.0002)
+    SIM_LATENCY_MS / SIM_LATENCY_JITTER_MS  Injected request latency
+    SIM_ERROR_RATE       Fraction of requests failing with SIM_ERROR_CODE
+    SIM_TICK_INTERVAL    Seconds between random-walk price ticks (0 = off)
+    SIM_VOLATILITY       Per-tick log-return standard deviation
+    SIM_SEED             Seed for prices, latency and errors (reproducible runs)
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import random
+import re
+import secrets
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+from binance.exceptions import BinanceAPIException
+
+DEFAULT_SYMBOLS = "BTCUSDT:65000,ETHUSDT:3500,BNBUSDT:600,SOLUSDT:150,XRPUSDT:0.6"
+
+ORDER_TYPES = ('MARKET', 'LIMIT', 'STOP', 'STOP_MARKET', 'TAKE_PROFIT',
+               'TAKE_PROFIT_MARKET', 'TRAILING_STOP_MARKET')
+TRIGGER_TYPES = ('STOP', 'STOP_MARKET', 'TAKE_PROFIT', 'TAKE_PROFIT_MARKET')
+
+_FAPI_PATH = re.compile(r'^/fapi/v\d+/(.+)$')
+
+
+class ExchangeError(Exception):
+    """An API error response (Binance error code and message)"""
+    
+    def __init__(self, code: int, msg: str, status: int = 400):
+        super().__init__(msg)
+        self.code = code
+        self.msg = msg
+        self.status = status
+    
+    def to_binance(self) -> BinanceAPIException:
+        return BinanceAPIException(None, self.status, json.dumps({'code': self.code, 'msg': self.msg}))
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def _fmt(value: float, decimals: int = 8) -> str:
+    """Binance-style decimal string"""
+    text = f"{value:.{decimals}f}".rstrip('0').rstrip('.')
+    return text if text not in ('', '-0') else '0'
+
+
+def _decimals(step: float) -> int:
+    return max(0, -int(math.floor(math.log10(step) + 1e-9)))
+
+
+def _bool(value) -> bool:
+    return value is True or str(value).lower() == 'true'
+
+
+class TriggerBook:
+    """Order trigger prices for one symbol, sorted for bisect on each tick
+    
+    'above' entries trigger when price >= level, 'below' entries when
+    price <= level (same layout as price_alerts.PriceAlertBook).
+    """
+    
+    def __init__(self):
+        self.above = []  # sorted (level, order_id)
+        self.below = []
+    
+    def add(self, order_id: int, level: float, direction: str):
+        insort(self.above if direction == 'above' else self.below, (level, order_id))
+    
+    def remove(self, order_id: int, level: float, direction: str):
+        book = self.above if direction == 'above' else self.below
+        i = bisect_left(book, (level, order_id))
+        if i < len(book) and book[i] == (level, order_id):
+            del book[i]
+    
+    def pop_crossed(self, price: float) -> list:
+        crossed = []
+        k = bisect_right(self.above, (price, float('inf')))
+        if k:
+            crossed.extend(order_id for _, order_id in self.above[:k])
+            del self.above[:k]
+        i = bisect_left(self.below, (price, float('-inf')))
+        if i < len(self.below):
+            crossed.extend(order_id for _, order_id in self.below[i:])
+            del self.below[i:]
+        return crossed
+
+
+class Market:
+    """One symbol's price, 24h statistics and resting orders"""
+    
+    def __init__(self, symbol: str, price: float, tick_size: float = None, step_size: float = None):
+        self.symbol = symbol
+        self.tick_size = tick_size or max(10 ** (math.floor(math.log10(price)) - 5), 1e-4)
+        self.step_size = step_size or min(10 ** math.floor(math.log10(100 / price)), 1.0)
+        self.price_precision = _decimals(self.tick_size)
+        self.quantity_precision = _decimals(self.step_size)
+        self.min_notional = 5.0
+        self.price = self.round_price(price)
+        self.open = self.high = self.low = self.price
+        self.volume = 0.0
+        self.quote_volume = 0.0
+        self.book = TriggerBook()
+        self.trailing = set()  # order ids of active trailing stops
+    
+    def round_price(self, price: float) -> float:
+        return round(round(price / self.tick_size) * self.tick_size, self.price_precision)
+    
+    def on_step(self, value: float, step: float) -> bool:
+        ratio = value / step
+        return abs(ratio - round(ratio)) < 1e-6
+    
+    def symbol_info(self) -> dict:
+        return {
+            'symbol': self.symbol,
+            'pair': self.symbol,
+            'contractType': 'PERPETUAL',
+            'status': 'TRADING',
+            'baseAsset': self.symbol[:-4],
+            'quoteAsset': 'USDT',
+            'marginAsset': 'USDT',
+            'pricePrecision': self.price_precision,
+            'quantityPrecision': self.quantity_precision,
+            'orderTypes': list(ORDER_TYPES),
+            'timeInForce': ['GTC', 'IOC', 'FOK', 'GTX'],
+            'filters': [
+                {'filterType': 'PRICE_FILTER', 'tickSize': _fmt(self.tick_size),
+                 'minPrice': _fmt(self.tick_size), 'maxPrice': '10000000'},
+                {'filterType': 'LOT_SIZE', 'stepSize': _fmt(self.step_size),
+                 'minQty': _fmt(self.step_size), 'maxQty': '100000000'},
+                {'filterType': 'MARKET_LOT_SIZE', 'stepSize': _fmt(self.step_size),
+                 'minQty': _fmt(self.step_size), 'maxQty': '100000000'},
+                {'filterType': 'MIN_NOTIONAL', 'notional': _fmt(self.min_notional)},
+            ],
+        }
+    
+    def ticker_event(self) -> dict:
+        change = self.price - self.open
+        return {
+            'stream': f"{self.symbol.lower()}@ticker",
+            'data': {
+                'e': '24hrTicker',
+                'E': _now_ms(),
+                's': self.symbol,
+                'c': _fmt(self.price),
+                'o': _fmt(self.open),
+                'h': _fmt(self.high),
+                'l': _fmt(self.low),
+                'v': _fmt(self.volume),
+                'q': _fmt(self.quote_volume),
+                'p': _fmt(change),
+                'P': _fmt(change / self.open * 100 if self.open else 0, 3),
+            }
+        }
+
+
+class Account:
+    """One API key's wallet, positions and orders"""
+    
+    def __init__(self, api_key: str, balance: float, leverage: int):
+        self.api_key = api_key
+        self.wallet = balance
+        self.leverage = leverage
+        self.positions = {}  # symbol -> [amount, entry_price]
+        self.reserved = 0.0  # initial margin held by open orders
+        self.orders = {}     # order_id -> order dict (all orders)
+        self.open_orders = {}
+        self.client_ids = {}  # clientOrderId -> order_id (open orders)
+
+
+class SimulatedExchange:
+    """In-memory Binance Futures matching engine"""
+    
+    def __init__(self, symbols: str = None, initial_balance: float = None, leverage: int = None,
+                 latency_ms: float = None, latency_jitter_ms: float = None, error_rate: float = None,
+                 seed: int = None):
+        self.initial_balance = initial_balance if initial_balance is not None else float(os.getenv('SIM_INITIAL_BALANCE', 10000))
+        self.leverage = leverage or int(os.getenv('SIM_LEVERAGE', 20))
+        self.taker_fee = float(os.getenv('SIM_TAKER_FEE', 0.0004))
+        self.maker_fee = float(os.getenv('SIM_MAKER_FEE', 0.0002))
+        self.latency_ms = latency_ms if latency_ms is not None else float(os.getenv('SIM_LATENCY_MS', 0))
+        self.latency_jitter_ms = latency_jitter_ms if latency_jitter_ms is not None else float(os.getenv('SIM_LATENCY_JITTER_MS', 0))
+        self.error_rate = error_rate if error_rate is not None else float(os.getenv('SIM_ERROR_RATE', 0))
+        self.error_code = int(os.getenv('SIM_ERROR_CODE', -1001))
+        self.tick_interval = float(os.getenv('SIM_TICK_INTERVAL', 1.0))
+        self.volatility = float(os.getenv('SIM_VOLATILITY', 0.0005))
+        
+        seed = seed if seed is not None else int(os.getenv('SIM_SEED', 42))
+        self._price_rng = random.Random(seed)
+        self._fault_rng = random.Random(seed + 1)
+        
+        self.markets = {}
+        for entry in (symbols or os.getenv('SIM_SYMBOLS', DEFAULT_SYMBOLS)).split(','):
+            parts = entry.strip().split(':')
+            if len(parts) < 2:
+                continue
+            tick = float(parts[2]) if len(parts) > 2 else None
+            step = float(parts[3]) if len(parts) > 3 else None
+            self.markets[parts[0].upper()] = Market(parts[0].upper(), float(parts[1]), tick, step)
+        
+        self.accounts = {}
+        self._owners = {}  # open order_id -> Account
+        self._order_ids = itertools.count(1000000)
+        self._trade_ids = itertools.count(1)
+        self._lock = threading.RLock()
+        self._user_listeners = {}   # api_key -> set of callbacks
+        self._ticker_listeners = {}  # symbol -> set of callbacks
+        self._walk_thread = None
+        self._walk_pid = None
+        self._walk_stop = threading.Event()
+        
+        self.routes = {
+            ('GET', 'ping'): lambda acct, p: {},
+            ('GET', 'time'): lambda acct, p: {'serverTime': _now_ms()},
+            ('GET', 'exchangeInfo'): lambda acct, p: self.exchange_info(),
+            ('GET', 'ticker/price'): lambda acct, p: self.ticker_price(p.get('symbol')),
+            ('GET', 'premiumIndex'): lambda acct, p: self.mark_price(p.get('symbol')),
+            ('GET', 'account'): lambda acct, p: self.account_info(acct),
+            ('GET', 'balance'): lambda acct, p: self.balance(acct),
+            ('GET', 'positionRisk'): lambda acct, p: self.position_risk(acct, p.get('symbol')),
+            ('POST', 'leverage'): self.change_leverage,
+            ('POST', 'order'): self.create_order,
+            ('GET', 'order'): self.get_order,
+            ('DELETE', 'order'): self.cancel_order,
+            ('GET', 'openOrders'): lambda acct, p: self.open_orders(acct, p.get('symbol')),
+            ('DELETE', 'allOpenOrders'): self.cancel_all,
+            ('POST', 'batchOrders'): self.create_batch,
+            ('DELETE', 'batchOrders'): self.cancel_batch,
+        }
+    
+    # ------------------------------------------------------------------
+    # Request handling
+    # ------------------------------------------------------------------
+    
+    def sample_latency(self) -> float:
+        """Injected latency for one request, in seconds"""
+        if not self.latency_ms and not self.latency_jitter_ms:
+            return 0.0
+        with self._lock:
+            jitter = self._fault_rng.uniform(-1, 1) * self.latency_jitter_ms
+        return max(0.0, self.latency_ms + jitter) / 1000
+    
+    def handle(self, method: str, endpoint: str, api_key: str, params: dict):
+        """
+        Serve one API request
+        
+        Args:
+            method: HTTP method
+            endpoint: Path below /fapi/vN/ (e.g. 'order', 'ticker/price')
+            api_key: Caller's API key (selects the account)
+            params: Request parameters (strings or native values)
+        
+        Raises:
+            ExchangeError: For any Binance-style error response
+        """
+        handler = self.routes.get((method.upper(), endpoint))
+        if handler is None:
+            raise ExchangeError(-5000, f"Path /fapi/{endpoint} not supported by the simulator", 404)
+        
+        with self._lock:
+            if self.error_rate and self._fault_rng.random() < self.error_rate:
+                raise ExchangeError(self.error_code, 'Simulated error (SIM_ERROR_RATE)', 500 if self.error_code == -1001 else 400)
+            account = self._account(api_key)
+            events = []
+            self._events = events
+            try:
+                result = handler(account, {k: v for k, v in params.items() if v is not None})
+            finally:
+                self._events = None
+        self._dispatch(events)
+        return result
+    
+    def _account(self, api_key: str) -> Account:
+        key = api_key or 'anonymous'
+        account = self.accounts.get(key)
+        if account is None:
+            account = self.accounts[key] = Account(key, self.initial_balance, self.leverage)
+        return account
+    
+    def _market(self, symbol) -> Market:
+        market = self.markets.get(str(symbol or '').upper())
+        if market is None:
+            raise ExchangeError(-1121, 'Invalid symbol.')
+        return market
+    
+    # ------------------------------------------------------------------
+    # Market data
+    # ------------------------------------------------------------------
+    
+    def exchange_info(self) -> dict:
+        return {
+            'timezone': 'UTC',
+            'serverTime': _now_ms(),
+            'rateLimits': [],
+            'assets': [{'asset': 'USDT', 'marginAvailable': True}],
+            'symbols': [m.symbol_info() for m in self.markets.values()],
+        }
+    
+    def ticker_price(self, symbol=None):
+        if symbol:
+            market = self._market(symbol)
+            return {'symbol': market.symbol, 'price': _fmt(market.price), 'time': _now_ms()}
+        return [{'symbol': m.symbol, 'price': _fmt(m.price), 'time': _now_ms()} for m in self.markets.values()]
+    
+    def mark_price(self, symbol=None):
+        def entry(m):
+            return {'symbol': m.symbol, 'markPrice': _fmt(m.price), 'indexPrice': _fmt(m.price),
+                    'lastFundingRate': '0.0001', 'time': _now_ms()}
+        if symbol:
+            return entry(self._market(symbol))
+        return [entry(m) for m in self.markets.values()]
+    
+    def set_price(self, symbol: str, price: float):
+        """Move a market's price, filling and triggering any crossed orders"""
+        with self._lock:
+            market = self._market(symbol)
+            events = []
+            self._events = events
+            try:
+                self._tick(market, price)
+            finally:
+                self._events = None
+        self._dispatch(events)
+    
+    def _tick(self, market: Market, price: float):
+        price = market.round_price(price)
+        market.price = price
+        market.high = max(market.high, price)
+        market.low = min(market.low, price)
+        
+        # A triggered stop-limit can become marketable on the same tick,
+        # so keep popping until the book is quiet
+        for _ in range(10):
+            crossed = market.book.pop_crossed(price)
+            if not crossed:
+                break
+            for order_id in sorted(crossed):
+                self._on_crossed(market, order_id)
+        
+        for order_id in list(market.trailing):
+            self._update_trailing(market, order_id)
+        
+        self._events.append(('ticker', market.symbol, market.ticker_event()))
+    
+    def _find_open(self, order_id: int):
+        account = self._owners.get(order_id)
+        if account is None:
+            return None, None
+        return account, account.open_orders.get(order_id)
+    
+    def _on_crossed(self, market: Market, order_id: int):
+        account, order = self._find_open(order_id)
+        if order is None:
+            return
+        if order['type'] == 'LIMIT' or order.get('_triggered'):
+            # Resting limit reached: fills at its own price as maker
+            self._fill(account, market, order, float(order['price']), maker=True)
+        elif order['type'] in ('STOP_MARKET', 'TAKE_PROFIT_MARKET'):
+            self._fill(account, market, order, market.price, maker=False)
+        else:
+            # STOP / TAKE_PROFIT become a limit order at 'price'
+            order['_triggered'] = True
+            self._rest_or_fill_limit(account, market, order)
+    
+    def _update_trailing(self, market: Market, order_id: int):
+        account, order = self._find_open(order_id)
+        if order is None:
+            market.trailing.discard(order_id)
+            return
+        price = market.price
+        activation = float(order.get('activatePrice') or 0)
+        if not order['_active']:
+            if activation and ((order['side'] == 'SELL' and price < activation) or
+                               (order['side'] == 'BUY' and price > activation)):
+                return
+            order['_active'] = True
+            order['_extreme'] = price
+        
+        rate = float(order['priceRate']) / 100
+        if order['side'] == 'SELL':
+            order['_extreme'] = max(order['_extreme'], price)
+            triggered = price <= order['_extreme'] * (1 - rate)
+        else:
+            order['_extreme'] = min(order['_extreme'], price)
+            triggered = price >= order['_extreme'] * (1 + rate)
+        
+        if triggered:
+            market.trailing.discard(order_id)
+            self._fill(account, market, order, price, maker=False)
+    
+    # ------------------------------------------------------------------
+    # Accounts
+    # ------------------------------------------------------------------
+    
+    def _unrealized(self, account: Account, symbol: str) -> float:
+        amount, entry = account.positions.get(symbol, (0.0, 0.0))
+        return amount * (self.markets[symbol].price - entry) if amount else 0.0
+    
+    def _margin_used(self, account: Account) -> float:
+        used = 0.0
+        for symbol, (amount, entry) in account.positions.items():
+            used += abs(amount) * self.markets[symbol].price / account.leverage
+        return used + account.reserved
+    
+    def _available(self, account: Account) -> float:
+        upnl = sum(self._unrealized(account, s) for s in account.positions)
+        return account.wallet + upnl - self._margin_used(account)
+    
+    def account_info(self, account: Account) -> dict:
+        upnl = sum(self._unrealized(account, s) for s in account.positions)
+        available = self._available(account)
+        return {
+            'feeTier': 0,
+            'canTrade': True,
+            'totalWalletBalance': _fmt(account.wallet),
+            'totalUnrealizedProfit': _fmt(upnl),
+            'totalMarginBalance': _fmt(account.wallet + upnl),
+            'availableBalance': _fmt(available),
+            'maxWithdrawAmount': _fmt(max(0.0, min(available, account.wallet))),
+            'assets': [{
+                'asset': 'USDT',
+                'walletBalance': _fmt(account.wallet),
+                'crossWalletBalance': _fmt(account.wallet),
+                'availableBalance': _fmt(available),
+                'unrealizedProfit': _fmt(upnl),
+                'marginBalance': _fmt(account.wallet + upnl),
+            }],
+            'positions': [{
+                'symbol': symbol,
+                'positionSide': 'BOTH',
+                'positionAmt': _fmt(amount),
+                'entryPrice': _fmt(entry),
+                'unrealizedProfit': _fmt(self._unrealized(account, symbol)),
+                'leverage': str(account.leverage),
+                'isolated': False,
+            } for symbol, (amount, entry) in account.positions.items()],
+            'updateTime': _now_ms(),
+        }
+    
+    def balance(self, account: Account) -> list:
+        upnl = sum(self._unrealized(account, s) for s in account.positions)
+        return [{
+            'accountAlias': 'sim',
+            'asset': 'USDT',
+            'balance': _fmt(account.wallet),
+            'crossWalletBalance': _fmt(account.wallet),
+            'crossUnPnl': _fmt(upnl),
+            'availableBalance': _fmt(self._available(account)),
+            'maxWithdrawAmount': _fmt(max(0.0, self._available(account))),
+            'marginAvailable': True,
+            'updateTime': _now_ms(),
+        }]
+    
+    def position_risk(self, account: Account, symbol=None) -> list:
+        markets = [self._market(symbol)] if symbol else self.markets.values()
+        result = []
+        for market in markets:
+            amount, entry = account.positions.get(market.symbol, (0.0, 0.0))
+            result.append({
+                'symbol': market.symbol,
+                'positionAmt': _fmt(amount),
+                'entryPrice': _fmt(entry),
+                'markPrice': _fmt(market.price),
+                'unRealizedProfit': _fmt(self._unrealized(account, market.symbol)),
+                'liquidationPrice': '0',
+                'leverage': str(account.leverage),
+                'marginType': 'cross',
+                'positionSide': 'BOTH',
+                'notional': _fmt(amount * market.price),
+                'updateTime': _now_ms(),
+            })
+        return result
+    
+    def change_leverage(self, account: Account, params: dict) -> dict:
+        market = self._market(params.get('symbol'))
+        leverage = int(params.get('leverage', account.leverage))
+        if not 1 <= leverage <= 125:
+            raise ExchangeError(-4028, 'Leverage is not valid')
+        account.leverage = leverage
+        return {'symbol': market.symbol, 'leverage': leverage, 'maxNotionalValue': '1000000'}
+    
+    # ------------------------------------------------------------------
+    # Orders
+    # ------------------------------------------------------------------
+    
+    def create_order(self, account: Account, params: dict) -> dict:
+        market = self._market(params.get('symbol'))
+        side = str(params.get('side', '')).upper()
+        order_type = str(params.get('type', '')).upper()
+        if side not in ('BUY', 'SELL'):
+            raise ExchangeError(-1102, "Mandatory parameter 'side' was not sent, was empty/null, or malformed.")
+        if order_type not in ORDER_TYPES:
+            raise ExchangeError(-1116, 'Invalid orderType.')
+        
+        close_position = _bool(params.get('closePosition', False))
+        reduce_only = _bool(params.get('reduceOnly', False)) or close_position
+        quantity = float(params.get('quantity') or 0)
+        if quantity <= 0 and not close_position:
+            raise ExchangeError(-1102, "Mandatory parameter 'quantity' was not sent, was empty/null, or malformed.")
+        if quantity and not market.on_step(quantity, market.step_size):
+            raise ExchangeError(-1111, 'Precision is over the maximum defined for this asset.')
+        
+        price = float(params.get('price') or 0)
+        stop_price = float(params.get('stopPrice') or 0)
+        if order_type in ('LIMIT', 'STOP', 'TAKE_PROFIT') and price <= 0:
+            raise ExchangeError(-1102, "Mandatory parameter 'price' was not sent, was empty/null, or malformed.")
+        if order_type in TRIGGER_TYPES and stop_price <= 0:
+            raise ExchangeError(-1102, "Mandatory parameter 'stopPrice' was not sent, was empty/null, or malformed.")
+        for value in (price, stop_price):
+            if value and not market.on_step(value, market.tick_size):
+                raise ExchangeError(-1111, 'Precision is over the maximum defined for this asset.')
+        
+        rate = float(params.get('callbackRate') or 0)
+        if order_type == 'TRAILING_STOP_MARKET' and not 0.1 <= rate <= 10:
+            raise ExchangeError(-2007, 'Invalid callBack rate.')
+        
+        client_id = params.get('newClientOrderId') or secrets.token_hex(11)
+        if client_id in account.client_ids:
+            raise ExchangeError(-4116, 'ClientOrderId is duplicated.')
+        
+        # Conditional reduce-only orders are checked when they trigger
+        # (see _fill), so stops can be placed before the position exists
+        position = account.positions.get(market.symbol, (0.0, 0.0))[0]
+        if reduce_only and order_type in ('MARKET', 'LIMIT') and (position == 0 or (position > 0) == (side == 'BUY')):
+            raise ExchangeError(-2022, 'ReduceOnly Order is rejected.')
+        
+        reference = price or stop_price or market.price
+        if quantity and not reduce_only:
+            if quantity * reference < market.min_notional:
+                raise ExchangeError(-4164, f"Order's notional must be no smaller than {market.min_notional}")
+            if quantity * reference / account.leverage > self._available(account):
+                raise ExchangeError(-2019, 'Margin is insufficient.')
+        
+        if order_type in TRIGGER_TYPES and self._trigger_direction(order_type, side, stop_price, market.price) is None:
+            raise ExchangeError(-2021, 'Order would immediately trigger.')
+        
+        now = _now_ms()
+        order = {
+            'orderId': next(self._order_ids),
+            'symbol': market.symbol,
+            'status': 'NEW',
+            'clientOrderId': client_id,
+            'price': _fmt(price),
+            'avgPrice': '0',
+            'origQty': _fmt(quantity),
+            'executedQty': '0',
+            'cumQty': '0',
+            'cumQuote': '0',
+            'timeInForce': str(params.get('timeInForce', 'GTC')).upper(),
+            'type': order_type,
+            'origType': order_type,
+            'reduceOnly': reduce_only,
+            'closePosition': close_position,
+            'side': side,
+            'positionSide': 'BOTH',
+            'stopPrice': _fmt(stop_price),
+            'workingType': str(params.get('workingType', 'CONTRACT_PRICE')),
+            'priceProtect': False,
+            'updateTime': now,
+            'time': now,
+        }
+        if order_type == 'TRAILING_STOP_MARKET':
+            order.update({'priceRate': _fmt(rate), 'activatePrice': _fmt(float(params.get('activationPrice') or 0)),
+                          '_active': False, '_extreme': None})
+        
+        if not reduce_only:
+            order['_margin'] = quantity * reference / account.leverage
+            account.reserved += order['_margin']
+        account.orders[order['orderId']] = order
+        account.open_orders[order['orderId']] = order
+        self._owners[order['orderId']] = account
+        account.client_ids[client_id] = order['orderId']
+        self._order_event(account, order, 'NEW')
+        
+        if order_type == 'MARKET':
+            self._fill(account, market, order, market.price, maker=False)
+        elif order_type == 'LIMIT':
+            self._rest_or_fill_limit(account, market, order)
+        elif order_type == 'TRAILING_STOP_MARKET':
+            market.trailing.add(order['orderId'])
+            self._update_trailing(market, order['orderId'])
+        else:
+            direction = self._trigger_direction(order_type, side, stop_price, market.price)
+            market.book.add(order['orderId'], stop_price, direction)
+        
+        return self._public(order)
+    
+    @staticmethod
+    def _trigger_direction(order_type: str, side: str, stop_price: float, price: float):
+        """Which way price must cross stopPrice, or None if it already has"""
+        stop = order_type in ('STOP', 'STOP_MARKET')
+        direction = 'above' if (side == 'BUY') == stop else 'below'
+        if direction == 'above' and price >= stop_price:
+            return None
+        if direction == 'below' and price <= stop_price:
+            return None
+        return direction
+    
+    def _rest_or_fill_limit(self, account: Account, market: Market, order: dict):
+        price = float(order['price'])
+        marketable = price >= market.price if order['side'] == 'BUY' else price <= market.price
+        tif = order['timeInForce']
+        
+        if marketable:
+            if tif == 'GTX':
+                self._close(account, order, 'EXPIRED')
+            else:
+                # Crosses the spread: fills at the current price as taker
+                self._fill(account, market, order, market.price, maker=False)
+        elif tif in ('IOC', 'FOK'):
+            self._close(account, order, 'EXPIRED')
+        else:
+            market.book.add(order['orderId'], price, 'below' if order['side'] == 'BUY' else 'above')
+    
+    def _fill(self, account: Account, market: Market, order: dict, price: float, maker: bool):
+        amount, entry = account.positions.get(market.symbol, (0.0, 0.0))
+        quantity = float(order['origQty']) - float(order['executedQty'])
+        
+        if _bool(order['reduceOnly']):
+            reducible = abs(amount) if amount and (amount > 0) == (order['side'] == 'SELL') else 0.0
+            quantity = reducible if _bool(order['closePosition']) else min(quantity, reducible)
+            if quantity <= 0:
+                self._close(account, order, 'EXPIRED')
+                return
+        
+        signed = quantity if order['side'] == 'BUY' else -quantity
+        realized = 0.0
+        if amount == 0 or (amount > 0) == (signed > 0):
+            entry = (amount * entry + signed * price) / (amount + signed)
+            amount += signed
+        else:
+            closed = min(abs(signed), abs(amount))
+            realized = closed * (price - entry) * (1 if amount > 0 else -1)
+            amount += signed
+            if abs(amount) < 1e-12:
+                amount, entry = 0.0, 0.0
+            elif (amount > 0) != (amount - signed > 0):
+                entry = price  # flipped: the remainder opened at this price
+        
+        fee = quantity * price * (self.maker_fee if maker else self.taker_fee)
+        account.wallet += realized - fee
+        if amount:
+            account.positions[market.symbol] = (amount, entry)
+        else:
+            account.positions.pop(market.symbol, None)
+        
+        market.volume += quantity
+        market.quote_volume += quantity * price
+        
+        executed = float(order['executedQty']) + quantity
+        order.update({
+            'executedQty': _fmt(executed),
+            'cumQty': _fmt(executed),
+            'cumQuote': _fmt(float(order['cumQuote']) + quantity * price),
+            'avgPrice': _fmt(price),
+            'updateTime': _now_ms(),
+        })
+        if _bool(order['closePosition']):
+            order['origQty'] = _fmt(executed)
+        self._close(account, order, 'FILLED', trade=(quantity, price, fee, realized, maker))
+        self._account_event(account, market.symbol)
+    
+    def _close(self, account: Account, order: dict, status: str, trade=None):
+        order['status'] = status
+        order['updateTime'] = _now_ms()
+        if account.open_orders.pop(order['orderId'], None) is not None:
+            account.reserved -= order.get('_margin', 0.0)
+        self._owners.pop(order['orderId'], None)
+        account.client_ids.pop(order['clientOrderId'], None)
+        market = self.markets[order['symbol']]
+        market.trailing.discard(order['orderId'])
+        self._order_event(account, order, 'TRADE' if trade else status, trade)
+    
+    def _unbook(self, order: dict):
+        market = self.markets[order['symbol']]
+        if order['type'] == 'LIMIT' or order.get('_triggered'):
+            market.book.remove(order['orderId'], float(order['price']), 'below' if order['side'] == 'BUY' else 'above')
+        elif order['type'] in TRIGGER_TYPES:
+            for direction in ('above', 'below'):
+                market.book.remove(order['orderId'], float(order['stopPrice']), direction)
+    
+    def _lookup(self, account: Account, params: dict) -> dict:
+        order = None
+        if params.get('orderId') is not None:
+            order = account.orders.get(int(params['orderId']))
+        elif params.get('origClientOrderId'):
+            order_id = account.client_ids.get(params['origClientOrderId'])
+            if order_id is None:
+                order_id = next((o['orderId'] for o in account.orders.values()
+                                 if o['clientOrderId'] == params['origClientOrderId']), None)
+            order = account.orders.get(order_id)
+        else:
+            raise ExchangeError(-1102, "Either orderId or origClientOrderId must be sent.")
+        if order is None or (params.get('symbol') and order['symbol'] != str(params['symbol']).upper()):
+            raise ExchangeError(-2013, 'Order does not exist.')
+        return order
+    
+    def get_order(self, account: Account, params: dict) -> dict:
+        return self._public(self._lookup(account, params))
+    
+    def cancel_order(self, account: Account, params: dict) -> dict:
+        try:
+            order = self._lookup(account, params)
+        except ExchangeError as e:
+            if e.code == -2013:
+                raise ExchangeError(-2011, 'Unknown order sent.')
+            raise
+        if order['orderId'] not in account.open_orders:
+            raise ExchangeError(-2011, 'Unknown order sent.')
+        self._unbook(order)
+        self._close(account, order, 'CANCELED')
+        return self._public(order)
+    
+    def open_orders(self, account: Account, symbol=None) -> list:
+        symbol = symbol.upper() if symbol else None
+        return [self._public(o) for o in account.open_orders.values() if not symbol or o['symbol'] == symbol]
+    
+    def cancel_all(self, account: Account, params: dict) -> dict:
+        market = self._market(params.get('symbol'))
+        for order in [o for o in account.open_orders.values() if o['symbol'] == market.symbol]:
+            self._unbook(order)
+            self._close(account, order, 'CANCELED')
+        return {'code': 200, 'msg': 'The operation of cancel all open order is done.'}
+    
+    @staticmethod
+    def _json_list(value) -> list:
+        return json.loads(value) if isinstance(value, str) else list(value or [])
+    
+    def create_batch(self, account: Account, params: dict) -> list:
+        orders = self._json_list(params.get('batchOrders'))
+        if len(orders) > 5:
+            raise ExchangeError(-1130, 'Data sent for parameter batchOrders is not valid.')
+        results = []
+        for order_params in orders:
+            try:
+                results.append(self.create_order(account, order_params))
+            except ExchangeError as e:
+                results.append({'code': e.code, 'msg': e.msg})
+        return results
+    
+    def cancel_batch(self, account: Account, params: dict) -> list:
+        if params.get('orderIdList'):
+            keys = [('orderId', i) for i in self._json_list(params['orderIdList'])]
+        else:
+            keys = [('origClientOrderId', c) for c in self._json_list(params.get('origClientOrderIdList'))]
+        if len(keys) > 10:
+            raise ExchangeError(-1130, 'Data sent for parameter orderIdList is not valid.')
+        results = []
+        for key, value in keys:
+            try:
+                results.append(self.cancel_order(account, {'symbol': params.get('symbol'), key: value}))
+            except ExchangeError as e:
+                results.append({'code': e.code, 'msg': e.msg})
+        return results
+    
+    @staticmethod
+    def _public(order: dict) -> dict:
+        return {k: v for k, v in order.items() if not k.startswith('_')}
+    
+    # ------------------------------------------------------------------
+    # Streams
+    # ------------------------------------------------------------------
+    
+    def _order_event(self, account: Account, order: dict, execution: str, trade=None):
+        quantity, price, fee, realized, maker = trade or (0.0, 0.0, 0.0, 0.0, False)
+        now = _now_ms()
+        self._events.append(('user', account.api_key, {
+            'e': 'ORDER_TRADE_UPDATE',
+            'E': now,
+            'T': now,
+            'o': {
+                's': order['symbol'], 'c': order['clientOrderId'], 'S': order['side'],
+                'o': order['type'], 'f': order['timeInForce'], 'q': order['origQty'],
+                'p': order['price'], 'ap': order['avgPrice'], 'sp': order['stopPrice'],
+                'x': execution, 'X': order['status'], 'i': order['orderId'],
+                'l': _fmt(quantity), 'z': order['executedQty'], 'L': _fmt(price),
+                'n': _fmt(fee), 'N': 'USDT', 'T': now, 't': next(self._trade_ids) if trade else 0,
+                'm': maker, 'R': _bool(order['reduceOnly']), 'ps': 'BOTH', 'ot': order['origType'],
+                'cp': _bool(order['closePosition']), 'rp': _fmt(realized),
+                'AP': order.get('activatePrice', '0'), 'cr': order.get('priceRate', '0'),
+            }
+        }))
+    
+    def _account_event(self, account: Account, symbol: str):
+        amount, entry = account.positions.get(symbol, (0.0, 0.0))
+        now = _now_ms()
+        self._events.append(('user', account.api_key, {
+            'e': 'ACCOUNT_UPDATE',
+            'E': now,
+            'T': now,
+            'a': {
+                'm': 'ORDER',
+                'B': [{'a': 'USDT', 'wb': _fmt(account.wallet), 'cw': _fmt(account.wallet), 'bc': '0'}],
+                'P': [{'s': symbol, 'pa': _fmt(amount), 'ep': _fmt(entry),
+                       'up': _fmt(self._unrealized(account, symbol)), 'mt': 'cross', 'iw': '0', 'ps': 'BOTH'}],
+            }
+        }))
+    
+    def subscribe_user(self, api_key: str, callback):
+        with self._lock:
+            self._user_listeners.setdefault(api_key or 'anonymous', set()).add(callback)
+    
+    def subscribe_ticker(self, symbols, callback):
+        with self._lock:
+            for symbol in symbols:
+                self._ticker_listeners.setdefault(symbol.upper(), set()).add(callback)
+        self.start_price_walk()
+    
+    def unsubscribe(self, callback):
+        with self._lock:
+            for listeners in list(self._user_listeners.values()) + list(self._ticker_listeners.values()):
+                listeners.discard(callback)
+    
+    def _dispatch(self, events):
+        for kind, key, event in events:
+            listeners = self._user_listeners if kind == 'user' else self._ticker_listeners
+            for callback in list(listeners.get(key, ())):
+                try:
+                    callback(event)
+                except Exception:
+                    self.unsubscribe(callback)
+    
+    def start_price_walk(self):
+        """Random-walk every market's price every SIM_TICK_INTERVAL seconds"""
+        if self.tick_interval <= 0:
+            return
+        if self._walk_thread and self._walk_thread.is_alive() and self._walk_pid == os.getpid():
+            return
+        with self._lock:
+            if self._walk_thread and self._walk_thread.is_alive() and self._walk_pid == os.getpid():
+                return
+            self._walk_pid = os.getpid()
+            self._walk_stop.clear()
+            self._walk_thread = threading.Thread(target=self._walk, name='exchange-sim-prices', daemon=True)
+            self._walk_thread.start()
+    
+    def stop_price_walk(self):
+        self._walk_stop.set()
+    
+    def _walk(self):
+        while not self._walk_stop.wait(self.tick_interval):
+            for symbol, market in list(self.markets.items()):
+                with self._lock:
+                    price = market.price * math.exp(self._price_rng.gauss(0, self.volatility))
+                self.set_price(symbol, price)
+
+
+_exchange = None
+_exchange_pid = None
+_exchange_lock = threading.Lock()
+
+
+def get_exchange() -> SimulatedExchange:
+    """The process-wide simulated exchange"""
+    global _exchange, _exchange_pid
+    if _exchange is None or _exchange_pid != os.getpid():
+        with _exchange_lock:
+            if _exchange is None or _exchange_pid != os.getpid():
+                _exchange = SimulatedExchange()
+                _exchange_pid = os.getpid()
+    return _exchange
+
+
+# ============================================================================
+# CLIENTS
+# ============================================================================
+
+class SimulatedClient:
+    """python-binance Client stand-in backed by the simulated exchange"""
+    
+    FUTURES_URL = 'https://fapi.simulator.local/fapi'
+    
+    def __init__(self, api_key: str = None, api_secret: str = None, testnet: bool = True,
+                 exchange: SimulatedExchange = None, **kwargs):
+        self.API_KEY = api_key
+        self.API_SECRET = api_secret
+        self.testnet = testnet
+        self.exchange = exchange or get_exchange()
+        self.blocking_latency = True
+    
+    def _request(self, method, uri, signed=False, force_params=False, **kwargs):
+        match = _FAPI_PATH.match(urlsplit(uri).path)
+        endpoint = match.group(1) if match else uri
+        params = dict(kwargs.get('data') or kwargs.get('params') or {})
+        
+        if self.blocking_latency:
+            delay = self.exchange.sample_latency()
+            if delay:
+                time.sleep(delay)
+        try:
+            return self.exchange.handle(method, endpoint, self.API_KEY, params)
+        except ExchangeError as e:
+            raise e.to_binance()
+    
+    def _futures(self, method: str, path: str, version: int = 1, **params):
+        return self._request(method, f"{self.FUTURES_URL}/v{version}/{path}", True, data=params)
+    
+    def futures_ping(self):
+        return self._futures('get', 'ping')
+    
+    def futures_time(self):
+        return self._futures('get', 'time')
+    
+    def futures_exchange_info(self):
+        return self._futures('get', 'exchangeInfo')
+    
+    def futures_symbol_ticker(self, **params):
+        return self._futures('get', 'ticker/price', **params)
+    
+    def futures_mark_price(self, **params):
+        return self._futures('get', 'premiumIndex', **params)
+    
+    def futures_account(self, **params):
+        return self._futures('get', 'account', version=2, **params)
+    
+    def futures_account_balance(self, **params):
+        return self._futures('get', 'balance', version=2, **params)
+    
+    def futures_position_information(self, **params):
+        return self._futures('get', 'positionRisk', version=2, **params)
+    
+    def futures_change_leverage(self, **params):
+        return self._futures('post', 'leverage', **params)
+    
+    def futures_create_order(self, **params):
+        return self._futures('post', 'order', **params)
+    
+    def futures_get_order(self, **params):
+        return self._futures('get', 'order', **params)
+    
+    def futures_cancel_order(self, **params):
+        return self._futures('delete', 'order', **params)
+    
+    def futures_get_open_orders(self, **params):
+        return self._futures('get', 'openOrders', **params)
+    
+    def futures_cancel_all_open_orders(self, **params):
+        return self._futures('delete', 'allOpenOrders', **params)
+    
+    def futures_place_batch_order(self, **params):
+        return self._futures('post', 'batchOrders', **params)
+    
+    def futures_cancel_orders(self, **params):
+        return self._futures('delete', 'batchOrders', **params)
+    
+    def close_connection(self):
+        pass
+
+
+class SimulatedAsyncClient:
+    """python-binance AsyncClient stand-in (awaitable futures_* methods)"""
+    
+    def __init__(self, sync_client: SimulatedClient):
+        self._sync = sync_client
+        self._sync.blocking_latency = False
+        self.API_KEY = sync_client.API_KEY
+        self.API_SECRET = sync_client.API_SECRET
+        self.testnet = sync_client.testnet
+        self.exchange = sync_client.exchange
+    
+    @classmethod
+    async def create(cls, api_key: str = None, api_secret: str = None, testnet: bool = False, **kwargs):
+        return cls(SimulatedClient(api_key, api_secret, testnet))
+    
+    def __getattr__(self, name):
+        method = getattr(self._sync, name)
+        if not name.startswith('futures_'):
+            return method
+        
+        async def call(**params):
+            delay = self.exchange.sample_latency()
+            if delay:
+                await asyncio.sleep(delay)
+            return method(**params)
+        return call
+    
+    async def close_connection(self):
+        pass
+
+
+class SimulatedStream:
+    """Async context manager with recv(), like a python-binance socket"""
+    
+    def __init__(self, exchange: SimulatedExchange, kind: str, key):
+        self.exchange = exchange
+        self.kind = kind
+        self.key = key
+        self._queue = None
+        self._callback = None
+    
+    async def __aenter__(self):
+        loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        
+        def callback(event):
+            loop.call_soon_threadsafe(self._queue.put_nowait, event)
+        
+        self._callback = callback
+        if self.kind == 'user':
+            self.exchange.subscribe_user(self.key, callback)
+        else:
+            self.exchange.subscribe_ticker(self.key, callback)
+        return self
+    
+    async def __aexit__(self, *exc):
+        self.exchange.unsubscribe(self._callback)
+    
+    async def recv(self):
+        return await self._queue.get()
+
+
+class SimulatedSocketManager:
+    """BinanceSocketManager stand-in for the streams the bots use"""
+    
+    def __init__(self, client):
+        self.client = client
+        self.exchange = getattr(client, 'exchange', None) or get_exchange()
+    
+    def multiplex_socket(self, streams):
+        symbols = [stream.split('@')[0].upper() for stream in streams]
+        return SimulatedStream(self.exchange, 'ticker', symbols)
+    
+    def futures_multiplex_socket(self, streams):
+        return self.multiplex_socket(streams)
+    
+    def futures_user_socket(self):
+        return SimulatedStream(self.exchange, 'user', self.client.API_KEY or 'anonymous')
+
+
+# ============================================================================
+# REST SERVER
+# ============================================================================
+
+class SimulatorRequestHandler(BaseHTTPRequestHandler):
+    """Serves /fapi/vN/* (and the spot ping python-binance sends on startup)"""
+    
+    exchange = None
+    
+    def _serve(self, method: str):
+        url = urlsplit(self.path)
+        params = dict(parse_qsl(url.query))
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            params.update(parse_qsl(self.rfile.read(length).decode('utf-8')))
+        params.pop('signature', None)
+        params.pop('timestamp', None)
+        params.pop('recvWindow', None)
+        
+        match = _FAPI_PATH.match(url.path)
+        status, body = 200, {}
+        if url.path.endswith('/v3/ping'):
+            body = {}
+        elif not match:
+            status, body = 404, {'code': -5000, 'msg': f"Path {url.path} not supported by the simulator"}
+        else:
+            delay = self.exchange.sample_latency()
+            if delay:
+                time.sleep(delay)
+            try:
+                body = self.exchange.handle(method, match.group(1), self.headers.get('X-MBX-APIKEY'), params)
+            except ExchangeError as e:
+                status, body = e.status, {'code': e.code, 'msg': e.msg}
+        
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+    
+    def do_GET(self):
+        self._serve('GET')
+    
+    def do_POST(self):
+        self._serve('POST')
+    
+    def do_PUT(self):
+        self._serve('PUT')
+    
+    def do_DELETE(self):
+        self._serve('DELETE')
+    
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(host: str = '127.0.0.1', port: int = 8910, exchange: SimulatedExchange = None):
+    """Run the simulator as a REST server (blocks)"""
+    handler = type('Handler', (SimulatorRequestHandler,), {'exchange': exchange or get_exchange()})
+    handler.exchange.start_price_walk()
+    server = ThreadingHTTPServer((host, port), handler)
+    print(f"Binance Futures simulator listening on http://{host}:{port} "
+          f"(set EXCHANGE_URL=http://{host}:{port})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Offline Binance Futures simulator')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8910)
+    args = parser.parse_args()
+    serve(args.host, args.port)
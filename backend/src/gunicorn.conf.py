@@ -0,0 +1,28 @@
+"""
+Gunicorn configuration
+
+Loaded automatically when gunicorn is started from this directory.
+The app is imported once in the master (which connects to the database
+and applies index migrations a single time); each worker then opens its
+own connection pool after fork.
+"""
+import os
+
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True') == 'True'
+
+
+def post_fork(server, worker):
+    """Re-establish database connections and start per-worker services"""
+    from database import db
+    
+    if not db.reconnect_after_fork():
+        server.log.error(f"Worker {worker.pid}: database reconnect failed")
+    
+    from advanced.grid import grid_engine
+    grid_engine.start()
+    
+    if os.getenv('PRICE_ALERT_FEED', 'True') == 'True':
+        from price_alerts import price_alert_engine
+        from advanced.stop_emulator import stop_emulator
+        price_alert_engine.start()
+        stop_emulator.start()
@@ -0,0 +1,86 @@
+"""
+Fast JSON serialization for API responses
+
+Uses orjson when it is installed and falls back to the standard library
+otherwise. Values are encoded the same way Flask's default provider does
+(datetimes as HTTP dates, unknown objects such as ObjectId as strings),
+so switching serializers doesn't change what the frontend receives.
+"""
+import dataclasses
+import decimal
+import json
+import uuid
+from datetime import date, datetime
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+def _default(value):
+    """Encode types JSON doesn't support natively"""
+    if isinstance(value, (datetime, date)):
+        return http_date(value)
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.asdict(value)
+    if hasattr(value, '__html__'):
+        return str(value.__html__())
+    # bson.ObjectId and anything else printable
+    return str(value)
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+    
+    def dumps_bytes(obj, sort_keys: bool = False) -> bytes:
+        """Serialize obj to compact UTF-8 JSON"""
+        option = _ORJSON_OPTIONS | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        return orjson.dumps(obj, default=_default, option=option)
+    
+    loads = orjson.loads
+else:
+    def dumps_bytes(obj, sort_keys: bool = False) -> bytes:
+        """Serialize obj to compact UTF-8 JSON"""
+        return json.dumps(obj, default=_default, sort_keys=sort_keys, ensure_ascii=False,
+                          separators=(',', ':')).encode('utf-8')
+    
+    loads = json.loads
+
+
+def dumps(obj, sort_keys: bool = False) -> str:
+    return dumps_bytes(obj, sort_keys).decode('utf-8')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson when available"""
+    
+    def dumps(self, obj, **kwargs) -> str:
+        if kwargs:
+            # Callers asking for indent etc. get the stdlib encoder
+            kwargs.setdefault('default', _default)
+            return json.dumps(obj, **kwargs)
+        return dumps(obj, self.sort_keys)
+    
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return json.loads(s, **kwargs)
+        return loads(s)
+    
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj, self.sort_keys) + b'\n',
+                                        mimetype=self.mimetype)
+
+
+def init_json(app):
+    """Install the fast provider on a Flask app"""
+    app.json_provider_class = FastJSONProvider
+    app.json = FastJSONProvider(app)
+    # The frontend doesn't rely on key order, so skip the sort
+    app.json.sort_keys = False
+    return app.json
@@ -22,8 +22,6 @@ class LimitOrderBot(BaseBot):
             Order response or None
         """
         try:
-            logger.info(f"Placing LIMIT {side} order: {quantity} {symbol} @ {price}")
-            
             order = self.client.futures_create_order(
                 symbol=symbol,
                 side=side,
@@ -33,11 +31,13 @@ class LimitOrderBot(BaseBot):
                 price=price
             )
             
-            logger.info(f"✓ Limit order placed successfully!")
-            logger.info(f"Order ID: {order['orderId']}")
-            logger.info(f"Status: {order['status']}")
-            logger.info(f"Price: {order['price']}")
-            logger.info(f"Quantity: {order['origQty']}")
+            logger.info(
+                "✓ Limit order placed: %s %s %s @ %s | ID %s | %s",
+                side, order['origQty'], symbol, order['price'], order['orderId'], order['status'],
+                extra={'event': 'order_placed', 'order_type': 'LIMIT', 'symbol': symbol, 'side': side,
+                       'quantity': quantity, 'price': price, 'order_id': order['orderId'],
+                       'status': order['status']}
+            )
             
             return order
             
@@ -45,7 +45,7 @@ class LimitOrderBot(BaseBot):
             logger.error(f"Binance API Error: {e.message}")
             return None
         except Exception as e:
-            logger.error(f"Error placing limit order: {e}")
+            logger.error("Error placing limit order (%s %s %s @ %s): %s", side, quantity, symbol, price, e)
             return None
     
     def cancel_order(self, symbol: str, order_id: int):
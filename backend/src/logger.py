@@ -1,43 +1,165 @@
 """
 Logging module for the trading bot
+
+Records are handed to a queue on the calling thread and formatted and
+written by a QueueListener thread, so a slow disk or console never
+blocks order handling. Call sites pass %-style arguments
+(logger.info("Order %s", order_id)) so messages below the configured
+level are never formatted at all.
+
+Environment:
+    LOG_LEVEL: Minimum level recorded (default INFO)
+    LOG_JSON: True to write one JSON object per record (including any
+              extra={...} fields) instead of text lines
+    LOG_MAX_BYTES / LOG_BACKUP_COUNT: Rotate the log file (0 disables rotation)
+    LOG_FILE: Log file of the main process (default bot.log)
+
+Each process rotates only its own file: forked children (gunicorn workers)
+write to the log file name with their pid inserted (bot.<pid>.log) instead
+of sharing the parent's, so no two processes rename the same file.
 """
+import atexit
+import json
 import logging
+import os
+import queue
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from config import Config
 
+# Attributes every LogRecord has; anything else came from extra={...}
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats each record as a single JSON object"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread
+    
+    The stock QueueHandler renders the message on the calling thread so
+    records can be pickled; our queue is in-process, so the record is
+    passed through untouched.
+    """
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def _worker_log_file(path: str, pid: int) -> str:
+    """Log file of a forked process ('bot.log' -> 'bot.<pid>.log')"""
+    root, ext = os.path.splitext(path)
+    return f"{root}.{pid}{ext}"
+
+
+def _create_file_handler(path: str) -> logging.Handler:
+    max_bytes = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))
+    if max_bytes > 0:
+        handler = RotatingFileHandler(path, maxBytes=max_bytes,
+                                      backupCount=int(os.getenv('LOG_BACKUP_COUNT', 5)),
+                                      delay=True)
+    else:
+        handler = logging.FileHandler(path, delay=True)
+    handler.setLevel(logging.DEBUG)
+    return handler
+
+
+def _create_formatter() -> logging.Formatter:
+    if os.getenv('LOG_JSON', 'False') == 'True':
+        return JsonFormatter()
+    return logging.Formatter(Config.LOG_FORMAT, datefmt=Config.LOG_DATE_FORMAT)
+
+
+class LogPipeline:
+    """Owns the queue listener and restarts it in forked children"""
+    
+    def __init__(self):
+        self.handlers = []
+        self.queue_handler = None
+        self.listener = None
+    
+    def start(self, handlers):
+        self.handlers = handlers
+        self.queue_handler = DeferredQueueHandler(queue.SimpleQueue())
+        self.listener = QueueListener(self.queue_handler.queue, *handlers, respect_handler_level=True)
+        self.listener.start()
+        return self.queue_handler
+    
+    def restart_after_fork(self):
+        """
+        The listener thread doesn't survive fork; start a new one on a fresh
+        queue, writing to this process's own log file
+        """
+        if self.queue_handler is None:
+            return
+        self.handlers = [self._reopen_for_child(handler) for handler in self.handlers]
+        self.queue_handler.queue = queue.SimpleQueue()
+        self.listener = QueueListener(self.queue_handler.queue, *self.handlers, respect_handler_level=True)
+        self.listener.start()
+    
+    @staticmethod
+    def _reopen_for_child(handler: logging.Handler) -> logging.Handler:
+        if not isinstance(handler, logging.FileHandler):
+            return handler
+        child = _create_file_handler(_worker_log_file(Config.LOG_FILE, os.getpid()))
+        child.setLevel(handler.level)
+        child.setFormatter(handler.formatter)
+        return child
+    
+    def stop(self):
+        """Write out queued records and stop the listener"""
+        if self.listener is not None and self.listener._thread is not None:
+            self.listener.stop()
+
+
+pipeline = LogPipeline()
+
+
 def setup_logger(name: str = "BinanceBot") -> logging.Logger:
     """
     Setup and configure logger for the trading bot
     
     Args:
         name: Logger name
-        
+    
     Returns:
         Configured logger instance
     """
     logger = logging.getLogger(name)
-    logger.setLevel(logging.DEBUG)
+    logger.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+    
+    formatter = _create_formatter()
     
     # File handler
-    file_handler = logging.FileHandler(Config.LOG_FILE)
-    file_handler.setLevel(logging.DEBUG)
+    file_handler = _create_file_handler(Config.LOG_FILE)
     
     # Console handler
     console_handler = logging.StreamHandler()
     console_handler.setLevel(logging.INFO)
     
-    # Formatter
-    formatter = logging.Formatter(
-        Config.LOG_FORMAT,
-        datefmt=Config.LOG_DATE_FORMAT
-    )
-    
     file_handler.setFormatter(formatter)
     console_handler.setFormatter(formatter)
     
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+    logger.addHandler(pipeline.start([file_handler, console_handler]))
     
     return logger
 
 # Global logger instance
 logger = setup_logger()
+atexit.register(pipeline.stop)
+os.register_at_fork(after_in_child=pipeline.restart_after_fork)
@@ -21,8 +21,6 @@ class MarketOrderBot(BaseBot):
             Order response or None
         """
         try:
-            logger.info(f"Placing MARKET {side} order: {quantity} {symbol}")
-            
             order = self.client.futures_create_order(
                 symbol=symbol,
                 side=side,
@@ -30,17 +28,20 @@ class MarketOrderBot(BaseBot):
                 quantity=quantity
             )
             
-            logger.info(f"✓ Market order placed successfully!")
-            logger.info(f"Order ID: {order['orderId']}")
-            logger.info(f"Status: {order['status']}")
-            logger.info(f"Executed Quantity: {order.get('executedQty', 'N/A')}")
-            logger.info(f"Average Price: {order.get('avgPrice', 'N/A')}")
+            logger.info(
+                "✓ Market order placed: %s %s %s | ID %s | %s | filled %s @ %s",
+                side, quantity, symbol, order['orderId'], order['status'],
+                order.get('executedQty', 'N/A'), order.get('avgPrice', 'N/A'),
+                extra={'event': 'order_placed', 'order_type': 'MARKET', 'symbol': symbol, 'side': side,
+                       'quantity': quantity, 'order_id': order['orderId'], 'status': order['status'],
+                       'executed_qty': order.get('executedQty'), 'avg_price': order.get('avgPrice')}
+            )
             
             return order
             
         except BinanceAPIException as e:
-            logger.error(f"Binance API Error: {e.message}")
+            logger.error("Binance API Error: %s", e.message)
             return None
         except Exception as e:
-            logger.error(f"Error placing market order: {e}")
+            logger.error("Error placing market order (%s %s %s): %s", side, quantity, symbol, e)
             return None
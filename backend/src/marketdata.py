@@ -0,0 +1,398 @@
+"""
+Local market-data store for klines and aggregate trades
+
+History is kept on disk as one .npy file per column, partitioned by
+symbol and UTC day:
+
+    MARKET_DATA_DIR/BTCUSDT/klines-1m/2024-05-01/open_time.npy
+    MARKET_DATA_DIR/BTCUSDT/aggTrades/2024-05-01/price.npy
+
+Reads memory-map the column files, so a day (or a time range inside
+one) comes back as read-only NumPy views without copying or parsing.
+sync() downloads only what is missing: finished days are never fetched
+again, and today's partition is extended from where the last download
+stopped.
+
+Usage:
+    python marketdata.py sync BTCUSDT --start 2024-05-01 --end 2024-05-31 --interval 1m
+    python marketdata.py sync BTCUSDT --start 2024-05-01 --end 2024-05-02 --trades
+    python marketdata.py list BTCUSDT
+
+Environment:
+    MARKET_DATA_DIR: Store location (default market_data)
+"""
+import argparse
+import json
+import os
+import time
+from datetime import date, datetime, timedelta, timezone
+import numpy as np
+from logger import logger
+
+DAY_MS = 86_400_000
+
+# (column, dtype, source) - source is the index in a futures_klines() row
+KLINE_COLUMNS = (
+    ('open_time', np.int64, 0),
+    ('open', np.float64, 1),
+    ('high', np.float64, 2),
+    ('low', np.float64, 3),
+    ('close', np.float64, 4),
+    ('volume', np.float64, 5),
+    ('close_time', np.int64, 6),
+    ('quote_volume', np.float64, 7),
+    ('trades', np.int64, 8),
+    ('taker_buy_volume', np.float64, 9),
+    ('taker_buy_quote_volume', np.float64, 10),
+)
+
+# (column, dtype, source) - source is the key in a futures_aggregate_trades() row
+AGG_TRADE_COLUMNS = (
+    ('agg_id', np.int64, 'a'),
+    ('price', np.float64, 'p'),
+    ('quantity', np.float64, 'q'),
+    ('first_id', np.int64, 'f'),
+    ('last_id', np.int64, 'l'),
+    ('time', np.int64, 'T'),
+    ('is_buyer_maker', np.bool_, 'm'),
+)
+
+KLINE_LIMIT = 1500
+AGG_TRADE_LIMIT = 1000
+# Binance rejects aggTrades queries spanning an hour or more
+AGG_TRADE_WINDOW_MS = 3_600_000 - 1
+# Trades this recent may still be arriving; leave them for the next sync
+SETTLE_MS = 2000
+
+INTERVAL_MS = {
+    '1m': 60_000, '3m': 180_000, '5m': 300_000, '15m': 900_000, '30m': 1_800_000,
+    '1h': 3_600_000, '2h': 7_200_000, '4h': 14_400_000, '6h': 21_600_000,
+    '8h': 28_800_000, '12h': 43_200_000, '1d': DAY_MS,
+}
+
+
+def to_ms(value) -> int:
+    """Milliseconds since the epoch from an int, 'YYYY-MM-DD[THH:MM[:SS]]', date or datetime (UTC)"""
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() * 1000)
+
+
+def _day_start(day: date) -> int:
+    return to_ms(day)
+
+
+def _days(start_ms: int, end_ms: int):
+    """UTC days overlapping [start_ms, end_ms]"""
+    day = datetime.fromtimestamp(start_ms / 1000, timezone.utc).date()
+    last = datetime.fromtimestamp(end_ms / 1000, timezone.utc).date()
+    while day <= last:
+        yield day
+        day += timedelta(days=1)
+
+
+class MarketDataStore:
+    """Day-partitioned, memory-mapped columns of klines and aggregate trades"""
+    
+    def __init__(self, root: str = None):
+        self.root = root or os.getenv('MARKET_DATA_DIR', 'market_data')
+    
+    @staticmethod
+    def dataset(kind: str = 'klines', interval: str = '1m') -> str:
+        """Directory name for a data kind: 'klines-1m' or 'aggTrades'"""
+        if kind == 'klines':
+            if interval not in INTERVAL_MS:
+                raise ValueError(f"Unsupported kline interval: {interval}")
+            return f"klines-{interval}"
+        if kind == 'aggTrades':
+            return kind
+        raise ValueError(f"Unknown market data kind: {kind}")
+    
+    @staticmethod
+    def columns(kind: str = 'klines'):
+        return KLINE_COLUMNS if kind == 'klines' else AGG_TRADE_COLUMNS
+    
+    @staticmethod
+    def time_column(kind: str = 'klines') -> str:
+        return 'open_time' if kind == 'klines' else 'time'
+    
+    def _path(self, symbol: str, dataset: str, day: date = None) -> str:
+        path = os.path.join(self.root, symbol.upper(), dataset)
+        return os.path.join(path, day.isoformat()) if day else path
+    
+    def meta(self, symbol: str, day: date, kind: str = 'klines', interval: str = '1m') -> dict:
+        """A stored day's row count and completeness (None when not stored)"""
+        return self._read_meta(self._path(symbol, self.dataset(kind, interval), day))
+    
+    def _read_meta(self, path: str) -> dict:
+        try:
+            with open(os.path.join(path, 'meta.json')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+    
+    def days(self, symbol: str, kind: str = 'klines', interval: str = '1m') -> list:
+        """Stored days for a symbol, oldest first"""
+        path = self._path(symbol, self.dataset(kind, interval))
+        if not os.path.isdir(path):
+            return []
+        stored = []
+        for name in sorted(os.listdir(path)):
+            if self._read_meta(os.path.join(path, name)) is not None:
+                stored.append(date.fromisoformat(name))
+        return stored
+    
+    def missing(self, symbol: str, start, end, kind: str = 'klines', interval: str = '1m') -> list:
+        """Days in [start, end] that are absent or not yet complete"""
+        dataset = self.dataset(kind, interval)
+        pending = []
+        for day in _days(to_ms(start), to_ms(end)):
+            meta = self._read_meta(self._path(symbol, dataset, day))
+            if not meta or not meta['complete']:
+                pending.append(day)
+        return pending
+    
+    def partition(self, symbol: str, day: date, kind: str = 'klines', interval: str = '1m',
+                  columns=None) -> dict:
+        """
+        One day of data as read-only memory-mapped arrays (zero-copy)
+        
+        Returns:
+            Column name -> array; empty arrays when the day isn't stored
+        """
+        path = self._path(symbol, self.dataset(kind, interval), day)
+        meta = self._read_meta(path)
+        names = columns or [name for name, _, _ in self.columns(kind)]
+        if not meta:
+            return self._empty(kind, names)
+        # Column files may be ahead of meta.json after an interrupted write;
+        # rows only ever get appended, so the first meta['rows'] are valid
+        return {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r')[:meta['rows']]
+                for name in names}
+    
+    def read(self, symbol: str, start, end, kind: str = 'klines', interval: str = '1m',
+             columns=None) -> dict:
+        """
+        Rows with time in [start, end]
+        
+        A range inside a single day is returned as views of the mapped
+        files; a range spanning several days is concatenated (one copy).
+        
+        Args:
+            symbol: Trading pair
+            start, end: Inclusive bounds (see to_ms)
+            kind: 'klines' or 'aggTrades'
+            interval: Kline interval
+            columns: Subset of columns to return (default all)
+        
+        Returns:
+            Column name -> array
+        """
+        start_ms, end_ms = to_ms(start), to_ms(end)
+        time_name = self.time_column(kind)
+        names = list(columns or [name for name, _, _ in self.columns(kind)])
+        wanted = names if time_name in names else names + [time_name]
+        
+        parts = []
+        for day in _days(start_ms, end_ms):
+            data = self.partition(symbol, day, kind, interval, wanted)
+            times = data[time_name]
+            lo, hi = np.searchsorted(times, start_ms, 'left'), np.searchsorted(times, end_ms, 'right')
+            if hi > lo:
+                parts.append({name: data[name][lo:hi] for name in names})
+        
+        if len(parts) == 1:
+            return parts[0]
+        if not parts:
+            return self._empty(kind, names)
+        return {name: np.concatenate([part[name] for part in parts]) for name in names}
+    
+    def _empty(self, kind: str, names) -> dict:
+        dtypes = {name: dtype for name, dtype, _ in self.columns(kind)}
+        return {name: np.empty(0, dtype=dtypes[name]) for name in names}
+    
+    def _write(self, path: str, data: dict, meta: dict):
+        """Replace a partition's columns, then its meta.json (each file atomically)"""
+        os.makedirs(path, exist_ok=True)
+        for name, values in data.items():
+            target = os.path.join(path, f"{name}.npy")
+            with open(target + '.tmp', 'wb') as f:
+                np.save(f, values)
+            os.replace(target + '.tmp', target)
+        with open(os.path.join(path, 'meta.json.tmp'), 'w') as f:
+            json.dump(meta, f)
+        os.replace(os.path.join(path, 'meta.json.tmp'), os.path.join(path, 'meta.json'))
+    
+    def append(self, symbol: str, day: date, rows: dict, meta: dict, kind: str = 'klines',
+               interval: str = '1m'):
+        """
+        Append rows (column arrays) to a day's partition
+        
+        Rows at or before the partition's last timestamp are dropped, so
+        overlapping downloads are harmless.
+        """
+        path = self._path(symbol, self.dataset(kind, interval), day)
+        existing = self.partition(symbol, day, kind, interval)
+        time_name = self.time_column(kind)
+        if len(existing[time_name]):
+            keep = rows[time_name] > existing[time_name][-1]
+            rows = {name: values[keep] for name, values in rows.items()}
+        combined = {name: np.concatenate([existing[name], np.asarray(rows[name], dtype=dtype)])
+                    for name, dtype, _ in self.columns(kind)}
+        meta['rows'] = len(combined[time_name])
+        self._write(path, combined, meta)
+    
+    def sync(self, symbol: str, start, end, kind: str = 'klines', interval: str = '1m',
+             client=None) -> dict:
+        """
+        Download whatever is missing for [start, end]
+        
+        Whole days are stored; complete days are skipped, and a partially
+        downloaded day resumes where it stopped. Days still in progress
+        are filled up to now and completed by a later sync.
+        
+        Args:
+            symbol: Trading pair
+            start, end: Range to cover (see to_ms)
+            kind: 'klines' or 'aggTrades'
+            interval: Kline interval
+            client: python-binance client (default: public futures client)
+        
+        Returns:
+            Dictionary with success status, days fetched and rows added
+        """
+        symbol = symbol.upper()
+        dataset = self.dataset(kind, interval)
+        try:
+            client = client or _public_client()
+            now = int(time.time() * 1000)
+            fetched, added = [], 0
+            for day in self.missing(symbol, start, min(to_ms(end), now), kind, interval):
+                path = self._path(symbol, dataset, day)
+                meta = self._read_meta(path) or {'resume': _day_start(day)}
+                day_end = _day_start(day) + DAY_MS - 1
+                until = min(day_end, now - SETTLE_MS)
+                if kind == 'klines':
+                    rows, resume = _download_klines(client, symbol, interval, meta['resume'], until)
+                else:
+                    rows, resume = _download_agg_trades(client, symbol, meta['resume'], until)
+                meta = {'resume': resume, 'complete': until >= day_end, 'updated': now}
+                before = len(self.partition(symbol, day, kind, interval)[self.time_column(kind)])
+                self.append(symbol, day, rows, meta, kind, interval)
+                added += meta['rows'] - before
+                fetched.append(day.isoformat())
+                logger.info("Stored %s %s %s: %d rows%s", symbol, dataset, day, meta['rows'],
+                            '' if meta['complete'] else ' (partial)')
+            return {
+                'success': True,
+                'days': fetched,
+                'rows': added,
+                'message': f"Fetched {len(fetched)} day(s), {added} new rows"
+            }
+        except Exception as e:
+            logger.error(f"Market data sync failed for {symbol} {dataset}: {e}")
+            return {
+                'success': False,
+                'message': f"Sync failed: {str(e)}"
+            }
+
+
+def _public_client():
+    # Imported here so reading the store doesn't need python-binance
+    from exchange import create_client
+    return create_client(None, None, testnet=False)
+
+
+def _columns_from_rows(rows: list, columns) -> dict:
+    return {name: np.asarray([row[source] for row in rows], dtype=dtype) for name, dtype, source in columns}
+
+
+def _download_klines(client, symbol: str, interval: str, start_ms: int, end_ms: int):
+    """
+    Closed klines opening in [start_ms, end_ms]
+    
+    Returns:
+        (column arrays, where the next download should start)
+    """
+    rows = []
+    cursor = start_ms
+    while cursor <= end_ms:
+        batch = client.futures_klines(symbol=symbol, interval=interval, startTime=cursor,
+                                      endTime=end_ms, limit=KLINE_LIMIT)
+        # The current bar is still forming; it is fetched once it closes
+        batch = [k for k in batch if k[6] <= end_ms]
+        if not batch:
+            break
+        rows.extend(batch)
+        cursor = batch[-1][0] + 1
+        if len(batch) < KLINE_LIMIT:
+            break
+    resume = rows[-1][6] + 1 if rows else start_ms
+    return _columns_from_rows(rows, KLINE_COLUMNS), resume
+
+
+def _download_agg_trades(client, symbol: str, start_ms: int, end_ms: int):
+    """
+    Aggregate trades in [start_ms, end_ms]
+    
+    Time queries are limited to an hour, so the first trade is located
+    an hour at a time and the rest are paged by trade id.
+    
+    Returns:
+        (column arrays, where the next download should start)
+    """
+    rows = []
+    window_start = start_ms
+    while not rows and window_start <= end_ms:
+        window_end = min(window_start + AGG_TRADE_WINDOW_MS, end_ms)
+        rows = client.futures_aggregate_trades(symbol=symbol, startTime=window_start,
+                                               endTime=window_end, limit=AGG_TRADE_LIMIT)
+        window_start = window_end + 1
+    while rows:
+        batch = client.futures_aggregate_trades(symbol=symbol, fromId=rows[-1]['a'] + 1,
+                                                limit=AGG_TRADE_LIMIT)
+        rows.extend(t for t in batch if t['T'] <= end_ms)
+        if len(batch) < AGG_TRADE_LIMIT or batch[-1]['T'] > end_ms:
+            break
+    return _columns_from_rows(rows, AGG_TRADE_COLUMNS), end_ms + 1
+
+
+store = MarketDataStore()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local market-data store')
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    sync = commands.add_parser('sync', help='Download missing days')
+    sync.add_argument('symbol')
+    sync.add_argument('--start', required=True, help='First day (YYYY-MM-DD, UTC)')
+    sync.add_argument('--end', help='Last day (default: today)')
+    sync.add_argument('--interval', default='1m', help='Kline interval')
+    sync.add_argument('--trades', action='store_true', help='Aggregate trades instead of klines')
+    
+    listing = commands.add_parser('list', help='Show stored days')
+    listing.add_argument('symbol')
+    listing.add_argument('--interval', default='1m')
+    listing.add_argument('--trades', action='store_true')
+    args = parser.parse_args()
+    
+    kind = 'aggTrades' if args.trades else 'klines'
+    if args.command == 'sync':
+        end = to_ms(args.end) + DAY_MS - 1 if args.end else int(time.time() * 1000)
+        result = store.sync(args.symbol, args.start, end, kind, args.interval)
+        print(result['message'])
+    else:
+        for day in store.days(args.symbol, kind, args.interval):
+            meta = store.meta(args.symbol, day, kind, args.interval)
+            print(f"{day}  {meta['rows']:>10} rows{'' if meta['complete'] else '  (partial)'}")
+
+
+if __name__ == '__main__':
+    main()
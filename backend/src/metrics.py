@@ -0,0 +1,248 @@
+"""
+Prometheus-style metrics
+
+A small in-process registry of counters, gauges and histograms rendered
+in the Prometheus text exposition format on /metrics. Recording a sample
+is a bisect plus a locked increment, so it is safe to call on hot paths.
+Gauges for queue depths and cache statistics are read from callbacks at
+scrape time and cost nothing between scrapes.
+
+/metrics requires 'Authorization: Bearer <METRICS_TOKEN>' when
+METRICS_TOKEN is set; otherwise it only answers direct loopback clients
+(e.g. a scraper or agent on the same host).
+
+Each gunicorn worker keeps its own registry; every sample carries a
+'worker' label (the pid) so per-worker series can be summed in queries.
+"""
+import hmac
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Seconds; covers sub-millisecond cache hits up to slow exchange calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    type = 'untyped'
+    
+    def __init__(self, name: str, help: str, labels=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self._lock = threading.Lock()
+    
+    def header(self):
+        return [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.type}']
+
+
+class Counter(Metric):
+    """Monotonically increasing count"""
+    type = 'counter'
+    
+    def __init__(self, name: str, help: str, labels=()):
+        super().__init__(name, help, labels)
+        self._values = {}
+    
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+    
+    def samples(self, extra):
+        with self._lock:
+            items = list(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, key, extra)} {_format_value(value)}'
+                for key, value in items]
+
+
+class Gauge(Metric):
+    """Value read from a callback at scrape time
+    
+    The callback returns either a number (unlabelled gauge) or a dict of
+    label tuple -> number. type='counter' exposes a running total kept
+    elsewhere (e.g. cache hit counts) as a counter.
+    """
+    
+    def __init__(self, name: str, help: str, callback, labels=(), type: str = 'gauge'):
+        super().__init__(name, help, labels)
+        self.callback = callback
+        self.type = type
+    
+    def samples(self, extra):
+        value = self.callback()
+        if not isinstance(value, dict):
+            value = {(): value}
+        return [f'{self.name}{_format_labels(self.labelnames, key, extra)} {_format_value(float(v))}'
+                for key, v in value.items()]
+
+
+class Histogram(Metric):
+    """Distribution of observed values in fixed buckets"""
+    type = 'histogram'
+    
+    def __init__(self, name: str, help: str, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [bucket counts..., +Inf count, sum]
+    
+    def observe(self, value: float, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+    
+    @contextmanager
+    def time(self, *labels):
+        """Observe the duration of a with-block"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+    
+    def samples(self, extra):
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._series.items()]
+        
+        lines = []
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series[:-1]):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, extra + [('le', _format_value(float(bound)))])
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, key, extra)
+            lines.append(f'{self.name}_sum{labels} {_format_value(series[-1])}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together on /metrics"""
+    
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+    
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+    
+    def counter(self, name: str, help: str, labels=()) -> Counter:
+        return self._register(Counter(name, help, labels))
+    
+    def histogram(self, name: str, help: str, labels=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+    
+    def gauge(self, name: str, help: str, callback, labels=(), type: str = 'gauge') -> Gauge:
+        """Register (or replace) a gauge read from callback at scrape time"""
+        gauge = Gauge(name, help, callback, labels, type)
+        with self._lock:
+            self._metrics[name] = gauge
+        return gauge
+    
+    def render(self) -> str:
+        """All metrics in Prometheus text exposition format"""
+        extra = [('worker', os.getpid())]
+        with self._lock:
+            metrics = list(self._metrics.values())
+        
+        lines = []
+        for metric in metrics:
+            try:
+                samples = metric.samples(extra)
+            except Exception as e:
+                lines.append(f'# {metric.name} unavailable: {_escape(e)}')
+                continue
+            lines.extend(metric.header())
+            lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+    
+    def init_app(self, app, token: str = None):
+        """Time every Flask request and expose /metrics"""
+        from flask import Response, g, request
+        
+        token = token if token is not None else os.getenv('METRICS_TOKEN', '')
+        
+        @app.before_request
+        def _start_timer():
+            g._metrics_started = time.perf_counter()
+        
+        @app.after_request
+        def _record_request(response):
+            started = g.pop('_metrics_started', None)
+            if started is not None:
+                route = request.url_rule.rule if request.url_rule else 'unmatched'
+                http_request_seconds.observe(time.perf_counter() - started,
+                                             request.method, route, str(response.status_code))
+            return response
+        
+        @app.route('/metrics')
+        def prometheus_metrics():
+            if token:
+                expected = f"Bearer {token}".encode()
+                if not hmac.compare_digest(request.headers.get('Authorization', '').encode(), expected):
+                    return Response('Unauthorized\n', status=401, headers={'WWW-Authenticate': 'Bearer'})
+            elif request.remote_addr not in ('127.0.0.1', '::1') or 'X-Forwarded-For' in request.headers:
+                # Loopback through a reverse proxy is still a public request
+                return Response('Forbidden\n', status=403)
+            return Response(self.render(), mimetype='text/plain; version=0.0.4')
+        
+        return app
+
+
+# Global registry
+metrics = MetricsRegistry()
+
+http_request_seconds = metrics.histogram(
+    'http_request_duration_seconds', 'Time spent handling HTTP requests',
+    labels=('method', 'route', 'status')
+)
+exchange_request_seconds = metrics.histogram(
+    'exchange_request_duration_seconds', 'Binance REST call latency',
+    labels=('method', 'endpoint', 'outcome')
+)
+order_ack_seconds = metrics.histogram(
+    'order_ack_duration_seconds', 'Time from order submission to exchange acknowledgement',
+    labels=('order_type', 'outcome')
+)
+db_operation_seconds = metrics.histogram(
+    'db_operation_duration_seconds', 'Database command latency',
+    labels=('command', 'outcome')
+)
+telegram_send_seconds = metrics.histogram(
+    'telegram_send_duration_seconds', 'Telegram sendMessage latency',
+    labels=('outcome',)
+)
+emulated_trigger_seconds = metrics.histogram(
+    'emulated_order_decision_seconds', 'Time from a price tick to dispatching the emulated orders it triggers',
+    buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.01)
+)
@@ -9,8 +9,9 @@ from logger import logger
 class OrderHistory:
     """Manages order history storage and retrieval"""
     
-    def __init__(self, history_file='order_history.json'):
+    def __init__(self, history_file='order_history.json', max_orders=100):
         self.history_file = history_file
+        self.max_orders = max_orders
         self.history = self._load_history()
     
     def _load_history(self):
@@ -49,12 +50,12 @@ class OrderHistory:
         
         self.history.insert(0, order_record)  # Add to beginning
         
-        # Keep only last 100 orders
-        if len(self.history) > 100:
-            self.history = self.history[:100]
+        # Keep only the most recent orders
+        if len(self.history) > self.max_orders:
+            self.history = self.history[:self.max_orders]
         
         self._save_history()
-        logger.info(f"Order added to history: {order_type} {side} {quantity} {symbol}")
+        logger.debug("Order added to history: %s %s %s %s", order_type, side, quantity, symbol)
         
         return order_record
     
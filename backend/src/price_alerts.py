@@ -0,0 +1,319 @@
+"""
+Server-side price alerts evaluated on the WebSocket tick stream
+
+Active alerts are kept in per-symbol books sorted by target price:
+- 'above' alerts fire when price >= target, i.e. a prefix of the book
+- 'below' alerts fire when price <= target, i.e. a suffix of the book
+so each tick costs one bisect per side plus the alerts it triggers.
+
+Alerts are persisted in the 'price_alerts' collection. Every worker
+process keeps its own books (refreshed from the database periodically);
+an alert is claimed with a conditional update before it is sent, so it
+fires exactly once even when several workers see the same tick.
+"""
+import asyncio
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime
+from logger import logger
+from database import db
+from telegram_alerts import telegram_router
+from websocket_prices import websocket_feed
+
+DIRECTIONS = ('above', 'below')
+
+# Sorts after any alert ID, so (price, _MAX_ID) bounds every entry at price
+_MAX_ID = '\uffff'
+
+
+class PriceAlertBook:
+    """Sorted alert thresholds for one symbol"""
+    
+    def __init__(self):
+        # Sorted lists of (target_price, alert_id)
+        self.above = []
+        self.below = []
+    
+    def add(self, alert_id: str, target_price: float, direction: str):
+        insort(self.above if direction == 'above' else self.below, (target_price, alert_id))
+    
+    def remove(self, alert_id: str, target_price: float, direction: str) -> bool:
+        book = self.above if direction == 'above' else self.below
+        i = bisect_left(book, (target_price, alert_id))
+        if i < len(book) and book[i] == (target_price, alert_id):
+            del book[i]
+            return True
+        return False
+    
+    def pop_crossed(self, price: float):
+        """Remove and return (alert_id, target_price, direction) for every crossed alert"""
+        crossed = []
+        
+        # 'above' alerts with target <= price
+        k = bisect_right(self.above, (price, _MAX_ID))
+        if k:
+            crossed.extend((alert_id, target, 'above') for target, alert_id in self.above[:k])
+            del self.above[:k]
+        
+        # 'below' alerts with target >= price
+        i = bisect_left(self.below, (price, ''))
+        if i < len(self.below):
+            crossed.extend((alert_id, target, 'below') for target, alert_id in self.below[i:])
+            del self.below[i:]
+        
+        return crossed
+    
+    def __len__(self):
+        return len(self.above) + len(self.below)
+
+
+class PriceAlertEngine:
+    """Holds active price alerts and fires them on incoming ticks"""
+    
+    def __init__(self, refresh_seconds: int = 30, default_symbols=('BTCUSDT', 'ETHUSDT')):
+        self.refresh_seconds = refresh_seconds
+        self.default_symbols = set(default_symbols)
+        self.books = {}    # symbol -> PriceAlertBook
+        self.alerts = {}   # alert_id -> alert document
+        self._lock = threading.Lock()
+        self._feed_symbols = set()
+        self._thread = None
+        self._pid = None
+        self._stopping = threading.Event()
+        self._last_refresh = 0.0
+    
+    # ------------------------------------------------------------------
+    # In-memory books
+    # ------------------------------------------------------------------
+    
+    def _index(self, alert: dict):
+        self.alerts[alert['alert_id']] = alert
+        self.books.setdefault(alert['symbol'], PriceAlertBook()).add(
+            alert['alert_id'], alert['target_price'], alert['direction']
+        )
+    
+    def _unindex(self, alert_id: str):
+        alert = self.alerts.pop(alert_id, None)
+        if alert:
+            book = self.books.get(alert['symbol'])
+            if book:
+                book.remove(alert_id, alert['target_price'], alert['direction'])
+        return alert
+    
+    def load(self):
+        """(Re)build the books from all active alerts in the database"""
+        try:
+            active = list(db.price_alerts.find({'active': True}, {'_id': 0}))
+            with self._lock:
+                self.books = {}
+                self.alerts = {}
+                for alert in active:
+                    self._index(alert)
+            self._last_refresh = time.monotonic()
+            logger.info(f"Loaded {len(active)} active price alerts")
+            self._update_feed_symbols()
+            return len(active)
+        except Exception as e:
+            logger.error(f"Error loading price alerts: {e}")
+            return 0
+    
+    def symbols(self) -> set:
+        """Symbols that currently have active alerts"""
+        with self._lock:
+            return {symbol for symbol, book in self.books.items() if len(book)}
+    
+    # ------------------------------------------------------------------
+    # CRUD
+    # ------------------------------------------------------------------
+    
+    def create_alert(self, email: str, symbol: str, target_price: float, direction: str):
+        """Create and persist a new alert"""
+        try:
+            if direction not in DIRECTIONS:
+                return {'success': False, 'message': "Direction must be 'above' or 'below'"}
+            if target_price <= 0:
+                return {'success': False, 'message': 'Target price must be positive'}
+            
+            alert = {
+                'alert_id': uuid.uuid4().hex,
+                'user_email': email,
+                'symbol': symbol.upper(),
+                'target_price': float(target_price),
+                'direction': direction,
+                'active': True,
+                'created_at': datetime.utcnow()
+            }
+            db.price_alerts.insert_one(dict(alert))
+            
+            with self._lock:
+                self._index(alert)
+            self._update_feed_symbols()
+            
+            logger.info(f"Price alert created: {symbol} {direction} {target_price} ({email})")
+            return {'success': True, 'alert': alert}
+        
+        except Exception as e:
+            logger.error(f"Create price alert error: {e}")
+            return {'success': False, 'message': str(e)}
+    
+    def list_alerts(self, email: str, include_triggered: bool = False, limit: int = 100):
+        """List a user's alerts, newest first"""
+        try:
+            query = {'user_email': email}
+            if not include_triggered:
+                query['active'] = True
+            alerts = list(db.price_alerts.find(query, {'_id': 0}).sort('created_at', -1).limit(limit))
+            return {'success': True, 'alerts': alerts}
+        except Exception as e:
+            logger.error(f"List price alerts error: {e}")
+            return {'success': False, 'message': str(e)}
+    
+    def update_alert(self, email: str, alert_id: str, target_price: float = None, direction: str = None):
+        """Change the target and/or direction of an active alert"""
+        try:
+            changes = {}
+            if target_price is not None:
+                if target_price <= 0:
+                    return {'success': False, 'message': 'Target price must be positive'}
+                changes['target_price'] = float(target_price)
+            if direction is not None:
+                if direction not in DIRECTIONS:
+                    return {'success': False, 'message': "Direction must be 'above' or 'below'"}
+                changes['direction'] = direction
+            if not changes:
+                return {'success': False, 'message': 'Nothing to update'}
+            
+            result = db.price_alerts.update_one(
+                {'alert_id': alert_id, 'user_email': email, 'active': True},
+                {'$set': changes}
+            )
+            if result.matched_count == 0:
+                return {'success': False, 'message': 'Alert not found'}
+            
+            alert = db.price_alerts.find_one({'alert_id': alert_id}, {'_id': 0})
+            with self._lock:
+                self._unindex(alert_id)
+                self._index(alert)
+            
+            return {'success': True, 'alert': alert}
+        
+        except Exception as e:
+            logger.error(f"Update price alert error: {e}")
+            return {'success': False, 'message': str(e)}
+    
+    def delete_alert(self, email: str, alert_id: str):
+        """Delete one of a user's alerts"""
+        try:
+            result = db.price_alerts.delete_one({'alert_id': alert_id, 'user_email': email})
+            if result.deleted_count == 0:
+                return {'success': False, 'message': 'Alert not found'}
+            
+            with self._lock:
+                self._unindex(alert_id)
+            return {'success': True, 'message': 'Alert deleted'}
+        
+        except Exception as e:
+            logger.error(f"Delete price alert error: {e}")
+            return {'success': False, 'message': str(e)}
+    
+    # ------------------------------------------------------------------
+    # Evaluation
+    # ------------------------------------------------------------------
+    
+    def check_price(self, symbol: str, price: float):
+        """Pop and return the alerts crossed by this price"""
+        with self._lock:
+            book = self.books.get(symbol)
+            if not book:
+                return []
+            crossed = book.pop_crossed(price)
+            return [self.alerts.pop(alert_id) for alert_id, _, _ in crossed if alert_id in self.alerts]
+    
+    def fire(self, alerts, price: float):
+        """Mark alerts triggered and notify their owners"""
+        for alert in alerts:
+            try:
+                # Claim the alert so only one worker sends it
+                result = db.price_alerts.update_one(
+                    {'alert_id': alert['alert_id'], 'active': True},
+                    {'$set': {
+                        'active': False,
+                        'triggered_price': price,
+                        'triggered_at': datetime.utcnow()
+                    }}
+                )
+                if result.modified_count == 0:
+                    continue
+                
+                telegram_router.for_user(alert['user_email']).alert_price_target(
+                    alert['symbol'], price, alert['target_price'], alert['direction']
+                )
+                logger.info(f"Price alert fired: {alert['symbol']} {alert['direction']} {alert['target_price']}")
+            
+            except Exception as e:
+                logger.error(f"Error firing price alert {alert['alert_id']}: {e}")
+    
+    async def on_tick(self, symbol: str, data: dict):
+        """WebSocketPriceFeed callback"""
+        price = data['price']
+        triggered = self.check_price(symbol, price)
+        
+        loop = asyncio.get_running_loop()
+        if triggered:
+            # Database writes and alert routing stay off the event loop
+            loop.run_in_executor(None, self.fire, triggered, price)
+        
+        if time.monotonic() - self._last_refresh > self.refresh_seconds:
+            self._last_refresh = time.monotonic()
+            loop.run_in_executor(None, self.load)
+    
+    # ------------------------------------------------------------------
+    # Feed lifecycle
+    # ------------------------------------------------------------------
+    
+    def watch(self, symbol: str):
+        """Keep a symbol on the feed for other tick consumers (e.g. the stop emulator)"""
+        self.default_symbols.add(symbol.upper())
+        self._update_feed_symbols()
+    
+    def _update_feed_symbols(self):
+        """Restart the feed if alerts exist for symbols it isn't streaming"""
+        if self._thread and not ((self.symbols() | self.default_symbols) <= self._feed_symbols):
+            websocket_feed.running = False
+    
+    def _run_feed(self):
+        while not self._stopping.is_set():
+            symbols = sorted(self.symbols() | self.default_symbols)
+            self._feed_symbols = set(symbols)
+            asyncio.run(websocket_feed.start(symbols))
+            
+            if not self._stopping.is_set():
+                time.sleep(1)
+    
+    def start(self):
+        """Load alerts and start evaluating them on the live price feed"""
+        if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        
+        self._pid = os.getpid()
+        self._stopping.clear()
+        self.load()
+        
+        if self.on_tick not in websocket_feed.price_callbacks:
+            websocket_feed.add_price_callback(self.on_tick)
+        
+        self._thread = threading.Thread(target=self._run_feed, name='price-alerts', daemon=True)
+        self._thread.start()
+        logger.info("Price alert engine started")
+    
+    def stop(self):
+        """Stop the price feed"""
+        self._stopping.set()
+        websocket_feed.running = False
+
+
+# Global instance
+price_alert_engine = PriceAlertEngine()
@@ -0,0 +1,389 @@
+"""
+Embedded SQLite storage backend
+
+Implements the subset of the PyMongo collection API used by the app
+(find_one, find, insert_one, update_one, delete_one, count_documents,
+create_index) on top of a single SQLite file in WAL mode, so single-node
+deployments and tests can run without a MongoDB server.
+
+Documents are stored as JSON; indexes are SQLite expression indexes over
+json_extract(), which gives the same lookup/sort behaviour as the Mongo
+indexes created by Database.create_indexes(). Datetimes, including ones in
+embedded documents, are stored as ISO strings and restored on read.
+"""
+import copy
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from logger import logger
+
+
+class InsertOneResult:
+    """Result of insert_one (mirrors pymongo.results.InsertOneResult)"""
+    
+    def __init__(self, inserted_id):
+        self.inserted_id = inserted_id
+
+
+class UpdateResult:
+    """Result of update_one (mirrors pymongo.results.UpdateResult)"""
+    
+    def __init__(self, matched_count, modified_count, upserted_id=None):
+        self.matched_count = matched_count
+        self.modified_count = modified_count
+        self.upserted_id = upserted_id
+
+
+class DeleteResult:
+    """Result of delete_one/delete_many (mirrors pymongo.results.DeleteResult)"""
+    
+    def __init__(self, deleted_count):
+        self.deleted_count = deleted_count
+
+
+def _json_path(field: str) -> str:
+    """Convert a dotted Mongo field name into a SQLite JSON path"""
+    return '$.' + '.'.join(f'"{part}"' for part in field.split('.'))
+
+
+def _field_expr(field: str) -> str:
+    """SQL expression selecting a document field"""
+    if field == '_id':
+        return 'id'
+    return f"json_extract(doc, '{_json_path(field)}')"
+
+
+def _to_sql_value(value):
+    """Convert a Python value into what json_extract() returns for it"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+
+def _date_paths(document: dict, prefix: str = '') -> list:
+    """Dotted paths of the datetime values in a document and its embedded documents"""
+    paths = []
+    for key, value in document.items():
+        if isinstance(value, datetime):
+            paths.append(prefix + key)
+        elif isinstance(value, dict):
+            paths.extend(_date_paths(value, f"{prefix}{key}."))
+    return paths
+
+
+def _set_path(document: dict, field: str, value):
+    """Set a (possibly dotted) field, creating embedded documents like Mongo's $set"""
+    *parents, last = field.split('.')
+    for part in parents:
+        child = document.setdefault(part, {})
+        if not isinstance(child, dict):
+            raise ValueError(f"Cannot set '{field}': '{part}' is not an embedded document")
+        document = child
+    document[last] = value
+
+
+def _unset_path(document: dict, field: str):
+    """Remove a (possibly dotted) field if it exists, like Mongo's $unset"""
+    *parents, last = field.split('.')
+    for part in parents:
+        document = document.get(part)
+        if not isinstance(document, dict):
+            return
+    document.pop(last, None)
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class SQLiteCursor:
+    """Lazy cursor supporting the sort/limit chaining used with find()"""
+    
+    def __init__(self, collection, query, projection):
+        self.collection = collection
+        self.query = query or {}
+        self.projection = projection
+        self._sort = []
+        self._limit = 0
+    
+    def sort(self, key, direction=1):
+        """Sort by a field (or list of (field, direction) pairs)"""
+        if isinstance(key, (list, tuple)):
+            self._sort.extend(key)
+        else:
+            self._sort.append((key, direction))
+        return self
+    
+    def limit(self, limit: int):
+        """Limit the number of returned documents"""
+        self._limit = limit
+        return self
+    
+    def __iter__(self):
+        where, params = self.collection._build_where(self.query)
+        sql = f"SELECT id, doc, dates FROM {self.collection.name}{where}"
+        if self._sort:
+            order = ', '.join(
+                f"{_field_expr(field)} {'DESC' if direction < 0 else 'ASC'}"
+                for field, direction in self._sort
+            )
+            sql += f" ORDER BY {order}"
+        if self._limit:
+            sql += " LIMIT ?"
+            params.append(self._limit)
+        
+        rows = self.collection._conn().execute(sql, params).fetchall()
+        for row in rows:
+            yield self.collection._decode(row, self.projection)
+
+
+class SQLiteCollection:
+    """A table of JSON documents exposing a PyMongo-like interface"""
+    
+    def __init__(self, database, name: str):
+        self.database = database
+        self.name = name
+        self._conn().execute(
+            f"CREATE TABLE IF NOT EXISTS {name} ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "doc TEXT NOT NULL, "
+            "dates TEXT NOT NULL DEFAULT '[]')"
+        )
+    
+    def _conn(self):
+        return self.database.connection()
+    
+    # ------------------------------------------------------------------
+    # Encoding
+    # ------------------------------------------------------------------
+    
+    @staticmethod
+    def _encode(document: dict):
+        """Serialize a document, remembering the paths of its datetimes"""
+        doc = {k: v for k, v in document.items() if k != '_id'}
+        return json.dumps(doc, default=_encode_value), json.dumps(sorted(_date_paths(doc)))
+    
+    @staticmethod
+    def _decode(row, projection=None):
+        """Rebuild a document from a (id, doc, dates) row"""
+        doc = json.loads(row[1])
+        for path in json.loads(row[2]):
+            *parents, last = path.split('.')
+            parent = doc
+            for part in parents:
+                parent = parent.get(part) if isinstance(parent, dict) else None
+            if isinstance(parent, dict) and isinstance(parent.get(last), str):
+                parent[last] = datetime.fromisoformat(parent[last])
+        doc = {'_id': str(row[0]), **doc}
+        
+        if projection:
+            included = {k for k, v in projection.items() if v}
+            excluded = {k for k, v in projection.items() if not v}
+            if included:
+                keep = included | ({'_id'} - excluded)
+                doc = {k: v for k, v in doc.items() if k in keep}
+            else:
+                doc = {k: v for k, v in doc.items() if k not in excluded}
+        return doc
+    
+    def _build_where(self, query: dict):
+        """Translate a Mongo-style filter into a WHERE clause"""
+        clauses = []
+        params = []
+        operators = {'$gt': '>', '$gte': '>=', '$lt': '<', '$lte': '<=', '$ne': '!='}
+        
+        for field, condition in (query or {}).items():
+            expr = _field_expr(field)
+            if field == '_id' and not isinstance(condition, dict):
+                condition = int(condition)
+            
+            if isinstance(condition, dict):
+                for op, value in condition.items():
+                    if op in operators:
+                        if op == '$ne' and value is None:
+                            clauses.append(f"{expr} IS NOT NULL")
+                        else:
+                            clauses.append(f"{expr} {operators[op]} ?")
+                            params.append(_to_sql_value(value))
+                    elif op == '$in':
+                        values = list(value)
+                        if not values:
+                            clauses.append("0")
+                            continue
+                        clauses.append(f"{expr} IN ({', '.join('?' * len(values))})")
+                        params.extend(_to_sql_value(v) for v in values)
+                    else:
+                        raise ValueError(f"Unsupported query operator: {op}")
+            elif condition is None:
+                clauses.append(f"{expr} IS NULL")
+            else:
+                clauses.append(f"{expr} = ?")
+                params.append(_to_sql_value(condition))
+        
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        return where, params
+    
+    # ------------------------------------------------------------------
+    # Collection API
+    # ------------------------------------------------------------------
+    
+    def create_index(self, keys, unique: bool = False, **kwargs):
+        """Create an expression index equivalent to a Mongo index"""
+        if isinstance(keys, str):
+            keys = [(keys, 1)]
+        
+        fields = '_'.join(field.replace('.', '_') for field, _ in keys)
+        index_name = kwargs.get('name') or f"idx_{self.name}_{fields}"
+        columns = ', '.join(
+            f"{_field_expr(field)} {'DESC' if direction < 0 else 'ASC'}"
+            for field, direction in keys
+        )
+        self._conn().execute(
+            f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS "
+            f"{index_name} ON {self.name} ({columns})"
+        )
+        return index_name
+    
+    def insert_one(self, document: dict):
+        """Insert a document and set its _id"""
+        doc, dates = self._encode(document)
+        cursor = self._conn().execute(
+            f"INSERT INTO {self.name} (doc, dates) VALUES (?, ?)", (doc, dates)
+        )
+        document['_id'] = str(cursor.lastrowid)
+        return InsertOneResult(document['_id'])
+    
+    def find_one(self, query: dict = None, projection: dict = None):
+        """Return the first matching document or None"""
+        where, params = self._build_where(query)
+        row = self._conn().execute(
+            f"SELECT id, doc, dates FROM {self.name}{where} LIMIT 1", params
+        ).fetchone()
+        return self._decode(row, projection) if row else None
+    
+    def find(self, query: dict = None, projection: dict = None):
+        """Return a lazy cursor over matching documents"""
+        return SQLiteCursor(self, query, projection)
+    
+    def count_documents(self, query: dict = None):
+        """Count matching documents"""
+        where, params = self._build_where(query)
+        return self._conn().execute(
+            f"SELECT COUNT(*) FROM {self.name}{where}", params
+        ).fetchone()[0]
+    
+    def update_one(self, query: dict, update: dict, upsert: bool = False):
+        """Apply $set/$unset (dotted paths set embedded fields) to the first matching document"""
+        unsupported = set(update) - {'$set', '$unset'}
+        if unsupported:
+            raise ValueError(f"Unsupported update operator: {', '.join(unsupported)}")
+        
+        conn = self._conn()
+        where, params = self._build_where(query)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                f"SELECT id, doc, dates FROM {self.name}{where} LIMIT 1", params
+            ).fetchone()
+            
+            if not row:
+                if not upsert:
+                    conn.execute("COMMIT")
+                    return UpdateResult(0, 0)
+                new_doc = {}
+                for key, value in query.items():
+                    if not isinstance(value, dict):
+                        _set_path(new_doc, key, value)
+                for key, value in update.get('$set', {}).items():
+                    _set_path(new_doc, key, value)
+                doc, dates = self._encode(new_doc)
+                cursor = conn.execute(
+                    f"INSERT INTO {self.name} (doc, dates) VALUES (?, ?)", (doc, dates)
+                )
+                conn.execute("COMMIT")
+                return UpdateResult(0, 0, upserted_id=str(cursor.lastrowid))
+            
+            current = self._decode(row)
+            updated = copy.deepcopy(current)
+            for key, value in update.get('$set', {}).items():
+                _set_path(updated, key, value)
+            for key in update.get('$unset', {}):
+                _unset_path(updated, key)
+            
+            if updated == current:
+                conn.execute("COMMIT")
+                return UpdateResult(1, 0)
+            
+            doc, dates = self._encode(updated)
+            conn.execute(
+                f"UPDATE {self.name} SET doc = ?, dates = ? WHERE id = ?",
+                (doc, dates, row[0])
+            )
+            conn.execute("COMMIT")
+            return UpdateResult(1, 1)
+        
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    
+    def delete_one(self, query: dict):
+        """Delete the first matching document"""
+        where, params = self._build_where(query)
+        cursor = self._conn().execute(
+            f"DELETE FROM {self.name} WHERE id IN "
+            f"(SELECT id FROM {self.name}{where} LIMIT 1)", params
+        )
+        return DeleteResult(cursor.rowcount)
+    
+    def delete_many(self, query: dict):
+        """Delete all matching documents"""
+        where, params = self._build_where(query)
+        cursor = self._conn().execute(f"DELETE FROM {self.name}{where}", params)
+        return DeleteResult(cursor.rowcount)
+
+
+class SQLiteDatabase:
+    """SQLite database file exposing collections by name"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._collections = {}
+    
+    def connection(self):
+        """Return this thread's connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, isolation_level=None, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+    
+    def command(self, name: str):
+        """Support the 'ping' health check used by Database.connect"""
+        if name != 'ping':
+            raise ValueError(f"Unsupported command: {name}")
+        self.connection().execute("SELECT 1")
+        return {'ok': 1.0}
+    
+    def __getitem__(self, name: str) -> SQLiteCollection:
+        if name not in self._collections:
+            self._collections[name] = SQLiteCollection(self, name)
+        return self._collections[name]
+    
+    def close(self):
+        """Close this thread's connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+            logger.debug(f"Closed SQLite connection: {self.path}")
@@ -0,0 +1,218 @@
+"""
+Parallel parameter sweeps for the strategy backtesters
+
+Splits a parameter grid into chunks and runs them on a process pool
+across all cores. The price history is copied into shared memory once;
+workers map it as NumPy arrays instead of receiving a pickled copy with
+every task, so only the small parameter chunks and result columns cross
+process boundaries. Results are ranked and written as a CSV table.
+
+Usage:
+    python sweep.py grid BTCUSDT-1m.csv --lower 55000:62000:15 --upper 66000:75000:15 \
+        --grids 5:200:40 --quantity 0.01 --output grid_sweep.csv
+    python sweep.py twap BTCUSDT-1m.csv --side BUY --num-orders 2:30:15 \
+        --interval 10:900:20 --start-every 3600
+    python sweep.py oco BTCUSDT-1m.csv --side BUY --take-profit 0.2:5:25 \
+        --stop-loss 0.2:5:25 --max-hold 86400
+"""
+import argparse
+import csv
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from logger import logger
+from backtest import (PriceHistory, GridBacktester, TWAPBacktester, OCOBacktester,
+                      grid_combinations, parameter_grid, rank, parse_range)
+
+# Backtester and default ranking for each strategy
+STRATEGIES = {
+    'grid': {'backtester': GridBacktester, 'sort': 'pnl', 'descending': True},
+    'twap': {'backtester': TWAPBacktester, 'sort': 'mean_shortfall_bps', 'descending': False},
+    'oco': {'backtester': OCOBacktester, 'sort': 'mean_return_bps', 'descending': True},
+}
+
+
+class SharedPriceHistory:
+    """A PriceHistory copied into shared memory for worker processes"""
+    
+    def __init__(self, history: PriceHistory):
+        self._blocks = []
+        self.spec = {
+            'source': history.source,
+            'timestamps': self._share(history.timestamps),
+            'prices': self._share(history.prices),
+        }
+    
+    def _share(self, array: np.ndarray) -> tuple:
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, array.dtype, buffer=block.buf)[:] = array
+        self._blocks.append(block)
+        return block.name, array.shape, array.dtype.str
+    
+    @staticmethod
+    def attach(spec: dict):
+        """
+        Map a shared history in a worker (zero-copy)
+        
+        Returns:
+            (PriceHistory, blocks) - keep the blocks referenced while the
+            arrays are in use
+        """
+        blocks, arrays = [], []
+        for name, shape, dtype in (spec['timestamps'], spec['prices']):
+            # Workers share the parent's resource tracker, so the parent's
+            # unlink in close() is the only cleanup needed
+            block = shared_memory.SharedMemory(name=name)
+            blocks.append(block)
+            arrays.append(np.ndarray(shape, np.dtype(dtype), buffer=block.buf))
+        return PriceHistory(arrays[0], arrays[1], spec['source']), blocks
+    
+    def close(self):
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Per-worker state, set up once by _init_worker
+_worker = {}
+
+
+def _init_worker(spec: dict, strategy: str, options: dict):
+    history, blocks = SharedPriceHistory.attach(spec)
+    _worker['blocks'] = blocks
+    _worker['backtester'] = STRATEGIES[strategy]['backtester'](history, **options)
+
+
+def _run_chunk(combos: dict) -> dict:
+    return _worker['backtester'].sweep(combos)
+
+
+def run_sweep(strategy: str, history: PriceHistory, combos: dict, options: dict = None,
+              workers: int = None, chunks_per_worker: int = 4) -> dict:
+    """
+    Backtest every parameter combination in parallel
+    
+    Args:
+        strategy: 'grid', 'twap' or 'oco'
+        history: Price history to replay
+        combos: Parameter columns (see grid_combinations / parameter_grid)
+        options: Keyword arguments for the strategy's backtester
+        workers: Worker processes (default: all cores)
+        chunks_per_worker: Tasks per worker, for load balancing
+    
+    Returns:
+        Result columns for all combinations, in the order given
+    """
+    options = options or {}
+    workers = workers or os.cpu_count() or 1
+    count = len(next(iter(combos.values())))
+    bounds = np.linspace(0, count, min(count, workers * chunks_per_worker) + 1).astype(int)
+    chunks = [{key: value[a:b] for key, value in combos.items()} for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+    
+    with SharedPriceHistory(history) as shared:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(shared.spec, strategy, options)) as pool:
+            results = list(pool.map(_run_chunk, chunks))
+    
+    return {key: np.concatenate([r[key] for r in results]) for key in results[0]} if results else {}
+
+
+def write_table(rows: list, path: str):
+    """Write ranked result rows to CSV"""
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=['rank'] + list(rows[0]) if rows else ['rank'])
+        writer.writeheader()
+        for position, row in enumerate(rows, 1):
+            writer.writerow({'rank': position, **row})
+
+
+def _format(value) -> str:
+    return f'{value:>14.6g}' if isinstance(value, float) else f'{value!s:>14}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parallel parameter sweep for strategy backtests')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: all cores)')
+    parser.add_argument('--sort', help='Metric to rank by (default depends on the strategy)')
+    parser.add_argument('--ascending', action='store_true', help='Rank lowest first')
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--output', help='Write the ranked table to this CSV file')
+    strategies = parser.add_subparsers(dest='strategy', required=True)
+    
+    grid = strategies.add_parser('grid', help='GridBot bounds and levels')
+    grid.add_argument('--lower', nargs='+', required=True, help="Lower bound(s); 'start:stop:count' for a range")
+    grid.add_argument('--upper', nargs='+', required=True)
+    grid.add_argument('--grids', nargs='+', required=True)
+    grid.add_argument('--quantity', type=float, required=True, help='Quantity per grid order')
+    grid.add_argument('--maker-fee', type=float, default=0.0002)
+    grid.add_argument('--spacing', default='arithmetic', choices=['arithmetic', 'geometric'])
+    
+    twap = strategies.add_parser('twap', help='TWAPBot order count and interval')
+    twap.add_argument('--side', default='BUY', choices=['BUY', 'SELL'])
+    twap.add_argument('--num-orders', nargs='+', required=True)
+    twap.add_argument('--interval', nargs='+', required=True, help='Seconds between orders')
+    twap.add_argument('--quantity', type=float, default=1.0, help='Total quantity')
+    twap.add_argument('--start-every', type=float, default=3600, help='Seconds between simulated executions')
+    twap.add_argument('--taker-fee', type=float, default=0.0004)
+    
+    oco = strategies.add_parser('oco', help='OCOBot take-profit / stop-loss distances')
+    oco.add_argument('--side', default='BUY', choices=['BUY', 'SELL'], help='Side of the position being protected')
+    oco.add_argument('--take-profit', nargs='+', required=True, help='Distance from entry, percent')
+    oco.add_argument('--stop-loss', nargs='+', required=True, help='Distance from entry, percent')
+    oco.add_argument('--max-hold', type=float, default=86400, help='Close at market after this many seconds')
+    oco.add_argument('--start-every', type=float, default=3600, help='Seconds between simulated entries')
+    oco.add_argument('--taker-fee', type=float, default=0.0004)
+    oco.add_argument('--maker-fee', type=float, default=0.0002)
+    
+    for sub in (grid, twap, oco):
+        sub.add_argument('path', help='Klines or trades CSV/Parquet file, or store:SYMBOL:INTERVAL:FIRST_DAY:LAST_DAY')
+    args = parser.parse_args()
+    
+    if args.strategy == 'grid':
+        combos = grid_combinations(parse_range(args.lower, np.float64), parse_range(args.upper, np.float64),
+                                   parse_range(args.grids, np.int64), args.quantity)
+        options = {'maker_fee': args.maker_fee, 'spacing': args.spacing}
+    elif args.strategy == 'twap':
+        combos = parameter_grid(num_orders=parse_range(args.num_orders, np.int64),
+                                interval_seconds=parse_range(args.interval, np.float64))
+        combos['total_quantity'] = np.full(len(combos['num_orders']), args.quantity)
+        options = {'side': args.side, 'taker_fee': args.taker_fee, 'start_every': args.start_every}
+    else:
+        combos = parameter_grid(take_profit_pct=parse_range(args.take_profit, np.float64),
+                                stop_loss_pct=parse_range(args.stop_loss, np.float64))
+        options = {'side': args.side, 'taker_fee': args.taker_fee, 'maker_fee': args.maker_fee,
+                   'start_every': args.start_every, 'max_hold_seconds': args.max_hold}
+    
+    history = PriceHistory.load(args.path)
+    strategy = STRATEGIES[args.strategy]
+    
+    started = time.perf_counter()
+    results = run_sweep(args.strategy, history, combos, options, workers=args.workers)
+    elapsed = time.perf_counter() - started
+    logger.info("Swept %d %s combinations over %d prices in %.2fs",
+                len(next(iter(combos.values()))), args.strategy, len(history), elapsed)
+    
+    sort = args.sort or strategy['sort']
+    rows = rank(results, sort, descending=strategy['descending'] and not args.ascending)
+    if rows:
+        columns = list(rows[0])
+        print(' '.join(f'{c:>14}' for c in ['rank'] + columns))
+        for position, row in enumerate(rows[:args.top], 1):
+            print(' '.join([f'{position:>14}'] + [_format(row[c]) for c in columns]))
+    
+    if args.output:
+        write_table(rows, args.output)
+        print(f"Wrote {len(rows)} rows to {os.path.abspath(args.output)}")
+
+
+if __name__ == '__main__':
+    main()
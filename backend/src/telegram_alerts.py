@@ -1,46 +1,48 @@
 """
 Telegram Alert System
 """
-import requests
+from datetime import datetime
 from logger import logger
 from config import Config
+from database import db
+from cache import TTLCache, user_cache
+from telegram_dispatcher import telegram_dispatcher
+from tracing import tracer
 
 class TelegramAlerts:
     """Send trading alerts via Telegram"""
     
-    def __init__(self, bot_token=None, chat_id=None):
-        self.bot_token = bot_token or Config.TELEGRAM_BOT_TOKEN
-        self.chat_id = chat_id or Config.TELEGRAM_CHAT_ID
+    def __init__(self, bot_token=None, chat_id=None, dispatcher=None, use_defaults=True):
+        if use_defaults:
+            bot_token = bot_token or Config.TELEGRAM_BOT_TOKEN
+            chat_id = chat_id or Config.TELEGRAM_CHAT_ID
+        self.bot_token = bot_token
+        self.chat_id = chat_id
         self.enabled = bool(self.bot_token and self.chat_id)
+        self.dispatcher = dispatcher or telegram_dispatcher
         
-        if not self.enabled:
+        if not self.enabled and use_defaults:
             logger.warning("Telegram alerts disabled - no credentials provided")
     
-    def send_message(self, message):
-        """Send message to Telegram"""
-        if not self.enabled:
-            return False
+    def send_message(self, message, wait=False):
+        """
+        Send message to Telegram
         
-        try:
-            url = f"https://api.telegram.org/bot{self.bot_token}/sendMessage"
-            data = {
-                'chat_id': self.chat_id,
-                'text': message,
-                'parse_mode': 'HTML'
-            }
-            
-            response = requests.post(url, data=data, timeout=5)
+        Args:
+            message: HTML-formatted message text
+            wait: Send synchronously instead of queueing for the
+                  background dispatcher
             
-            if response.status_code == 200:
-                logger.info("Telegram alert sent successfully")
-                return True
-            else:
-                logger.error(f"Telegram alert failed: {response.text}")
-                return False
-                
-        except Exception as e:
-            logger.error(f"Error sending Telegram alert: {e}")
+        Returns:
+            True if the message was sent (wait=True) or queued
+        """
+        if not self.enabled:
             return False
+        
+        with tracer.span('telegram.send' if wait else 'telegram.enqueue'):
+            if wait:
+                return self.dispatcher.send_now(self.bot_token, self.chat_id, message)
+            return self.dispatcher.submit(self.bot_token, self.chat_id, message)
     
     def alert_order_executed(self, order_type, symbol, side, quantity, price=None):
         """Alert when order is executed"""
@@ -110,5 +112,69 @@ Please check the logs for details.
 """
         return self.send_message(message)
 
-# Global instance
+class TelegramRouter:
+    """
+    Routes alerts to each user's own Telegram chat
+    
+    Destinations are stored on the user document ('telegram' field) and
+    cached in memory per worker. The bot token is only read here: user
+    profiles report just whether one is set. All users share the global dispatcher,
+    so sends go through one connection pool and rate limiter.
+    """
+    
+    def __init__(self, ttl_seconds: int = 300, max_entries: int = 10000):
+        self._cache = TTLCache(maxsize=max_entries, ttl=ttl_seconds, name='telegram_destination')
+        self._disabled = TelegramAlerts(use_defaults=False)
+    
+    def for_user(self, email: str) -> TelegramAlerts:
+        """Get the alert sender for a user (disabled if not configured)"""
+        alerts = self._cache.get(email)
+        if alerts is not None:
+            return alerts
+        
+        alerts = self._disabled
+        try:
+            user = db.users.find_one({'email': email}, {'telegram': 1})
+            destination = (user or {}).get('telegram') or {}
+            if destination.get('enabled', True) and destination.get('bot_token') and destination.get('chat_id'):
+                alerts = TelegramAlerts(
+                    destination['bot_token'],
+                    destination['chat_id'],
+                    use_defaults=False
+                )
+        except Exception as e:
+            logger.error(f"Error loading Telegram destination for {email}: {e}")
+            return self._disabled
+        
+        self._cache.set(email, alerts)
+        return alerts
+    
+    def configure(self, email: str, bot_token: str, chat_id: str):
+        """Store a user's Telegram destination"""
+        try:
+            if not bot_token or not chat_id:
+                return {'success': False, 'message': 'Invalid credentials'}
+            
+            db.users.update_one(
+                {'email': email},
+                {'$set': {
+                    'telegram': {'bot_token': bot_token, 'chat_id': str(chat_id), 'enabled': True},
+                    'updated_at': datetime.utcnow()
+                }}
+            )
+            self.invalidate(email)
+            logger.info(f"Telegram destination updated: {email}")
+            return {'success': True, 'message': 'Telegram configured!'}
+        
+        except Exception as e:
+            logger.error(f"Telegram config error: {e}")
+            return {'success': False, 'message': str(e)}
+    
+    def invalidate(self, email: str):
+        """Drop a cached destination"""
+        self._cache.invalidate(email)
+        user_cache.invalidate(email)
+
+# Global instances
 telegram_alerts = TelegramAlerts()
+telegram_router = TelegramRouter()
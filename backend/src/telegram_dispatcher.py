@@ -0,0 +1,262 @@
+"""
+Background Telegram message dispatcher
+
+Alerts are queued and delivered by a worker thread so order routes never
+wait on the Telegram API. The worker:
+- reuses pooled HTTPS connections through one requests.Session
+- rate limits per chat and globally (Telegram allows ~1 msg/s per chat
+  and ~30 msg/s per bot)
+- coalesces messages that pile up for the same chat into one digest
+- retries failed sends with exponential backoff, honouring retry_after
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+from collections import deque
+import requests
+from requests.adapters import HTTPAdapter
+from logger import logger
+from metrics import telegram_send_seconds
+
+
+class TelegramDispatcher:
+    """Queue-backed, rate-limited Telegram sender"""
+    
+    API_URL = "https://api.telegram.org/bot{token}/sendMessage"
+    MAX_MESSAGE_LENGTH = 4096
+    DIGEST_SEPARATOR = "\n➖➖➖➖➖\n"
+    
+    def __init__(self, global_rate: float = 25.0, per_chat_interval: float = 1.0,
+                 max_retries: int = 4, backoff_base: float = 1.0,
+                 max_queue: int = 10000, request_timeout: float = 5.0):
+        """
+        Initialize the dispatcher
+        
+        Args:
+            global_rate: Max messages per second across all chats
+            per_chat_interval: Minimum seconds between messages to one chat
+            max_retries: Attempts per message before it is dropped
+            backoff_base: Initial retry delay in seconds (doubles each attempt)
+            max_queue: Max queued alerts before new ones are rejected
+            request_timeout: HTTP timeout for each send
+        """
+        self.global_interval = 1.0 / global_rate
+        self.per_chat_interval = per_chat_interval
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.request_timeout = request_timeout
+        
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.session = self._create_session()
+        
+        # (bot_token, chat_id) -> deque of pending texts
+        self.pending = {}
+        # (bot_token, chat_id) -> earliest time the next send is allowed
+        self.next_send = {}
+        # (bot_token, chat_id) -> failed attempts for the message at the head
+        self.attempts = {}
+        self.next_global_send = 0.0
+        
+        self.stats = {'sent': 0, 'failed': 0, 'dropped': 0, 'coalesced': 0}
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+    
+    @staticmethod
+    def _create_session() -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+        session.mount('https://', adapter)
+        return session
+    
+    def _ensure_started(self):
+        """Start the worker thread (again, if we are in a forked child)"""
+        if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        
+        with self._lock:
+            if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            
+            if self._pid is not None and self._pid != os.getpid():
+                # Forked: the parent's thread and sockets don't exist here
+                self.session = self._create_session()
+                self.queue = queue.Queue(maxsize=self.queue.maxsize)
+                self.pending.clear()
+                self.next_send.clear()
+                self.attempts.clear()
+            
+            self._stopping.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='telegram-dispatcher', daemon=True)
+            self._thread.start()
+    
+    def submit(self, bot_token: str, chat_id: str, text: str) -> bool:
+        """Queue a message for background delivery"""
+        self._ensure_started()
+        try:
+            self.queue.put_nowait((bot_token, str(chat_id), text))
+            return True
+        except queue.Full:
+            self.stats['dropped'] += 1
+            logger.warning("Telegram queue full - alert dropped")
+            return False
+    
+    def send_now(self, bot_token: str, chat_id: str, text: str) -> bool:
+        """Send a message synchronously (bypasses the queue and coalescing)"""
+        for attempt in range(self.max_retries):
+            ok, retry_after = self._post(bot_token, str(chat_id), text)
+            if ok:
+                return True
+            if retry_after is None:
+                return False
+            time.sleep(retry_after)
+        return False
+    
+    def queue_depth(self) -> int:
+        """Alerts waiting to be sent"""
+        return self.queue.qsize() + sum(len(p) for p in self.pending.values())
+    
+    # ------------------------------------------------------------------
+    # Worker
+    # ------------------------------------------------------------------
+    
+    def _run(self):
+        while not (self._stopping.is_set() and self.queue.empty() and not self.pending):
+            self._drain_queue(timeout=self._next_wakeup())
+            
+            now = time.monotonic()
+            for key in list(self.pending):
+                if now < self.next_send.get(key, 0.0) or now < self.next_global_send:
+                    continue
+                self._send_pending(key)
+                now = time.monotonic()
+    
+    def _next_wakeup(self) -> float:
+        """Seconds until some pending chat may send again"""
+        if not self.pending:
+            return 0.5
+        now = time.monotonic()
+        earliest = min(self.next_send.get(key, 0.0) for key in self.pending)
+        return min(0.5, max(0.0, max(earliest, self.next_global_send) - now))
+    
+    def _drain_queue(self, timeout: float):
+        """Move queued messages into the per-chat pending buffers"""
+        try:
+            item = self.queue.get(timeout=timeout) if timeout > 0 else self.queue.get_nowait()
+        except queue.Empty:
+            return
+        
+        while True:
+            bot_token, chat_id, text = item
+            self.pending.setdefault((bot_token, chat_id), deque()).append(text)
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                return
+    
+    def _build_digest(self, messages: deque):
+        """Join as many queued messages as fit into one Telegram message"""
+        parts = [messages[0]]
+        length = len(messages[0])
+        for text in list(messages)[1:]:
+            extra = len(self.DIGEST_SEPARATOR) + len(text)
+            if length + extra > self.MAX_MESSAGE_LENGTH - 64:
+                break
+            parts.append(text)
+            length += extra
+        
+        if len(parts) == 1:
+            return parts[0][:self.MAX_MESSAGE_LENGTH], 1
+        
+        header = f"📦 <b>{len(parts)} alerts</b>\n"
+        return header + self.DIGEST_SEPARATOR.join(parts), len(parts)
+    
+    def _send_pending(self, key):
+        bot_token, chat_id = key
+        messages = self.pending[key]
+        text, count = self._build_digest(messages)
+        
+        ok, retry_after = self._post(bot_token, chat_id, text)
+        now = time.monotonic()
+        self.next_global_send = now + self.global_interval
+        
+        if ok:
+            for _ in range(count):
+                messages.popleft()
+            self.stats['sent'] += 1
+            self.stats['coalesced'] += count - 1
+            self.attempts.pop(key, None)
+            self.next_send[key] = now + self.per_chat_interval
+        else:
+            attempts = self.attempts.get(key, 0) + 1
+            if retry_after is None or attempts >= self.max_retries:
+                for _ in range(count):
+                    messages.popleft()
+                self.stats['failed'] += count
+                self.attempts.pop(key, None)
+                self.next_send[key] = now + self.per_chat_interval
+                logger.error(f"Telegram alert dropped after {attempts} attempt(s) (chat {chat_id})")
+            else:
+                self.attempts[key] = attempts
+                delay = max(retry_after, self.backoff_base * (2 ** (attempts - 1)))
+                self.next_send[key] = now + delay
+                logger.warning(f"Telegram send failed, retrying in {delay:.1f}s (chat {chat_id})")
+        
+        if not messages:
+            del self.pending[key]
+    
+    def _post(self, bot_token: str, chat_id: str, text: str):
+        """
+        Send one message
+        
+        Returns:
+            (success, retry_after) - retry_after is None when the error
+            is permanent and the message should not be retried
+        """
+        started = time.perf_counter()
+        try:
+            response = self.session.post(
+                self.API_URL.format(token=bot_token),
+                data={'chat_id': chat_id, 'text': text, 'parse_mode': 'HTML'},
+                timeout=self.request_timeout
+            )
+            telegram_send_seconds.observe(time.perf_counter() - started, str(response.status_code))
+            
+            if response.status_code == 200:
+                logger.debug("Telegram alert sent successfully")
+                return True, None
+            
+            if response.status_code == 429:
+                try:
+                    retry_after = response.json().get('parameters', {}).get('retry_after', 1)
+                except ValueError:
+                    retry_after = 1
+                return False, float(retry_after)
+            
+            if response.status_code >= 500:
+                return False, 0.0
+            
+            logger.error(f"Telegram alert failed: {response.text}")
+            return False, None
+        
+        except requests.exceptions.RequestException as e:
+            telegram_send_seconds.observe(time.perf_counter() - started, 'error')
+            # The request URL (and so the error text) contains the bot token
+            logger.warning(f"Error sending Telegram alert: {str(e).replace(bot_token, '<bot token>')}")
+            return False, 0.0
+    
+    def stop(self, timeout: float = 5.0):
+        """Flush pending alerts and stop the worker"""
+        if not self._thread or self._pid != os.getpid():
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+
+
+# Global dispatcher shared by all alert senders
+telegram_dispatcher = TelegramDispatcher()
+atexit.register(telegram_dispatcher.stop)
@@ -0,0 +1,369 @@
+"""
+Opt-in request tracing
+
+Spans cover each stage of an order: the Flask route, JWT verification,
+session lookup, the Binance connection handshake, exchange calls,
+database commands and alert queueing. Spans nest through a context
+variable, so anything called inside a span becomes its child.
+
+TRACING_EXPORTER selects where finished spans go:
+- none (default): tracing is off and span() costs one attribute check
+- memory: keep the last TRACING_BUFFER_SIZE spans in process
+  (see tracer.finished_spans())
+- file: append one JSON line per span to TRACING_FILE
+- otel: hand spans to the OpenTelemetry SDK if it is installed and
+  configured (e.g. with an OTLP exporter). Request spans come from
+  opentelemetry-instrumentation-flask when it is installed, otherwise
+  from this module's own before/after request hooks
+
+Span records use OpenTelemetry field names and W3C ids (32/16 hex
+digits), and an incoming 'traceparent' header continues the caller's
+trace.
+"""
+import json
+import os
+import secrets
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logger import logger
+
+try:
+    from opentelemetry import context as otel_context, propagate as otel_propagate, trace as otel_trace
+except ImportError:  # pragma: no cover - optional dependency
+    otel_context = otel_propagate = otel_trace = None
+
+_current_span = ContextVar('current_span', default=None)
+
+
+class Span:
+    """A timed operation within a trace"""
+    
+    def __init__(self, name: str, trace_id: str, parent_id: str = None, attributes: dict = None,
+                 start_ns: int = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.events = []
+        self.status = 'UNSET'
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns = None
+    
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+    
+    def set_attributes(self, attributes: dict):
+        self.attributes.update(attributes)
+    
+    def record_exception(self, exc: Exception):
+        self.status = 'ERROR'
+        self.events.append({
+            'name': 'exception',
+            'timestamp': time.time_ns(),
+            'attributes': {'exception.type': type(exc).__name__, 'exception.message': str(exc)},
+        })
+    
+    def end(self, end_ns: int = None):
+        self.end_ns = end_ns or time.time_ns()
+    
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+    
+    def to_dict(self) -> dict:
+        return {
+            'name': self.name,
+            'context': {'trace_id': self.trace_id, 'span_id': self.span_id},
+            'parent_id': self.parent_id,
+            'start_time': self.start_ns,
+            'end_time': self.end_ns,
+            'duration_ms': round(self.duration_ms, 3),
+            'status': self.status,
+            'attributes': self.attributes,
+            'events': self.events,
+        }
+
+
+class _NoopSpan:
+    """Stand-in returned when tracing is off"""
+    
+    def set_attribute(self, key, value):
+        pass
+    
+    def set_attributes(self, attributes):
+        pass
+    
+    def record_exception(self, exc):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class MemoryExporter:
+    """Keeps the most recent spans in a ring buffer"""
+    
+    def __init__(self, maxlen: int = 10000):
+        self.spans = deque(maxlen=maxlen)
+    
+    def export(self, span: Span):
+        self.spans.append(span)
+
+
+class FileExporter:
+    """Appends spans to a file as JSON lines"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+    
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str) + '\n'
+        with self._lock:
+            with open(self.path, 'a') as f:
+                f.write(line)
+
+
+class Tracer:
+    """Creates spans and forwards finished ones to the configured exporter"""
+    
+    def __init__(self, exporter: str = None):
+        self.configure(exporter or os.getenv('TRACING_EXPORTER', 'none'))
+    
+    def configure(self, exporter: str):
+        """Switch exporter ('none', 'memory', 'file' or 'otel')"""
+        self.exporter_name = exporter.lower()
+        self.exporter = None
+        self._otel = None
+        
+        if self.exporter_name == 'memory':
+            self.exporter = MemoryExporter(int(os.getenv('TRACING_BUFFER_SIZE', 10000)))
+        elif self.exporter_name == 'file':
+            self.exporter = FileExporter(os.getenv('TRACING_FILE', 'traces.jsonl'))
+        elif self.exporter_name == 'otel':
+            if otel_trace is None:
+                logger.warning("TRACING_EXPORTER=otel but opentelemetry is not installed - tracing disabled")
+                self.exporter_name = 'none'
+            else:
+                self._otel = otel_trace.get_tracer('binance-trading-bot')
+        elif self.exporter_name != 'none':
+            logger.warning(f"Unknown TRACING_EXPORTER '{exporter}' - tracing disabled")
+            self.exporter_name = 'none'
+        
+        self.enabled = self.exporter_name != 'none'
+    
+    # ------------------------------------------------------------------
+    # Span API
+    # ------------------------------------------------------------------
+    
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """Run a block inside a child span of the current one"""
+        if not self.enabled:
+            yield NOOP_SPAN
+            return
+        
+        if self._otel is not None:
+            with self._otel.start_as_current_span(name, attributes=attributes) as span:
+                yield span
+            return
+        
+        span = self.start_span(name, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.record_exception(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            self.end_span(span)
+    
+    def start_span(self, name: str, attributes: dict = None, traceparent: str = None) -> Span:
+        """Start a span without making it current (see activate())"""
+        parent = _current_span.get()
+        trace_id, parent_id = None, None
+        if parent is not None:
+            trace_id, parent_id = parent.trace_id, parent.span_id
+        elif traceparent:
+            trace_id, parent_id = self.parse_traceparent(traceparent)
+        return Span(name, trace_id or secrets.token_hex(16), parent_id, attributes)
+    
+    def end_span(self, span: Span):
+        span.end()
+        try:
+            self.exporter.export(span)
+        except Exception as e:
+            logger.error(f"Span export error: {e}")
+    
+    def activate(self, span: Span):
+        """Make span current; returns a token for deactivate()"""
+        return _current_span.set(span)
+    
+    def deactivate(self, token):
+        _current_span.reset(token)
+    
+    def record(self, name: str, duration_s: float, **attributes):
+        """Add an already finished operation (e.g. from a driver event) as a child span"""
+        if not self.enabled:
+            return
+        end_ns = time.time_ns()
+        start_ns = end_ns - int(duration_s * 1e9)
+        
+        if self._otel is not None:
+            self._otel.start_span(name, attributes=attributes, start_time=start_ns).end(end_time=end_ns)
+            return
+        
+        parent = _current_span.get()
+        if parent is None:
+            return
+        span = Span(name, parent.trace_id, parent.span_id, attributes, start_ns=start_ns)
+        span.end_ns = end_ns
+        try:
+            self.exporter.export(span)
+        except Exception as e:
+            logger.error(f"Span export error: {e}")
+    
+    def current_span(self):
+        """The active span (a no-op stand-in when there is none)"""
+        if not self.enabled:
+            return NOOP_SPAN
+        if self._otel is not None:
+            return otel_trace.get_current_span()
+        return _current_span.get() or NOOP_SPAN
+    
+    def annotate(self, **attributes):
+        """Set attributes on the active span"""
+        if self.enabled:
+            self.current_span().set_attributes(attributes)
+    
+    def finished_spans(self, trace_id: str = None) -> list:
+        """Spans held by the memory exporter, optionally for one trace"""
+        if not isinstance(self.exporter, MemoryExporter):
+            return []
+        spans = list(self.exporter.spans)
+        if trace_id:
+            spans = [s for s in spans if s.trace_id == trace_id]
+        return spans
+    
+    @staticmethod
+    def parse_traceparent(header: str):
+        """Return (trace_id, parent span_id) from a W3C traceparent header"""
+        parts = header.strip().split('-')
+        if len(parts) == 4 and len(parts[1]) == 32 and len(parts[2]) == 16:
+            return parts[1], parts[2]
+        return None, None
+    
+    # ------------------------------------------------------------------
+    # Flask integration
+    # ------------------------------------------------------------------
+    
+    def _verify_jwt(self):
+        from flask import request
+        from flask_jwt_extended import verify_jwt_in_request
+        
+        if 'Authorization' in request.headers:
+            with self.span('jwt.verify'):
+                try:
+                    verify_jwt_in_request(optional=True)
+                except Exception:
+                    # jwt_required on the route reports the error
+                    pass
+    
+    def init_app(self, app):
+        """Open a root span per request (and a JWT verification span)"""
+        if not self.enabled:
+            return app
+        if self._otel is not None:
+            return self._init_otel_app(app)
+        
+        from flask import g, request
+        
+        @app.before_request
+        def _start_trace():
+            span = self.start_span(f"{request.method} {request.path}", {
+                'http.method': request.method,
+                'http.route': request.url_rule.rule if request.url_rule else request.path,
+            }, traceparent=request.headers.get('traceparent'))
+            g._trace_span = span
+            g._trace_token = self.activate(span)
+            self._verify_jwt()
+        
+        @app.after_request
+        def _tag_response(response):
+            span = g.get('_trace_span')
+            if span is not None:
+                span.set_attribute('http.status_code', response.status_code)
+                response.headers['traceparent'] = f"00-{span.trace_id}-{span.span_id}-01"
+            return response
+        
+        @app.teardown_request
+        def _end_trace(exc):
+            span = g.pop('_trace_span', None)
+            token = g.pop('_trace_token', None)
+            if span is None:
+                return
+            if exc is not None:
+                span.record_exception(exc)
+            if token is not None:
+                self.deactivate(token)
+            self.end_span(span)
+        
+        return app
+    
+    def _init_otel_app(self, app):
+        """Request spans for the otel exporter"""
+        try:
+            from opentelemetry.instrumentation.flask import FlaskInstrumentor
+            FlaskInstrumentor().instrument_app(app)
+            return app
+        except ImportError:
+            pass
+        
+        from flask import g, request
+        
+        @app.before_request
+        def _start_otel_trace():
+            span = self._otel.start_span(
+                f"{request.method} {request.path}",
+                context=otel_propagate.extract(request.headers),
+                kind=otel_trace.SpanKind.SERVER,
+                attributes={
+                    'http.method': request.method,
+                    'http.route': request.url_rule.rule if request.url_rule else request.path,
+                }
+            )
+            g._otel_span = span
+            g._otel_token = otel_context.attach(otel_trace.set_span_in_context(span))
+            self._verify_jwt()
+        
+        @app.after_request
+        def _tag_otel_response(response):
+            span = g.get('_otel_span')
+            if span is not None:
+                span.set_attribute('http.status_code', response.status_code)
+                otel_propagate.inject(response.headers)
+            return response
+        
+        @app.teardown_request
+        def _end_otel_trace(exc):
+            span = g.pop('_otel_span', None)
+            token = g.pop('_otel_token', None)
+            if span is None:
+                return
+            if exc is not None:
+                span.record_exception(exc)
+                span.set_status(otel_trace.Status(otel_trace.StatusCode.ERROR))
+            if token is not None:
+                otel_context.detach(token)
+            span.end()
+        
+        return app
+
+
+# Global tracer
+tracer = Tracer()
@@ -24,7 +24,7 @@ class Validator:
         if len(symbol) < 6:
             return False, "Invalid symbol format"
         
-        logger.debug(f"Symbol validated: {symbol}")
+        logger.debug("Symbol validated: %s", symbol)
         return True, symbol
     
     @staticmethod
@@ -34,7 +34,7 @@ class Validator:
             qty = float(quantity)
             if qty <= 0:
                 return False, None
-            logger.debug(f"Quantity validated: {qty}")
+            logger.debug("Quantity validated: %s", qty)
             return True, qty
         except ValueError:
             return False, None
@@ -46,7 +46,7 @@ class Validator:
             p = float(price)
             if p <= 0:
                 return False, None
-            logger.debug(f"Price validated: {p}")
+            logger.debug("Price validated: %s", p)
             return True, p
         except ValueError:
             return False, None
@@ -57,7 +57,7 @@ class Validator:
         side = side.upper().strip()
         if side not in Validator.VALID_SIDES:
             return False, None
-        logger.debug(f"Side validated: {side}")
+        logger.debug("Side validated: %s", side)
         return True, side
     
     @staticmethod
@@ -67,11 +67,23 @@ class Validator:
             pct = float(percentage)
             if pct <= 0 or pct > 100:
                 return False, None
-            logger.debug(f"Percentage validated: {pct}")
+            logger.debug("Percentage validated: %s", pct)
             return True, pct
         except ValueError:
             return False, None
     
+    @staticmethod
+    def validate_callback_rate(rate: str) -> Tuple[bool, Optional[float]]:
+        """Validate trailing-stop callback rate (0.1 - 10 percent)"""
+        try:
+            r = float(rate)
+            if r < 0.1 or r > 10:
+                return False, None
+            logger.debug("Callback rate validated: %s", r)
+            return True, r
+        except ValueError:
+            return False, None
+    
     @staticmethod
     def validate_integer(value: str, min_val: int = 1) -> Tuple[bool, Optional[int]]:
         """Validate integer value"""
@@ -79,7 +91,7 @@ class Validator:
             val = int(value)
             if val < min_val:
                 return False, None
-            logger.debug(f"Integer validated: {val}")
+            logger.debug("Integer validated: %s", val)
             return True, val
         except ValueError:
             return False, None
@@ -2,32 +2,46 @@
 Flask API with MongoDB authentication, JWT, and trading features
 """
 import os
+import re
 from datetime import datetime, timedelta
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager, jwt_required, get_jwt_identity
+from werkzeug.middleware.proxy_fix import ProxyFix
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
 # Import our modules
-from config import Config
 from logger import logger
 from database import db
 from auth import init_auth_service, auth_service
+from bot_sessions import bot_sessions
 from email_service import email_service
 from market_orders import MarketOrderBot
 from limit_orders import LimitOrderBot
 from advanced.stop_limit import StopLimitBot
 from advanced.oco import OCOBot
 from advanced.twap import TWAPBot
-from advanced.grid import GridBot
+from advanced.trailing_stop import TrailingStopBot
+from advanced.bracket import BracketBot
+from advanced.grid import GridBot, grid_engine
+from advanced.stop_emulator import stop_emulator
 from order_history import order_history
-from telegram_alerts import telegram_alerts
+from telegram_alerts import telegram_router
+from price_alerts import price_alert_engine
+from json_provider import init_json
+from compression import compression
+from metrics import metrics
+from tracing import tracer
+from cache import TTLCache
+from telegram_dispatcher import telegram_dispatcher
+from exchange import public_price_url, simulated_price, use_simulator
 
 # Initialize Flask app
 app = Flask(__name__)
+init_json(app)
 
 # Configuration
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-change-in-production')
@@ -35,54 +49,64 @@ app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'jwt-secret-change-in
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
 app.config['JWT_REFRESH_TOKEN_EXPIRES'] = timedelta(days=30)
 
+# Behind nginx or a platform load balancer, take the client address and
+# scheme from the X-Forwarded-* headers set by that many proxies.
+# Without this every request appears to come from the proxy, so the
+# per-IP login throttle would lock everyone out at once.
+trusted_proxy_hops = int(os.getenv('TRUSTED_PROXY_HOPS', 0))
+if trusted_proxy_hops:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=trusted_proxy_hops, x_proto=trusted_proxy_hops)
+
 # Initialize extensions
 # CORS configuration - allow frontend domains
 frontend_url = os.getenv('FRONTEND_URL', 'http://localhost:3000')
 
-# Function to check if origin is allowed
-def is_allowed_origin(origin):
-    if not origin:
-        return False
-    
-    allowed_patterns = [
-        "http://localhost:3000",
-        "http://localhost:3001",
-        frontend_url,
-    ]
-    
-    # Check exact matches
-    if origin in allowed_patterns:
-        logger.info(f"CORS: Allowed origin (exact match): {origin}")
-        return True
-    
-    # Check if it's a Vercel deployment
-    if origin.endswith('.vercel.app'):
-        logger.info(f"CORS: Allowed origin (Vercel): {origin}")
-        return True
-    
-    logger.warning(f"CORS: Blocked origin: {origin}")
-    return False
+# Exact origins plus any Vercel deployment (same rules as asgi_app.py). flask-cors
+# only takes strings and patterns here; a callable breaks every response.
+allowed_origins = [
+    "http://localhost:3000",
+    "http://localhost:3001",
+    frontend_url,
+    re.compile(r"https://.*\.vercel\.app$", re.IGNORECASE),
+]
 
-# Configure CORS with custom origin checker
 CORS(app, 
-     origins=is_allowed_origin,
+     origins=allowed_origins,
      supports_credentials=True,
      allow_headers=["Content-Type", "Authorization"],
      methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"]
 )
 jwt = JWTManager(app)
 email_service.init_app(app)
+compression.init_app(app)
+
+# Running grids follow their owners' sessions across eviction and rebuild,
+# and are shared between workers through the database
+grid_engine.bind(bot_sessions, db)
+
+# Prometheus metrics on /metrics; queue and cache gauges are read at scrape time
+metrics.init_app(app)
+tracer.init_app(app)
+metrics.gauge('telegram_queue_depth', 'Telegram alerts waiting to be sent', telegram_dispatcher.queue_depth)
+metrics.gauge('email_queue_depth', 'Emails waiting to be sent', email_service.queue_depth)
+metrics.gauge('grids_running', 'Grids kept rebalanced by the grid engine', lambda: len(grid_engine.grids))
+metrics.gauge('emulated_orders_active', 'Conditional orders waiting in the stop emulator', lambda: len(stop_emulator.orders))
+metrics.gauge('cache_entries', 'Entries held in each in-process cache',
+              lambda: {(c.name,): len(c) for c in list(TTLCache.instances)}, labels=('cache',))
+metrics.gauge('cache_hit_ratio', 'Cache hits / lookups since start',
+              lambda: {(c.name,): c.hit_ratio() for c in list(TTLCache.instances)}, labels=('cache',))
+metrics.gauge('cache_hits_total', 'Cache hits', lambda: {(c.name,): c.hits for c in list(TTLCache.instances)},
+              labels=('cache',), type='counter')
+metrics.gauge('cache_misses_total', 'Cache misses', lambda: {(c.name,): c.misses for c in list(TTLCache.instances)},
+              labels=('cache',), type='counter')
 
 # Initialize database and auth service
 if not db.connect():
-    logger.error("Failed to connect to MongoDB")
+    logger.error(f"Failed to connect to database ({db.backend})")
     exit(1)
 
 init_auth_service(app.config['SECRET_KEY'])
 
-# Global bot instance
-bot = None
-
 # ============================================================================
 # AUTHENTICATION ROUTES
 # ============================================================================
@@ -115,6 +139,8 @@ def register():
                 'message': 'Registration successful. Please check your email for verification.',
                 'user_id': result['user_id']
             })
+        elif result.get('busy'):
+            return jsonify(result), 503
         else:
             return jsonify(result), 400
             
@@ -130,11 +156,16 @@ def login():
         
         result = auth_service.login_user(
             email=data.get('email'),
-            password=data.get('password')
+            password=data.get('password'),
+            ip=request.remote_addr
         )
         
         if result['success']:
             return jsonify(result)
+        elif result.get('throttled'):
+            return jsonify(result), 429
+        elif result.get('busy'):
+            return jsonify(result), 503
         else:
             return jsonify(result), 401
             
@@ -193,6 +224,10 @@ def update_credentials():
             api_secret=data.get('api_secret')
         )
         
+        # The open session (if any) still uses the old credentials
+        if result['success']:
+            bot_sessions.disconnect(email)
+        
         return jsonify(result)
         
     except Exception as e:
@@ -207,34 +242,27 @@ def update_credentials():
 @jwt_required()
 def connect():
     """Connect to Binance using user's stored credentials"""
-    global bot
     try:
         email = get_jwt_identity()
         
-        # Get user's API credentials from database
+        # Get user's API credentials (cached per identity)
         user_result = auth_service.get_user_profile(email)
         if not user_result['success']:
             return jsonify({'success': False, 'message': 'User not found'}), 404
         
-        user = user_result['user']
-        api_key = user.get('api_key')
-        api_secret = user.get('api_secret')
+        api_key, api_secret = auth_service.get_api_credentials(email)
         
         if not api_key or not api_secret:
             return jsonify({'success': False, 'message': 'API credentials not set'}), 400
         
-        # Set credentials and connect
-        Config.set_credentials(api_key, api_secret)
-        bot = MarketOrderBot(testnet=True)
+        # Open this user's own bot session
+        session = bot_sessions.connect(email, testnet=True)
         
-        # Get account info
-        account = bot.get_account_balance()
-        if account:
-            balance = account.get('totalWalletBalance', '0')
+        if session.balance is not None:
             return jsonify({
                 'success': True,
                 'message': 'Connected successfully!',
-                'balance': balance
+                'balance': session.balance
             })
         else:
             return jsonify({'success': False, 'message': 'Failed to get account info'}), 500
@@ -243,21 +271,76 @@ def connect():
         logger.error(f"Connection error: {e}")
         return jsonify({'success': False, 'message': str(e)}), 500
 
+@app.route('/api/disconnect', methods=['POST'])
+@jwt_required()
+def disconnect():
+    """Close the current user's bot session"""
+    try:
+        bot_sessions.disconnect(get_jwt_identity())
+        return jsonify({'success': True, 'message': 'Disconnected'})
+        
+    except Exception as e:
+        logger.error(f"Disconnect error: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/account/balance')
+@jwt_required()
+def account_balance():
+    """Get account balances from the in-memory account snapshot"""
+    try:
+        session = bot_sessions.get(get_jwt_identity())
+        if not session:
+            return jsonify({'success': False, 'message': 'Not connected'}), 400
+        
+        account = session.ensure_account()
+        if not account.seeded:
+            return jsonify({'success': False, 'message': 'Failed to get account info'}), 500
+        
+        return jsonify({'success': True, 'balance': account.balance_snapshot()})
+        
+    except Exception as e:
+        logger.error(f"Account balance error: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/account/positions')
+@jwt_required()
+def account_positions():
+    """Get open positions from the in-memory account snapshot"""
+    try:
+        session = bot_sessions.get(get_jwt_identity())
+        if not session:
+            return jsonify({'success': False, 'message': 'Not connected'}), 400
+        
+        account = session.ensure_account()
+        if not account.seeded:
+            return jsonify({'success': False, 'message': 'Failed to get account info'}), 500
+        
+        return jsonify({
+            'success': True,
+            'positions': account.positions_snapshot(),
+            'updated_at': account.updated_at
+        })
+        
+    except Exception as e:
+        logger.error(f"Account positions error: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
 @app.route('/api/price/<symbol>')
 def get_price(symbol):
     """Get current price (public endpoint - no auth required)"""
     try:
         import requests
         
-        # Use production Binance API for price data (more reliable than testnet)
-        # This is public data and doesn't require authentication
-        url = f"https://fapi.binance.com/fapi/v1/ticker/price?symbol={symbol}"
-        
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        
-        data = response.json()
-        price = float(data['price'])
+        if use_simulator():
+            price = simulated_price(symbol)
+        else:
+            # Use production Binance API for price data (more reliable than testnet)
+            # This is public data and doesn't require authentication
+            response = requests.get(public_price_url(), params={'symbol': symbol}, timeout=10)
+            response.raise_for_status()
+            
+            data = response.json()
+            price = float(data['price'])
         
         logger.info(f"Fetched price for {symbol}: {price}")
         
@@ -280,13 +363,15 @@ def get_price(symbol):
 def market_order():
     """Place market order"""
     try:
-        if not bot:
+        email = get_jwt_identity()
+        session = bot_sessions.get(email)
+        if not session:
             return jsonify({'success': False, 'message': 'Not connected'}), 400
         
-        email = get_jwt_identity()
         data = request.json
+        tracer.annotate(symbol=data.get('symbol'), side=data.get('side'), order_type='MARKET')
         
-        order_bot = MarketOrderBot(testnet=True)
+        order_bot = session.get_bot(MarketOrderBot)
         order = order_bot.place_market_order(
             data['symbol'],
             data['side'],
@@ -309,18 +394,19 @@ def market_order():
             db.orders.insert_one(order_doc)
             
             # Add to local history
-            order_history.add_order(
-                'MARKET',
-                data['symbol'],
-                data['side'],
-                float(data['quantity']),
-                order.get('avgPrice'),
-                order['orderId'],
-                order['status']
-            )
+            with tracer.span('order_history.add'):
+                order_history.add_order(
+                    'MARKET',
+                    data['symbol'],
+                    data['side'],
+                    float(data['quantity']),
+                    order.get('avgPrice'),
+                    order['orderId'],
+                    order['status']
+                )
             
             # Send Telegram alert
-            telegram_alerts.alert_order_executed(
+            telegram_router.for_user(email).alert_order_executed(
                 'MARKET',
                 data['symbol'],
                 data['side'],
@@ -339,7 +425,7 @@ def market_order():
         
     except Exception as e:
         logger.error(f"Market order error: {e}")
-        telegram_alerts.alert_error(f"Market order failed: {str(e)}")
+        telegram_router.for_user(get_jwt_identity()).alert_error(f"Market order failed: {str(e)}")
         return jsonify({'success': False, 'message': str(e)}), 500
 
 @app.route('/api/limit_order', methods=['POST'])
@@ -347,13 +433,15 @@ def market_order():
 def limit_order():
     """Place limit order"""
     try:
-        if not bot:
+        email = get_jwt_identity()
+        session = bot_sessions.get(email)
+        if not session:
             return jsonify({'success': False, 'message': 'Not connected'}), 400
         
-        email = get_jwt_identity()
         data = request.json
+        tracer.annotate(symbol=data.get('symbol'), side=data.get('side'), order_type='LIMIT')
         
-        order_bot = LimitOrderBot(testnet=True)
+        order_bot = session.get_bot(LimitOrderBot)
         order = order_bot.place_limit_order(
             data['symbol'],
             data['side'],
@@ -389,6 +477,117 @@ def limit_order():
         logger.error(f"Limit order error: {e}")
         return jsonify({'success': False, 'message': str(e)}), 500
 
+@app.route('/api/trailing_stop_order', methods=['POST'])
+@jwt_required()
+def trailing_stop_order():
+    """Place trailing-stop order"""
+    try:
+        email = get_jwt_identity()
+        session = bot_sessions.get(email)
+        if not session:
+            return jsonify({'success': False, 'message': 'Not connected'}), 400
+        
+        data = request.json
+        tracer.annotate(symbol=data.get('symbol'), side=data.get('side'), order_type='TRAILING_STOP_MARKET')
+        
+        activation_price = data.get('activation_price')
+        order_bot = session.get_bot(TrailingStopBot)
+        order = order_bot.place_trailing_stop_order(
+            data['symbol'],
+            data['side'],
+            float(data['quantity']),
+            float(data['callback_rate']),
+            float(activation_price) if activation_price else None,
+            reduce_only=bool(data.get('reduce_only', True))
+        )
+        
+        if order:
+            # Store in database
+            order_doc = {
+                'user_email': email,
+                'order_type': 'TRAILING_STOP_MARKET',
+                'symbol': data['symbol'],
+                'side': data['side'],
+                'quantity': float(data['quantity']),
+                'callback_rate': float(data['callback_rate']),
+                'activation_price': order.get('activatePrice'),
+                'order_id': order['orderId'],
+                'status': order['status'],
+                'timestamp': datetime.utcnow()
+            }
+            db.orders.insert_one(order_doc)
+            
+            return jsonify({
+                'success': True,
+                'message': 'Trailing stop placed!',
+                'order_id': order['orderId'],
+                'status': order['status']
+            })
+        
+        return jsonify({'success': False, 'message': 'Order failed'}), 500
+        
+    except Exception as e:
+        logger.error(f"Trailing stop order error: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/bracket_order', methods=['POST'])
+@jwt_required()
+def bracket_order():
+    """Place entry, take profit and stop loss in one batch request"""
+    try:
+        email = get_jwt_identity()
+        session = bot_sessions.get(email)
+        if not session:
+            return jsonify({'success': False, 'message': 'Not connected'}), 400
+        
+        data = request.json
+        tracer.annotate(symbol=data.get('symbol'), side=data.get('side'), order_type='BRACKET')
+        
+        entry_price = data.get('entry_price')
+        order_bot = session.get_bot(BracketBot)
+        entry, take_profit, stop_loss = order_bot.place_bracket_order(
+            data['symbol'],
+            data['side'],
+            float(data['quantity']),
+            float(data['take_profit_price']),
+            float(data['stop_loss_price']),
+            float(entry_price) if entry_price else None
+        )
+        
+        if entry:
+            # Store in database
+            order_doc = {
+                'user_email': email,
+                'order_type': 'BRACKET',
+                'symbol': data['symbol'],
+                'side': data['side'],
+                'quantity': float(data['quantity']),
+                'price': float(entry_price) if entry_price else entry.get('avgPrice'),
+                'take_profit_price': float(data['take_profit_price']),
+                'stop_loss_price': float(data['stop_loss_price']),
+                'order_id': entry['orderId'],
+                'take_profit_order_id': take_profit['orderId'],
+                'stop_loss_order_id': stop_loss['orderId'],
+                'status': entry['status'],
+                'timestamp': datetime.utcnow()
+            }
+            db.orders.insert_one(order_doc)
+            
+            return jsonify({
+                'success': True,
+                'message': 'Bracket order placed!',
+                'order_id': entry['orderId'],
+                'take_profit_order_id': take_profit['orderId'],
+                'stop_loss_order_id': stop_loss['orderId'],
+                'status': entry['status']
+            })
+        
+        return jsonify({'success': False, 'message': 'Order failed'}), 500
+        
+    except Exception as e:
+        logger.error(f"Bracket order error: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
 @app.route('/api/order_history')
 @jwt_required()
 def get_order_history():
@@ -414,10 +613,11 @@ def get_order_history():
 def open_orders():
     """Get open orders"""
     try:
-        if not bot:
+        session = bot_sessions.get(get_jwt_identity())
+        if not session:
             return jsonify({'success': False, 'message': 'Not connected'}), 400
         
-        order_bot = LimitOrderBot(testnet=True)
+        order_bot = session.get_bot(LimitOrderBot)
         orders = order_bot.get_open_orders()
         
         return jsonify({'success': True, 'orders': orders})
@@ -431,11 +631,12 @@ def open_orders():
 def cancel_order():
     """Cancel an order"""
     try:
-        if not bot:
+        session = bot_sessions.get(get_jwt_identity())
+        if not session:
             return jsonify({'success': False, 'message': 'Not connected'}), 400
         
         data = request.json
-        order_bot = LimitOrderBot(testnet=True)
+        order_bot = session.get_bot(LimitOrderBot)
         result = order_bot.cancel_order(data['symbol'], int(data['order_id']))
         
         if result:
@@ -447,26 +648,239 @@ def cancel_order():
         logger.error(f"Cancel order error: {e}")
         return jsonify({'success': False, 'message': str(e)}), 500
 
+@app.route('/api/grid_order', methods=['POST'])
+@jwt_required()
+def grid_order():
+    """Start a self-rebalancing grid"""
+    try:
+        session = bot_sessions.get(get_jwt_identity())
+        if not session:
+            return jsonify({'success': False, 'message': 'Not connected'}), 400
+        
+        data = request.json
+        tracer.annotate(symbol=data.get('symbol'), order_type='GRID')
+        
+        result = grid_engine.start_grid(
+            session,
+            data['symbol'],
+            float(data['lower_price']),
+            float(data['upper_price']),
+            int(data['num_grids']),
+            float(data['quantity_per_grid']),
+            spacing=data.get('spacing', 'arithmetic'),
+            atr_multiplier=float(data.get('atr_multiplier', 1.0))
+        )
+        return jsonify(result), 200 if result['success'] else 400
+        
+    except Exception as e:
+        logger.error(f"Grid order error: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/grids')
+@jwt_required()
+def list_grids():
+    """List the user's running grids"""
+    try:
+        return jsonify({'success': True, 'grids': grid_engine.list_grids(get_jwt_identity())})
+        
+    except Exception as e:
+        logger.error(f"List grids error: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/grids/<grid_id>', methods=['DELETE'])
+@jwt_required()
+def stop_grid(grid_id):
+    """Stop a grid and cancel its open orders (?cancel=false leaves them)"""
+    try:
+        cancel_orders = request.args.get('cancel', 'true').lower() != 'false'
+        result = grid_engine.stop_grid(get_jwt_identity(), grid_id, cancel_orders)
+        return jsonify(result), 200 if result['success'] else 404
+        
+    except Exception as e:
+        logger.error(f"Stop grid error: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/emulated_orders', methods=['POST'])
+@jwt_required()
+def create_emulated_order():
+    """Create a client-side conditional order (mark, composite or time trigger)"""
+    try:
+        session = bot_sessions.get(get_jwt_identity())
+        if not session:
+            return jsonify({'success': False, 'message': 'Not connected'}), 400
+        
+        data = request.json
+        tracer.annotate(symbol=data.get('symbol'), side=data.get('side'), order_type='EMULATED')
+        
+        trigger_price = data.get('trigger_price')
+        trigger_after = data.get('trigger_after')
+        price = data.get('price')
+        direction = data.get('direction')
+        result = stop_emulator.create_order(
+            session,
+            data['symbol'],
+            data['side'].upper(),
+            float(data['quantity']),
+            data.get('trigger', 'last').lower(),
+            trigger_price=float(trigger_price) if trigger_price else None,
+            direction=direction.lower() if direction else None,
+            trigger_after=float(trigger_after) if trigger_after else None,
+            order_type=data.get('type', 'MARKET').upper(),
+            price=float(price) if price else None,
+            reduce_only=bool(data.get('reduce_only', False))
+        )
+        return jsonify(result), 200 if result['success'] else 400
+        
+    except (KeyError, ValueError) as e:
+        return jsonify({'success': False, 'message': f'Invalid request: {e}'}), 400
+    except Exception as e:
+        logger.error(f"Emulated order error: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/emulated_orders')
+@jwt_required()
+def list_emulated_orders():
+    """List the user's emulated orders (?include_finished=true adds fired and cancelled ones)"""
+    try:
+        include_finished = request.args.get('include_finished', 'false').lower() == 'true'
+        orders = stop_emulator.list_orders(get_jwt_identity(), include_finished)
+        return jsonify({'success': True, 'orders': orders})
+        
+    except Exception as e:
+        logger.error(f"List emulated orders error: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/emulated_orders/<order_id>', methods=['DELETE'])
+@jwt_required()
+def cancel_emulated_order(order_id):
+    """Cancel an emulated order before it triggers"""
+    try:
+        result = stop_emulator.cancel_order(get_jwt_identity(), order_id)
+        return jsonify(result), 200 if result['success'] else 404
+        
+    except Exception as e:
+        logger.error(f"Cancel emulated order error: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
 @app.route('/api/telegram/config', methods=['POST'])
 @jwt_required()
 def configure_telegram():
-    """Configure Telegram alerts"""
+    """Configure Telegram alerts for the current user"""
     try:
+        email = get_jwt_identity()
         data = request.json
-        telegram_alerts.bot_token = data.get('bot_token')
-        telegram_alerts.chat_id = data.get('chat_id')
-        telegram_alerts.enabled = bool(telegram_alerts.bot_token and telegram_alerts.chat_id)
         
-        if telegram_alerts.enabled:
-            telegram_alerts.send_message("✅ Telegram alerts configured successfully!")
-            return jsonify({'success': True, 'message': 'Telegram configured!'})
+        result = telegram_router.configure(email, data.get('bot_token'), data.get('chat_id'))
         
-        return jsonify({'success': False, 'message': 'Invalid credentials'}), 400
+        if result['success']:
+            telegram_router.for_user(email).send_message("✅ Telegram alerts configured successfully!")
+            return jsonify(result)
+        
+        return jsonify(result), 400
         
     except Exception as e:
         logger.error(f"Telegram config error: {e}")
         return jsonify({'success': False, 'message': str(e)}), 500
 
+@app.route('/api/telegram/test', methods=['POST'])
+@jwt_required()
+def test_telegram():
+    """Send a test message to the current user's Telegram chat"""
+    try:
+        alerts = telegram_router.for_user(get_jwt_identity())
+        
+        if not alerts.enabled:
+            return jsonify({'success': False, 'message': 'Telegram not configured'}), 400
+        
+        if alerts.send_message("🔔 Test alert from Binance Trading Bot", wait=True):
+            return jsonify({'success': True, 'message': 'Test message sent!'})
+        
+        return jsonify({'success': False, 'message': 'Failed to send test message'}), 502
+        
+    except Exception as e:
+        logger.error(f"Telegram test error: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+# ============================================================================
+# PRICE ALERTS (JWT Protected)
+# ============================================================================
+
+@app.route('/api/price_alerts', methods=['GET'])
+@jwt_required()
+def list_price_alerts():
+    """List the current user's price alerts"""
+    try:
+        email = get_jwt_identity()
+        include_triggered = request.args.get('include_triggered', 'false').lower() == 'true'
+        limit = request.args.get('limit', 100, type=int)
+        
+        result = price_alert_engine.list_alerts(email, include_triggered, limit)
+        return jsonify(result) if result['success'] else (jsonify(result), 500)
+        
+    except Exception as e:
+        logger.error(f"List price alerts error: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/price_alerts', methods=['POST'])
+@jwt_required()
+def create_price_alert():
+    """Create a price alert"""
+    try:
+        email = get_jwt_identity()
+        data = request.json
+        
+        result = price_alert_engine.create_alert(
+            email,
+            data['symbol'],
+            float(data['target_price']),
+            data.get('direction', '').lower()
+        )
+        return jsonify(result) if result['success'] else (jsonify(result), 400)
+        
+    except (KeyError, ValueError) as e:
+        return jsonify({'success': False, 'message': f'Invalid request: {e}'}), 400
+    except Exception as e:
+        logger.error(f"Create price alert error: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/price_alerts/<alert_id>', methods=['PUT'])
+@jwt_required()
+def update_price_alert(alert_id):
+    """Update a price alert's target or direction"""
+    try:
+        email = get_jwt_identity()
+        data = request.json
+        
+        target_price = data.get('target_price')
+        direction = data.get('direction')
+        result = price_alert_engine.update_alert(
+            email,
+            alert_id,
+            float(target_price) if target_price is not None else None,
+            direction.lower() if direction else None
+        )
+        return jsonify(result) if result['success'] else (jsonify(result), 400)
+        
+    except ValueError as e:
+        return jsonify({'success': False, 'message': f'Invalid request: {e}'}), 400
+    except Exception as e:
+        logger.error(f"Update price alert error: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/price_alerts/<alert_id>', methods=['DELETE'])
+@jwt_required()
+def delete_price_alert(alert_id):
+    """Delete a price alert"""
+    try:
+        email = get_jwt_identity()
+        
+        result = price_alert_engine.delete_alert(email, alert_id)
+        return jsonify(result) if result['success'] else (jsonify(result), 404)
+        
+    except Exception as e:
+        logger.error(f"Delete price alert error: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
 # ============================================================================
 # ERROR HANDLERS
 # ============================================================================
@@ -514,6 +928,11 @@ if __name__ == '__main__':
     print("✅ Secure Trading API")
     print("="*60)
     
+    grid_engine.start()
+    if os.getenv('PRICE_ALERT_FEED', 'True') == 'True':
+        price_alert_engine.start()
+        stop_emulator.start()
+    
     if is_production:
         # Production mode
         app.run(host='0.0.0.0', port=port)
@@ -3,7 +3,7 @@ WebSocket Live Price Feed
 """
 import json
 import asyncio
-from binance import AsyncClient, BinanceSocketManager
+from exchange import create_async_client, socket_manager
 from logger import logger
 
 class WebSocketPriceFeed:
@@ -19,8 +19,8 @@ class WebSocketPriceFeed:
     async def start(self, symbols=['BTCUSDT', 'ETHUSDT']):
         """Start WebSocket connection"""
         try:
-            self.client = await AsyncClient.create()
-            self.bsm = BinanceSocketManager(self.client)
+            self.client = await create_async_client()
+            self.bsm = socket_manager(self.client)
             
             # Create multiplex socket for multiple symbols
             streams = [f"{symbol.lower()}@ticker" for symbol in symbols]
@@ -37,7 +37,11 @@ class WebSocketPriceFeed:
                         
         except Exception as e:
             logger.error(f"WebSocket error: {e}")
+        finally:
             self.running = False
+            if self.client:
+                await self.client.close_connection()
+                self.client = None
     
     async def _process_message(self, msg):
         """Process incoming WebSocket message"""
@@ -75,6 +79,7 @@ class WebSocketPriceFeed:
         self.running = False
         if self.client:
             await self.client.close_connection()
+            self.client = None
         logger.info("WebSocket stopped")
 
 # Global instance
@@ -0,0 +1,84 @@
+"""
+Shared test fixtures
+
+Tests run hermetically: orders go to the in-process exchange simulator
+(exchange_sim.py) and state to a throwaway SQLite database, so neither
+Binance nor MongoDB is needed.
+"""
+import os
+import sys
+import tempfile
+
+# Configure before any backend module reads the environment at import time
+os.environ['EXCHANGE_BACKEND'] = 'simulator'
+os.environ['SIM_TICK_INTERVAL'] = '0'
+os.environ['SIM_LATENCY_MS'] = '0'
+os.environ['SIM_ERROR_RATE'] = '0'
+os.environ['DATABASE_BACKEND'] = 'sqlite'
+_scratch = tempfile.mkdtemp(prefix='bot-tests-')
+os.environ['SQLITE_PATH'] = os.path.join(_scratch, 'test.db')
+os.environ['LOG_FILE'] = os.path.join(_scratch, 'bot.log')
+os.environ['TRACING_EXPORTER'] = 'none'
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import pytest
+import exchange_sim
+from account_state import account_streams
+from base_bot import BaseBot
+from bot_sessions import BotSession
+from database import db
+from exchange import create_client
+
+# Price, tick size and step size of the test market
+SYMBOL = 'BTCUSDT'
+SIM_SYMBOLS = 'BTCUSDT:100:0.1:0.001'
+
+
+@pytest.fixture(scope='session', autouse=True)
+def database():
+    assert db.connect()
+    yield db
+    db.disconnect()
+
+
+@pytest.fixture(autouse=True)
+def clean_database(database):
+    for name in ('users', 'sessions', 'price_alerts', 'grids', 'emulated_orders'):
+        database.db[name].delete_many({})
+
+
+@pytest.fixture
+def exchange(monkeypatch):
+    """A fresh simulated exchange, also used by clients created through exchange.py"""
+    sim = exchange_sim.SimulatedExchange(symbols=SIM_SYMBOLS, seed=1)
+    monkeypatch.setattr(exchange_sim, '_exchange', sim)
+    monkeypatch.setattr(exchange_sim, '_exchange_pid', os.getpid())
+    BaseBot._exchange_info_cache.clear()
+    return sim
+
+
+@pytest.fixture
+def no_account_streams(monkeypatch):
+    """Keep sessions off the async user-data stream; tests feed events directly"""
+    monkeypatch.setattr(account_streams, 'start', lambda session: None)
+    monkeypatch.setattr(account_streams, 'is_streaming', lambda session: True)
+
+
+@pytest.fixture
+def make_session(exchange, no_account_streams):
+    """Create a BotSession on the simulator whose fills reach its listeners synchronously"""
+    def make(email: str = 'trader@example.com', api_key: str = None):
+        api_key = api_key or f"key-{email}"
+        session = BotSession(email, create_client(api_key, 'secret'))
+        exchange.subscribe_user(api_key, session.dispatch_user_event)
+        return session
+    return make
+
+
+def open_orders(exchange, api_key: str, symbol: str = SYMBOL) -> list:
+    return exchange.handle('GET', 'openOrders', api_key, {'symbol': symbol})
+
+
+def position(exchange, api_key: str, symbol: str = SYMBOL) -> float:
+    return float(exchange.handle('GET', 'positionRisk', api_key, {'symbol': symbol})[0]['positionAmt'])
@@ -0,0 +1,65 @@
+"""Account snapshot: REST seed, ACCOUNT_UPDATE events and reconcile scheduling"""
+import time
+from types import SimpleNamespace
+from account_state import AccountState, AccountStreamManager
+
+
+def seeded_account() -> AccountState:
+    # 1000 USDT and 2 BNB at 300 USDT
+    account = AccountState()
+    account.seed({
+        'totalWalletBalance': '1600', 'availableBalance': '1500', 'totalUnrealizedProfit': '0',
+        'totalMarginBalance': '1600', 'maxWithdrawAmount': '1500',
+        'assets': [
+            {'asset': 'USDT', 'walletBalance': '1000', 'crossWalletBalance': '1000', 'availableBalance': '900'},
+            {'asset': 'BNB', 'walletBalance': '2', 'crossWalletBalance': '2', 'availableBalance': '2'},
+        ],
+        'positions': [],
+    })
+    return account
+
+
+def account_update(balances, positions=()) -> dict:
+    return {'e': 'ACCOUNT_UPDATE', 'E': 1700000000000, 'a': {
+        'B': [{'a': asset, 'wb': wallet, 'cw': wallet} for asset, wallet in balances],
+        'P': [{'s': symbol, 'pa': amount, 'ep': entry, 'up': unrealized, 'ps': 'BOTH'}
+              for symbol, amount, entry, unrealized in positions],
+    }}
+
+
+def test_multi_asset_update_only_moves_totals_by_the_margin_asset():
+    account = seeded_account()
+    
+    # A fee paid in BNB and a realized loss in USDT
+    account.apply_account_update(account_update([('USDT', '990'), ('BNB', '1.9')],
+                                                [('BTCUSDT', '0.01', '100', '-1.5')]))
+    
+    snapshot = account.balance_snapshot()
+    assert snapshot['totalWalletBalance'] == 1590
+    assert snapshot['totalUnrealizedProfit'] == -1.5
+    assert {a['asset']: a['walletBalance'] for a in snapshot['assets']} == {'USDT': 990, 'BNB': 1.9}
+    # The stream has no availableBalance; the REST value is kept and flagged
+    assert snapshot['availableBalance'] == 1500 and snapshot['stale']
+    assert account.positions_snapshot()[0]['positionAmt'] == 0.01
+
+
+def test_reseed_clears_the_stale_flag():
+    account = seeded_account()
+    account.apply_account_update(account_update([('BNB', '1.9')]))
+    assert account.balance_snapshot()['totalWalletBalance'] == 1600
+    
+    account.seed({'totalWalletBalance': '1570', 'availableBalance': '1470',
+                  'assets': [{'asset': 'USDT', 'walletBalance': '1000'}], 'positions': []})
+    
+    snapshot = account.balance_snapshot()
+    assert (snapshot['totalWalletBalance'], snapshot['stale'], snapshot['source']) == (1570, False, 'rest')
+
+
+def test_stale_snapshot_is_reconciled_sooner():
+    manager = AccountStreamManager(reconcile_seconds=300, stale_reconcile_seconds=5)
+    session = SimpleNamespace(account=seeded_account())
+    last_reconcile = time.monotonic() - 10
+    
+    assert manager._reconcile_due(session, last_reconcile) > 280
+    session.account.apply_account_update(account_update([('USDT', '990')]))
+    assert manager._reconcile_due(session, last_reconcile) <= 0
@@ -0,0 +1,83 @@
+"""Vectorized grid backtester against a tick-by-tick replay of GridBot's orders"""
+import numpy as np
+import pytest
+from backtest import GridBacktester, PriceHistory, grid_combinations
+
+MAKER_FEE = 0.0002
+
+
+def naive_grid(prices, levels, quantity):
+    """Replay a grid order by order: GridBot's initial layout, and every fill answered one level away"""
+    orders = {k: 'BUY' if level < prices[0] else 'SELL' for k, level in enumerate(levels) if level != prices[0]}
+    cash = fees = position = 0.0
+    fills = 0
+    for previous, price in zip(prices, prices[1:]):
+        if price < previous:
+            filled = sorted((k for k, side in orders.items() if side == 'BUY' and levels[k] >= price), reverse=True)
+        else:
+            filled = sorted(k for k, side in orders.items() if side == 'SELL' and levels[k] <= price)
+        for k in filled:
+            side = orders.pop(k)
+            sign = 1 if side == 'SELL' else -1
+            cash += sign * levels[k] * quantity
+            fees += levels[k] * quantity * MAKER_FEE
+            position -= sign * quantity
+            fills += 1
+            if side == 'BUY' and k + 1 < len(levels):
+                orders[k + 1] = 'SELL'
+            elif side == 'SELL' and k > 0:
+                orders[k - 1] = 'BUY'
+    return {'pnl': cash - fees + position * prices[-1], 'fills': fills, 'final_position': position}
+
+
+def random_path(rng, start, length=300):
+    return np.round(start + np.cumsum(rng.normal(0, 1.5, length)), 1)
+
+
+def backtester(prices, spacing):
+    return GridBacktester(PriceHistory(np.arange(len(prices)), prices), maker_fee=MAKER_FEE, spacing=spacing)
+
+
+def levels_of(lower, upper, num_grids, spacing):
+    if spacing == 'geometric':
+        return list(np.geomspace(lower, upper, num_grids))
+    return list(np.linspace(lower, upper, num_grids))
+
+
+@pytest.mark.parametrize('spacing', ['arithmetic', 'geometric'])
+@pytest.mark.parametrize('start', [100.0, 92.0, 85.0, 120.0])
+def test_run_matches_a_naive_replay(spacing, start):
+    rng = np.random.default_rng(int(start))
+    for _ in range(20):
+        prices = random_path(rng, start)
+        prices[0] = start
+        result = backtester(prices, spacing).run(90, 110, 9, 0.5)
+        expected = naive_grid(prices, levels_of(90, 110, 9, spacing), 0.5)
+        
+        assert result['fills'] == expected['fills']
+        assert result['final_position'] == pytest.approx(expected['final_position'])
+        assert result['pnl'] == pytest.approx(expected['pnl'], abs=1e-6)
+
+
+def test_start_below_the_range_sells_the_bottom_level():
+    # Starting at 85, GridBot puts a SELL on every level, 90 included
+    prices = np.array([85.0, 91.0, 85.0, 96.0])
+    
+    result = backtester(prices, 'arithmetic').run(90, 110, 5, 1)
+    
+    # 90 sells on the way up; 95 sells next, and its buy-back at 90 is never reached
+    assert (result['fills'], result['sells'], result['buys']) == (2, 2, 0)
+    assert result['final_position'] == -2
+
+
+def test_sweep_matches_single_runs_across_the_start_price():
+    prices = random_path(np.random.default_rng(7), 100.0, length=500)
+    tester = backtester(prices, 'arithmetic')
+    combos = grid_combinations([90, 95, 100, 105], [110, 120], [5, 12], 0.5)
+    
+    swept = tester.sweep(combos)
+    
+    for i in range(len(combos['lower'])):
+        single = tester.run(combos['lower'][i], combos['upper'][i], int(combos['num_grids'][i]), 0.5)
+        assert swept['fills'][i] == single['fills']
+        assert swept['pnl'][i] == pytest.approx(single['pnl'])
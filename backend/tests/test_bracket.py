@@ -0,0 +1,64 @@
+"""Bracket orders against the simulator, including unwinding a partly rejected bracket"""
+from advanced.bracket import BracketBot
+from conftest import SYMBOL, open_orders, position
+
+
+def test_limit_bracket_places_entry_and_reduce_only_exits(exchange, make_session):
+    session = make_session()
+    bot = session.get_bot(BracketBot)
+    
+    entry, take_profit, stop_loss = bot.place_bracket_order(SYMBOL, 'BUY', 1, 110, 85, entry_price=95)
+    
+    assert entry['type'] == 'LIMIT' and entry['status'] == 'NEW'
+    assert take_profit['type'] == 'TAKE_PROFIT_MARKET' and take_profit['reduceOnly']
+    assert stop_loss['type'] == 'STOP_MARKET' and stop_loss['reduceOnly']
+    assert len(open_orders(exchange, session.client.API_KEY)) == 3
+
+
+def test_resting_entry_is_cancelled_when_an_exit_is_rejected(exchange, make_session):
+    session = make_session()
+    bot = session.get_bot(BracketBot)
+    
+    # A SELL take profit at 99 would trigger immediately at the current price of 100
+    result = bot.place_bracket_order(SYMBOL, 'BUY', 1, 99, 85, entry_price=95)
+    
+    assert result == (None, None, None)
+    assert open_orders(exchange, session.client.API_KEY) == []
+    assert position(exchange, session.client.API_KEY) == 0
+
+
+def test_filled_market_entry_is_closed_when_an_exit_is_rejected(exchange, make_session):
+    session = make_session()
+    bot = session.get_bot(BracketBot)
+    # The price drops from 105 to 100 between the quote and the order
+    bot.get_current_price = lambda symbol: 105.0
+    
+    # Stop 101 < 105 < take profit 120 passes validation, but a SELL stop
+    # at 101 would trigger immediately at 100
+    result = bot.place_bracket_order(SYMBOL, 'BUY', 1, 120, 101)
+    
+    assert result == (None, None, None)
+    # Neither a half-protected position nor the orphaned take profit is left
+    assert position(exchange, session.client.API_KEY) == 0
+    assert open_orders(exchange, session.client.API_KEY) == []
+
+
+def test_crossing_limit_entry_is_closed_when_an_exit_is_rejected(exchange, make_session):
+    session = make_session()
+    bot = session.get_bot(BracketBot)
+    
+    # A SELL limit at 99 fills at once against the price of 100, and a BUY
+    # stop at 99.5 would trigger immediately
+    result = bot.place_bracket_order(SYMBOL, 'SELL', 1, 98, 99.5, entry_price=99)
+    
+    assert result == (None, None, None)
+    assert position(exchange, session.client.API_KEY) == 0
+    assert open_orders(exchange, session.client.API_KEY) == []
+
+
+def test_invalid_bracket_is_rejected_before_sending(exchange, make_session):
+    session = make_session()
+    bot = session.get_bot(BracketBot)
+    
+    assert bot.place_bracket_order(SYMBOL, 'BUY', 1, 90, 85) == (None, None, None)
+    assert open_orders(exchange, session.client.API_KEY) == []
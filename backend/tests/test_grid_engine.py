@@ -0,0 +1,268 @@
+"""GridEngine rebalancing, reconcile, ownership and persistence against the simulator"""
+import threading
+import time
+from advanced.grid import GRID_ORDER_PREFIX, GridEngine
+from conftest import SYMBOL, open_orders
+
+
+class SessionDirectory:
+    """Minimal BotSessionManager stand-in: on_session hooks plus get(email)"""
+    
+    def __init__(self, make_session):
+        self.make_session = make_session
+        self.sessions = {}
+        self.hooks = []
+    
+    def on_session(self, callback):
+        self.hooks.append(callback)
+    
+    def open(self, email: str):
+        session = self.make_session(email)
+        self.sessions[email] = session
+        for callback in self.hooks:
+            callback(session)
+        return session
+    
+    def get(self, email: str):
+        session = self.sessions.get(email)
+        if session is not None and session.closed:
+            session = self.open(email)
+        return session
+
+
+def drain(engine: GridEngine):
+    """Apply queued stream updates on the test thread (instead of the worker)"""
+    updates = []
+    while not engine._updates.empty():
+        updates.append(engine._updates.get_nowait())
+    if updates:
+        engine._apply(updates)
+
+
+def make_engine(monkeypatch, sessions=None, database=None) -> GridEngine:
+    engine = GridEngine(reconcile_seconds=60)
+    monkeypatch.setattr(engine, '_ensure_worker', lambda: None)
+    if sessions is not None:
+        engine.bind(sessions, database)
+    return engine
+
+
+def resting(exchange, session) -> dict:
+    """price -> side of the session's open grid orders"""
+    return {float(o['price']): o['side'] for o in open_orders(exchange, session.client.API_KEY)
+            if o['clientOrderId'].startswith(GRID_ORDER_PREFIX)}
+
+
+def test_start_grid_leaves_the_level_nearest_the_price_empty(exchange, make_session, monkeypatch):
+    engine = make_engine(monkeypatch)
+    session = make_session()
+    
+    result = engine.start_grid(session, SYMBOL, 90, 110, 5, 1)
+    
+    assert result['success'] and result['orders_placed'] == 4
+    assert resting(exchange, session) == {90.0: 'BUY', 95.0: 'BUY', 105.0: 'SELL', 110.0: 'SELL'}
+
+
+def test_fill_is_answered_one_level_away(exchange, make_session, monkeypatch):
+    engine = make_engine(monkeypatch)
+    session = make_session()
+    grid_id = engine.start_grid(session, SYMBOL, 90, 110, 5, 1)['grid_id']
+    
+    exchange.set_price(SYMBOL, 94)
+    drain(engine)
+    assert resting(exchange, session) == {90.0: 'BUY', 100.0: 'SELL', 105.0: 'SELL', 110.0: 'SELL'}
+    
+    exchange.set_price(SYMBOL, 101)
+    drain(engine)
+    assert resting(exchange, session) == {90.0: 'BUY', 95.0: 'BUY', 105.0: 'SELL', 110.0: 'SELL'}
+    
+    grid = engine.list_grids(session.email)[0]
+    assert grid['grid_id'] == grid_id
+    assert (grid['fills'], grid['round_trips'], grid['realized_pnl']) == (2, 1, 5.0)
+
+
+def test_reconcile_catches_fills_the_stream_missed(exchange, make_session, monkeypatch):
+    engine = make_engine(monkeypatch)
+    session = make_session()
+    engine.start_grid(session, SYMBOL, 90, 110, 5, 1)
+    
+    exchange.set_price(SYMBOL, 94)
+    while not engine._updates.empty():
+        engine._updates.get_nowait()  # lost while the stream was reconnecting
+    assert 100.0 not in resting(exchange, session)
+    
+    engine.reconcile()
+    assert resting(exchange, session)[100.0] == 'SELL'
+    assert engine.list_grids(session.email)[0]['fills'] == 1
+
+
+def test_stop_grid_cancels_only_grid_orders(exchange, make_session, monkeypatch):
+    engine = make_engine(monkeypatch)
+    session = make_session()
+    grid_id = engine.start_grid(session, SYMBOL, 90, 110, 5, 1)['grid_id']
+    manual = session.client.futures_create_order(symbol=SYMBOL, side='BUY', type='LIMIT', timeInForce='GTC',
+                                                 quantity='1', price='80')
+    
+    result = engine.stop_grid(session.email, grid_id)
+    
+    assert result['success'] and result['cancelled'] == 4
+    assert [o['orderId'] for o in open_orders(exchange, session.client.API_KEY)] == [manual['orderId']]
+    assert engine.list_grids(session.email) == []
+
+
+def test_stop_grid_checks_the_owner(exchange, make_session, monkeypatch):
+    engine = make_engine(monkeypatch)
+    session = make_session()
+    grid_id = engine.start_grid(session, SYMBOL, 90, 110, 5, 1)['grid_id']
+    
+    assert not engine.stop_grid('someone-else@example.com', grid_id)['success']
+    assert len(resting(exchange, session)) == 4
+
+
+def test_grid_follows_a_rebuilt_session(exchange, make_session, monkeypatch):
+    sessions = SessionDirectory(make_session)
+    engine = make_engine(monkeypatch, sessions)
+    old = sessions.open('trader@example.com')
+    engine.start_grid(old, SYMBOL, 90, 110, 5, 1)
+    
+    # Evicted (stream stopped) and rebuilt by the next lookup
+    old.close()
+    exchange.unsubscribe(old.dispatch_user_event)
+    new = sessions.get('trader@example.com')
+    
+    assert next(iter(engine.grids.values())).session is new
+    exchange.set_price(SYMBOL, 94)
+    drain(engine)
+    assert resting(exchange, new)[100.0] == 'SELL'
+
+
+def test_grids_are_shared_between_workers(database, exchange, make_session, monkeypatch):
+    sessions = SessionDirectory(make_session)
+    session = sessions.open('trader@example.com')
+    worker_a = make_engine(monkeypatch, sessions, database)
+    worker_b = make_engine(monkeypatch, sessions, database)
+    monkeypatch.setattr(GridEngine, 'owner', property(lambda self: f"worker-{id(self)}"))
+    
+    grid_id = worker_a.start_grid(session, SYMBOL, 90, 110, 5, 1)['grid_id']
+    exchange.set_price(SYMBOL, 94)
+    drain(worker_a)
+    
+    # Any worker lists the grid with its current state
+    listed = worker_b.list_grids(session.email)
+    assert [g['grid_id'] for g in listed] == [grid_id]
+    assert listed[0]['fills'] == 1
+    
+    # A worker that doesn't run the grid can stop it; the owner then drops it
+    result = worker_b.stop_grid(session.email, grid_id)
+    assert result['success'] and result['cancelled'] == 4
+    assert resting(exchange, session) == {}
+    worker_a.reconcile()
+    assert worker_a.grids == {}
+
+
+def test_orphaned_grid_is_adopted_after_its_lease_expires(database, exchange, make_session, monkeypatch):
+    sessions = SessionDirectory(make_session)
+    session = sessions.open('trader@example.com')
+    worker_a = make_engine(monkeypatch, sessions, database)
+    worker_b = make_engine(monkeypatch, sessions, database)
+    monkeypatch.setattr(GridEngine, 'owner', property(lambda self: f"worker-{id(self)}"))
+    grid_id = worker_a.start_grid(session, SYMBOL, 90, 110, 5, 1)['grid_id']
+    
+    # Still leased: nothing to adopt
+    worker_b.reconcile()
+    assert worker_b.grids == {}
+    
+    # Worker A dies; a fill happens before anyone else runs the grid
+    session._listeners.clear()
+    exchange.set_price(SYMBOL, 94)
+    database.grids.update_one({'grid_id': grid_id}, {'$set': {'lease_until': time.time() - 1}})
+    
+    worker_b.reconcile()
+    assert list(worker_b.grids) == [grid_id]
+    assert resting(exchange, session)[100.0] == 'SELL'
+    
+    # The old owner, if it comes back, finds the grid taken and lets go
+    assert not worker_a._save(worker_a.grids[grid_id])
+    assert worker_a.grids == {}
+
+
+def test_grid_with_no_accepted_orders_is_not_kept(database, exchange, make_session, monkeypatch):
+    sessions = SessionDirectory(make_session)
+    session = sessions.open('trader@example.com')
+    engine = make_engine(monkeypatch, sessions, database)
+    
+    # 0.01 at ~100 is below the minimum notional
+    result = engine.start_grid(session, SYMBOL, 90, 110, 5, 0.01)
+    
+    assert not result['success']
+    assert engine.grids == {}
+    assert engine.list_grids(session.email) == []
+
+
+def test_a_slow_exchange_call_does_not_hold_up_other_grids(exchange, make_session, monkeypatch):
+    engine = make_engine(monkeypatch)
+    slow, fast = make_session('slow@example.com'), make_session('fast@example.com')
+    entered, release = threading.Event(), threading.Event()
+    send = slow.client.futures_place_batch_order
+    
+    def stalled(**params):
+        entered.set()
+        release.wait(5)
+        return send(**params)
+    monkeypatch.setattr(slow.client, 'futures_place_batch_order', stalled)
+    
+    starting = threading.Thread(target=engine.start_grid, args=(slow, SYMBOL, 90, 110, 5, 1))
+    starting.start()
+    try:
+        assert entered.wait(5)
+        # Everything else keeps working while the slow grid's orders are out
+        grid_id = engine.start_grid(fast, SYMBOL, 90, 110, 5, 1)['grid_id']
+        exchange.set_price(SYMBOL, 94)
+        drain(engine)
+        assert resting(exchange, fast)[100.0] == 'SELL'
+        assert engine.list_grids(fast.email)[0]['fills'] == 1
+        assert engine.stop_grid(fast.email, grid_id)['success']
+        assert starting.is_alive()
+        exchange.set_price(SYMBOL, 100)
+    finally:
+        release.set()
+        starting.join(5)
+    
+    assert resting(exchange, slow) == {90.0: 'BUY', 95.0: 'BUY', 105.0: 'SELL', 110.0: 'SELL'}
+
+
+def test_fill_reported_before_the_order_id_is_recorded(exchange, make_session, monkeypatch):
+    engine = make_engine(monkeypatch)
+    session = make_session()
+    send = session.client.futures_place_batch_order
+    
+    def fill_before_returning(**params):
+        results = send(**params)
+        # The stream delivers the fill while the engine still waits for this response
+        monkeypatch.setattr(session.client, 'futures_place_batch_order', send)
+        exchange.set_price(SYMBOL, 94)
+        drain(engine)
+        return results
+    monkeypatch.setattr(session.client, 'futures_place_batch_order', fill_before_returning)
+    
+    engine.start_grid(session, SYMBOL, 90, 110, 5, 1)
+    drain(engine)
+    
+    assert resting(exchange, session) == {90.0: 'BUY', 100.0: 'SELL', 105.0: 'SELL', 110.0: 'SELL'}
+    assert engine.list_grids(session.email)[0]['fills'] == 1
+
+
+def test_orders_accepted_after_a_stop_are_cancelled(exchange, make_session, monkeypatch):
+    engine = make_engine(monkeypatch)
+    session = make_session()
+    send = session.client.futures_place_batch_order
+    
+    def stop_first(**params):
+        engine.stop_grid(session.email, next(iter(engine.grids)))
+        return send(**params)
+    monkeypatch.setattr(session.client, 'futures_place_batch_order', stop_first)
+    
+    result = engine.start_grid(session, SYMBOL, 90, 110, 5, 1)
+    
+    assert not result['success']
+    assert open_orders(exchange, session.client.API_KEY) == []
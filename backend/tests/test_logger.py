@@ -0,0 +1,33 @@
+"""Log pipeline: forked workers write their own log files"""
+import logging
+import os
+import pytest
+import logger as logger_module
+from logger import LogPipeline, _create_file_handler
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork')
+def test_forked_process_writes_its_own_file(tmp_path, monkeypatch):
+    path = str(tmp_path / 'bot.log')
+    monkeypatch.setattr(logger_module.Config, 'LOG_FILE', path)
+    pipeline = LogPipeline()
+    log = logging.getLogger('test_forked_process_writes_its_own_file')
+    log.propagate = False
+    log.addHandler(pipeline.start([_create_file_handler(path)]))
+    
+    pid = os.fork()
+    if pid == 0:
+        try:
+            pipeline.restart_after_fork()
+            log.warning('from the worker')
+            pipeline.stop()
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+    log.warning('from the parent')
+    pipeline.stop()
+    
+    with open(path) as f:
+        assert f.read().strip() == 'from the parent'
+    with open(str(tmp_path / f'bot.{pid}.log')) as f:
+        assert f.read().strip() == 'from the worker'
@@ -0,0 +1,89 @@
+"""Price alerts: crossing, updates and exactly-once delivery across workers"""
+import pytest
+import price_alerts as price_alerts_module
+from price_alerts import PriceAlertEngine
+from conftest import SYMBOL
+
+EMAIL = 'trader@example.com'
+
+
+class Alerts:
+    def __init__(self):
+        self.sent = []
+    
+    def alert_price_target(self, symbol, price, target_price, direction):
+        self.sent.append((symbol, price, target_price, direction))
+
+
+@pytest.fixture
+def alerts(monkeypatch):
+    alerts = Alerts()
+    monkeypatch.setattr(price_alerts_module.telegram_router, 'for_user', lambda email: alerts)
+    return alerts
+
+
+def tick(engine, price, symbol=SYMBOL):
+    engine.fire(engine.check_price(symbol, price), price)
+
+
+def test_alert_fires_once_when_crossed(alerts):
+    engine = PriceAlertEngine()
+    alert_id = engine.create_alert(EMAIL, SYMBOL, 105, 'above')['alert']['alert_id']
+    engine.create_alert(EMAIL, SYMBOL, 95, 'below')
+    
+    tick(engine, 104)
+    assert alerts.sent == []
+    tick(engine, 106)
+    tick(engine, 107)
+    
+    assert alerts.sent == [(SYMBOL, 106, 105, 'above')]
+    active = engine.list_alerts(EMAIL)['alerts']
+    assert [a['target_price'] for a in active] == [95]
+    fired = [a for a in engine.list_alerts(EMAIL, include_triggered=True)['alerts'] if a['alert_id'] == alert_id]
+    assert fired[0]['triggered_price'] == 106
+
+
+def test_updated_alert_uses_its_new_target(alerts):
+    engine = PriceAlertEngine()
+    alert_id = engine.create_alert(EMAIL, SYMBOL, 105, 'above')['alert']['alert_id']
+    
+    assert engine.update_alert(EMAIL, alert_id, target_price=110)['success']
+    tick(engine, 106)
+    assert alerts.sent == []
+    tick(engine, 110)
+    assert alerts.sent == [(SYMBOL, 110, 110, 'above')]
+
+
+def test_two_workers_send_a_crossed_alert_once(alerts):
+    worker_a, worker_b = PriceAlertEngine(), PriceAlertEngine()
+    worker_a.create_alert(EMAIL, SYMBOL, 105, 'above')
+    assert worker_b.load() == 1
+    
+    crossed_a = worker_a.check_price(SYMBOL, 106)
+    crossed_b = worker_b.check_price(SYMBOL, 106)
+    assert len(crossed_a) == len(crossed_b) == 1
+    worker_b.fire(crossed_b, 106)
+    worker_a.fire(crossed_a, 106)
+    
+    assert len(alerts.sent) == 1
+
+
+def test_deleted_alert_is_not_sent_by_a_stale_worker(alerts):
+    worker_a, worker_b = PriceAlertEngine(), PriceAlertEngine()
+    alert_id = worker_a.create_alert(EMAIL, SYMBOL, 105, 'above')['alert']['alert_id']
+    worker_b.load()
+    
+    assert worker_b.delete_alert(EMAIL, alert_id)['success']
+    tick(worker_a, 106)
+    
+    assert alerts.sent == []
+
+
+def test_other_users_cannot_change_an_alert(alerts):
+    engine = PriceAlertEngine()
+    alert_id = engine.create_alert(EMAIL, SYMBOL, 105, 'above')['alert']['alert_id']
+    
+    assert not engine.update_alert('someone-else@example.com', alert_id, target_price=200)['success']
+    assert not engine.delete_alert('someone-else@example.com', alert_id)['success']
+    tick(engine, 106)
+    assert len(alerts.sent) == 1
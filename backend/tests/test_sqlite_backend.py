@@ -0,0 +1,143 @@
+"""SQLite storage backend: Mongo query operators, updates and datetime round-trips"""
+from datetime import datetime
+import pytest
+from sqlite_backend import SQLiteDatabase
+
+
+@pytest.fixture
+def collection(tmp_path):
+    database = SQLiteDatabase(str(tmp_path / 'backend.db'))
+    collection = database['items']
+    for name, price, tag in (('a', 1.0, 'x'), ('b', 2.0, 'y'), ('c', 3.0, None), ('d', 4.0, 'x')):
+        collection.insert_one({'name': name, 'price': price, 'tag': tag, 'active': name != 'b'})
+    yield collection
+    database.close()
+
+
+def names(collection, query):
+    return sorted(doc['name'] for doc in collection.find(query))
+
+
+@pytest.mark.parametrize('query, expected', [
+    ({'price': {'$gt': 2}}, ['c', 'd']),
+    ({'price': {'$gte': 2}}, ['b', 'c', 'd']),
+    ({'price': {'$lt': 2}}, ['a']),
+    ({'price': {'$lte': 2}}, ['a', 'b']),
+    ({'price': {'$gt': 1, '$lt': 4}}, ['b', 'c']),
+    ({'name': {'$ne': 'a'}}, ['b', 'c', 'd']),
+    ({'tag': {'$ne': None}}, ['a', 'b', 'd']),
+    ({'tag': None}, ['c']),
+    ({'tag': {'$in': ['x', 'y']}}, ['a', 'b', 'd']),
+    ({'tag': {'$in': []}}, []),
+    ({'active': True}, ['a', 'c', 'd']),
+    ({'active': False, 'price': 2.0}, ['b']),
+    ({}, ['a', 'b', 'c', 'd']),
+])
+def test_query_operators(collection, query, expected):
+    assert names(collection, query) == expected
+    assert collection.count_documents(query) == len(expected)
+
+
+def test_unsupported_operator_is_rejected(collection):
+    with pytest.raises(ValueError):
+        collection.find_one({'price': {'$regex': '1'}})
+    with pytest.raises(ValueError):
+        collection.update_one({'name': 'a'}, {'$inc': {'price': 1}})
+
+
+def test_lookup_by_id_sort_limit_and_projection(collection):
+    doc = collection.find_one({'name': 'c'})
+    assert collection.find_one({'_id': doc['_id']})['name'] == 'c'
+    
+    priciest_first = [d['name'] for d in collection.find({}, {'_id': 0, 'name': 1}).sort('price', -1).limit(2)]
+    assert priciest_first == ['d', 'c']
+    assert collection.find_one({'name': 'a'}, {'_id': 0, 'tag': 0}) == {'name': 'a', 'price': 1.0, 'active': True}
+
+
+def test_set_and_unset(collection):
+    result = collection.update_one({'name': 'a'}, {'$set': {'price': 5.0, 'note': 'new'}, '$unset': {'tag': ''}})
+    assert (result.matched_count, result.modified_count) == (1, 1)
+    assert collection.find_one({'name': 'a'}, {'_id': 0}) == {'name': 'a', 'price': 5.0, 'active': True, 'note': 'new'}
+    
+    unchanged = collection.update_one({'name': 'a'}, {'$set': {'price': 5.0}})
+    assert (unchanged.matched_count, unchanged.modified_count) == (1, 0)
+    missing = collection.update_one({'name': 'z'}, {'$set': {'price': 5.0}})
+    assert (missing.matched_count, missing.modified_count) == (0, 0)
+
+
+def test_conditional_update_matches_once(collection):
+    claim = {'name': 'a', 'active': True}
+    assert collection.update_one(claim, {'$set': {'active': False}}).modified_count == 1
+    assert collection.update_one(claim, {'$set': {'active': False}}).modified_count == 0
+
+
+def test_upsert_inserts_query_fields_and_set(collection):
+    result = collection.update_one({'name': 'e'}, {'$set': {'price': 6.0}}, upsert=True)
+    
+    assert result.upserted_id is not None
+    assert collection.find_one({'name': 'e'}, {'_id': 0}) == {'name': 'e', 'price': 6.0}
+
+
+def test_delete_one_and_many(collection):
+    assert collection.delete_one({'tag': 'x'}).deleted_count == 1
+    assert collection.delete_many({'price': {'$gte': 2}}).deleted_count == 3
+    assert collection.count_documents({}) == 0
+
+
+def test_datetimes_round_trip_and_compare(collection):
+    created = datetime(2024, 5, 1, 12, 30, 15, 123456)
+    collection.insert_one({'name': 'dated', 'created_at': created})
+    
+    doc = collection.find_one({'name': 'dated'})
+    assert doc['created_at'] == created and isinstance(doc['created_at'], datetime)
+    assert names(collection, {'created_at': {'$lt': datetime(2024, 6, 1)}}) == ['dated']
+    assert names(collection, {'created_at': {'$gt': datetime(2024, 6, 1)}}) == []
+    
+    later = datetime(2024, 7, 1)
+    collection.update_one({'name': 'dated'}, {'$set': {'updated_at': later}})
+    doc = collection.find_one({'name': 'dated'})
+    assert (doc['created_at'], doc['updated_at']) == (created, later)
+
+
+def test_unique_index(collection):
+    collection.create_index('name', unique=True)
+    
+    with pytest.raises(Exception):
+        collection.insert_one({'name': 'a'})
+
+
+def test_dotted_set_and_unset_update_embedded_documents(collection):
+    collection.insert_one({'name': 'user', 'telegram': {'chat_id': '1', 'enabled': True}})
+    
+    collection.update_one({'name': 'user'}, {'$set': {'telegram.chat_id': '2', 'settings.theme': 'dark'}})
+    doc = collection.find_one({'name': 'user'}, {'_id': 0})
+    assert doc == {'name': 'user', 'telegram': {'chat_id': '2', 'enabled': True}, 'settings': {'theme': 'dark'}}
+    assert names(collection, {'telegram.chat_id': '2'}) == ['user']
+    
+    collection.update_one({'name': 'user'}, {'$unset': {'telegram.enabled': '', 'settings.missing.deep': ''}})
+    assert collection.find_one({'name': 'user'})['telegram'] == {'chat_id': '2'}
+
+
+def test_dotted_set_through_a_scalar_is_rejected(collection):
+    with pytest.raises(ValueError):
+        collection.update_one({'name': 'a'}, {'$set': {'price.currency': 'USDT'}})
+    assert collection.find_one({'name': 'a'})['price'] == 1.0
+
+
+def test_dotted_upsert_builds_embedded_documents(collection):
+    collection.update_one({'name': 'f', 'meta.source': 'api'}, {'$set': {'meta.version': 2}}, upsert=True)
+    
+    assert collection.find_one({'name': 'f'}, {'_id': 0}) == {'name': 'f', 'meta': {'source': 'api', 'version': 2}}
+
+
+def test_embedded_datetimes_round_trip(collection):
+    verified = datetime(2024, 5, 1, 8, 0)
+    collection.insert_one({'name': 'user', 'email': {'verified_at': verified, 'address': 'a@example.com'}})
+    
+    assert collection.find_one({'name': 'user'})['email']['verified_at'] == verified
+    assert names(collection, {'email.verified_at': {'$gte': verified}}) == ['user']
+    
+    changed = datetime(2024, 6, 1, 9, 30)
+    collection.update_one({'name': 'user'}, {'$set': {'email.changed_at': changed}})
+    email = collection.find_one({'name': 'user'})['email']
+    assert (email['verified_at'], email['changed_at'], email['address']) == (verified, changed, 'a@example.com')
@@ -0,0 +1,182 @@
+"""Emulated conditional orders: triggers, exactly-once firing across workers, cancel and failure"""
+import pytest
+import advanced.stop_emulator as stop_emulator_module
+from advanced.stop_emulator import StopEmulator
+from conftest import SYMBOL, position
+
+
+class Alerts:
+    def __init__(self):
+        self.errors = []
+    
+    def alert_error(self, message):
+        self.errors.append(message)
+
+
+@pytest.fixture
+def sessions(monkeypatch):
+    """email -> current BotSession, as bot_sessions.get() would return it"""
+    current = {}
+    monkeypatch.setattr(stop_emulator_module.bot_sessions, 'get', current.get)
+    return current
+
+
+@pytest.fixture
+def alerts(monkeypatch):
+    alerts = Alerts()
+    monkeypatch.setattr(stop_emulator_module.telegram_router, 'for_user', lambda email: alerts)
+    return alerts
+
+
+@pytest.fixture
+def make_emulator(monkeypatch, sessions, alerts):
+    """A StopEmulator per simulated worker, without the live price feed"""
+    monkeypatch.setattr(stop_emulator_module.price_alert_engine, 'watch', lambda symbol: None)
+    
+    def make():
+        emulator = StopEmulator(mark_seconds=0, refresh_seconds=3600)
+        monkeypatch.setattr(emulator, 'start', lambda: None)
+        return emulator
+    return make
+
+
+@pytest.fixture
+def session(make_session, sessions):
+    session = make_session()
+    sessions[session.email] = session
+    return session
+
+
+def tick(emulator, price, symbol=SYMBOL, now=None):
+    emulator.fire(emulator.check_price(symbol, price, now))
+
+
+def test_last_price_stop_fires_once_crossed(exchange, make_emulator, session):
+    emulator = make_emulator()
+    order = emulator.create_order(session, SYMBOL, 'SELL', 1, 'last', trigger_price=95)['order']
+    assert order['direction'] == 'below'
+    
+    tick(emulator, 96)
+    assert position(exchange, session.client.API_KEY) == 0
+    
+    exchange.set_price(SYMBOL, 94)
+    tick(emulator, 94)
+    assert position(exchange, session.client.API_KEY) == -1
+    fired = emulator.list_orders(session.email, include_finished=True)[0]
+    assert fired['status'] == 'TRIGGERED' and fired['triggered_price'] == 94
+    assert emulator.list_orders(session.email) == []
+
+
+def test_order_that_would_trigger_immediately_is_rejected(exchange, make_emulator, session):
+    emulator = make_emulator()
+    emulator.check_price(SYMBOL, 100)
+    
+    result = emulator.create_order(session, SYMBOL, 'SELL', 1, 'last', trigger_price=101)
+    
+    assert not result['success']
+
+
+def test_order_is_checked_against_symbol_filters(exchange, make_emulator, session):
+    emulator = make_emulator()
+    
+    result = emulator.create_order(session, SYMBOL, 'SELL', 0.0005, 'last', trigger_price=95)
+    
+    assert not result['success'] and 'multiple of' in result['message']
+
+
+def test_mark_and_composite_triggers(exchange, make_emulator, session):
+    emulator = make_emulator()
+    mark = emulator.create_order(session, SYMBOL, 'SELL', 1, 'mark', trigger_price=95)['order']
+    composite = emulator.create_order(session, SYMBOL, 'SELL', 1, 'composite', trigger_price=92.5)['order']
+    
+    # Last price alone never moves a mark trigger
+    tick(emulator, 90)
+    assert position(exchange, session.client.API_KEY) == 0
+    
+    # Composite (90 + 95.5) / 2 = 92.75 is still above 92.5
+    emulator.fire(emulator.check_mark(SYMBOL, 95.5))
+    assert position(exchange, session.client.API_KEY) == 0
+    # Mark 94 fires the mark stop, and composite (90 + 94) / 2 = 92 crosses 92.5
+    emulator.fire(emulator.check_mark(SYMBOL, 94))
+    
+    statuses = {o['order_id']: o['status'] for o in emulator.list_orders(session.email, include_finished=True)}
+    assert statuses == {mark['order_id']: 'TRIGGERED', composite['order_id']: 'TRIGGERED'}
+    assert position(exchange, session.client.API_KEY) == -2
+
+
+def test_time_trigger_fires_after_its_deadline(exchange, make_emulator, session):
+    emulator = make_emulator()
+    order = emulator.create_order(session, SYMBOL, 'BUY', 1, 'time', trigger_after=30)['order']
+    deadline = order['trigger_time'].timestamp()
+    
+    tick(emulator, 100, now=deadline - 31)
+    assert position(exchange, session.client.API_KEY) == 0
+    tick(emulator, 100, now=deadline + 60)
+    assert position(exchange, session.client.API_KEY) == 1
+
+
+def test_two_workers_send_a_triggered_order_once(exchange, make_emulator, session):
+    worker_a, worker_b = make_emulator(), make_emulator()
+    worker_a.create_order(session, SYMBOL, 'SELL', 1, 'last', trigger_price=95)
+    worker_b.load()
+    assert len(worker_b.orders) == 1
+    
+    exchange.set_price(SYMBOL, 94)
+    crossed_a = worker_a.check_price(SYMBOL, 94)
+    crossed_b = worker_b.check_price(SYMBOL, 94)
+    worker_a.fire(crossed_a)
+    worker_b.fire(crossed_b)
+    
+    assert position(exchange, session.client.API_KEY) == -1
+
+
+def test_cancel_on_one_worker_stops_the_others(exchange, make_emulator, session):
+    worker_a, worker_b = make_emulator(), make_emulator()
+    order_id = worker_a.create_order(session, SYMBOL, 'SELL', 1, 'last', trigger_price=95)['order']['order_id']
+    worker_b.load()
+    
+    assert worker_b.cancel_order(session.email, order_id)['success']
+    assert not worker_b.cancel_order(session.email, order_id)['success']
+    
+    # Worker A has not reloaded yet; its claim fails
+    exchange.set_price(SYMBOL, 94)
+    tick(worker_a, 94)
+    assert position(exchange, session.client.API_KEY) == 0
+    assert worker_a.list_orders(session.email, include_finished=True)[0]['status'] == 'CANCELED'
+
+
+def test_orders_survive_a_restart(exchange, make_emulator, session):
+    make_emulator().create_order(session, SYMBOL, 'SELL', 1, 'last', trigger_price=95)
+    
+    restarted = make_emulator()
+    restarted.load()
+    exchange.set_price(SYMBOL, 94)
+    tick(restarted, 94)
+    
+    assert position(exchange, session.client.API_KEY) == -1
+
+
+def test_order_is_sent_through_the_current_session(exchange, make_emulator, make_session, sessions, session):
+    emulator = make_emulator()
+    emulator.create_order(session, SYMBOL, 'SELL', 1, 'last', trigger_price=95)
+    
+    # The session is evicted and rebuilt before the trigger
+    session.close()
+    rebuilt = make_session(session.email, api_key=session.client.API_KEY)
+    sessions[session.email] = rebuilt
+    exchange.set_price(SYMBOL, 94)
+    tick(emulator, 94)
+    
+    assert position(exchange, rebuilt.client.API_KEY) == -1
+
+
+def test_failed_send_is_recorded_and_alerted(exchange, make_emulator, sessions, session, alerts):
+    emulator = make_emulator()
+    emulator.create_order(session, SYMBOL, 'SELL', 1, 'last', trigger_price=95)
+    
+    sessions.clear()  # owner disconnected
+    tick(emulator, 94)
+    
+    failed = emulator.list_orders(session.email, include_finished=True)[0]
+    assert failed['status'] == 'FAILED' and failed['message'] == 'Not connected'
+    assert len(alerts.errors) == 1
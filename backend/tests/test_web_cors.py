@@ -0,0 +1,29 @@
+"""CORS headers on the Flask app"""
+import pytest
+
+
+@pytest.fixture
+def client():
+    from web_ui import app
+    return app.test_client()
+
+
+def test_request_without_origin_is_served(client):
+    # API clients and scripts send no Origin header
+    assert client.get('/api/price/BTCUSDT').status_code == 200
+
+
+@pytest.mark.parametrize('origin', ['http://localhost:3000', 'https://trading-bot-git-main.vercel.app'])
+def test_allowed_origin_is_echoed(client, origin):
+    response = client.get('/api/price/BTCUSDT', headers={'Origin': origin})
+    
+    assert response.headers['Access-Control-Allow-Origin'] == origin
+    assert response.headers['Access-Control-Allow-Credentials'] == 'true'
+
+
+@pytest.mark.parametrize('origin', ['https://evil.example.com', 'http://app.vercel.app.evil.com'])
+def test_other_origins_get_no_cors_headers(client, origin):
+    response = client.get('/api/price/BTCUSDT', headers={'Origin': origin})
+    
+    assert response.status_code == 200
+    assert 'Access-Control-Allow-Origin' not in response.headers